@@ -2,12 +2,17 @@ from flask import Flask, request, jsonify, send_from_directory
 from flask_cors import CORS
 import os
 import json
+import time
+import threading
 from datetime import datetime
+from src.services.viewer_history import latency_history, parse_range_args, viewer_history
+from src.services.viewer_analytics import total_series
+from src.services.pagination import PAGINATION_HEADERS
 
 app = Flask(__name__)
 
 # Configuração CORS para permitir acesso de qualquer origem
-CORS(app, origins="*")
+CORS(app, origins="*", expose_headers=list(PAGINATION_HEADERS))
 
 # Configuração básica
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'your-secret-key-here')
@@ -146,31 +151,59 @@ def get_streaming_platforms():
     return jsonify(list(platforms_data.values()))
 
 # Rotas de análises
+DEMO_USER_ID = 1
+DEMO_POLL_INTERVAL = float(os.environ.get('DEMO_POLL_INTERVAL', 5))
+
+def record_demo_samples():
+    """Registra no histórico a audiência e a latência atuais dos dados simulados"""
+    for key, platform in platforms_data.items():
+        if platform['status'] == 'AO VIVO':
+            viewer_history.record(DEMO_USER_ID, key, platform['viewers'])
+    for guest in guests_data:
+        if guest['status'] == 'connected':
+            latency_history.record(DEMO_USER_ID, f"guest:{guest['id']}", guest['latency'])
+
+def poll_demo_samples():
+    """Faz o papel do status_poller: amostra em intervalo fixo, independente das consultas"""
+    while True:
+        try:
+            record_demo_samples()
+        except Exception as e:
+            app.logger.error(f"Erro ao registrar amostras simuladas: {e}")
+        time.sleep(DEMO_POLL_INTERVAL)
+
+threading.Thread(target=poll_demo_samples, name='demo-poller', daemon=True).start()
+
 @app.route('/api/analytics/viewers')
 def get_viewers_analytics():
+    try:
+        since, until, max_points, resolution = parse_range_args(request.args)
+    except ValueError:
+        return jsonify({'error': 'Parâmetros de intervalo inválidos'}), 400
+    
+    history = viewer_history.query(DEMO_USER_ID, since, until, max_points, resolution)
     return jsonify({
         'total_viewers': sum(p['viewers'] for p in platforms_data.values()),
         'by_platform': {k: v['viewers'] for k, v in platforms_data.items()},
-        'history': [
-            {'time': '10:00', 'viewers': 1200},
-            {'time': '10:05', 'viewers': 1350},
-            {'time': '10:10', 'viewers': 1420},
-            {'time': '10:15', 'viewers': 1580},
-            {'time': '10:20', 'viewers': 1720},
-            {'time': '10:25', 'viewers': 1890},
-            {'time': '10:30', 'viewers': 2100}
-        ]
+        'resolution': history['resolution'],
+        'series': history['series'],
+        'total': total_series(history['series'])
     })
 
 @app.route('/api/analytics/latency')
 def get_latency_analytics():
+    try:
+        since, until, max_points, resolution = parse_range_args(request.args)
+    except ValueError:
+        return jsonify({'error': 'Parâmetros de intervalo inválidos'}), 400
+    
+    connected = [g for g in guests_data if g['status'] == 'connected']
+    history = latency_history.query(DEMO_USER_ID, since, until, max_points, resolution)
     return jsonify({
-        'guests': [
-            {'name': 'João', 'latency': 45},
-            {'name': 'Maria', 'latency': 67},
-            {'name': 'Pedro', 'latency': 0}
-        ],
-        'average': 37.3
+        'guests': [{'name': g['name'], 'latency': g['latency']} for g in guests_data],
+        'average': round(sum(g['latency'] for g in connected) / len(connected), 1) if connected else None,
+        'resolution': history['resolution'],
+        'series': history['series']
     })
 
 # Configuração para servir arquivos estáticos (se necessário)
@@ -22,6 +22,11 @@ class Guest(db.Model):
     video_quality = db.Column(db.String(20), default='720p')  # 1080p, 720p, 480p, 360p
     audio_quality = db.Column(db.String(20), default='high')  # high, medium, low
 
+    # Fields exposed by to_dict() without the token, in order (used by column-only list queries)
+    serialized_fields = ('id', 'user_id', 'guest_name', 'guest_email', 'is_active', 'is_connected',
+                         'connection_quality', 'latency_ms', 'video_enabled', 'audio_enabled',
+                         'video_quality', 'audio_quality', 'created_at', 'last_connected_at')
+
     def __init__(self, **kwargs):
         if 'guest_token' not in kwargs:
             kwargs['guest_token'] = str(uuid.uuid4())
@@ -64,6 +69,8 @@ class GuestSession(db.Model):
     """Track guest connection sessions"""
     id = db.Column(db.Integer, primary_key=True)
     guest_id = db.Column(db.Integer, db.ForeignKey('guest.id'), nullable=False)
+    # Host of the guest, copied on creation so the host's listing needs no join
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
     session_id = db.Column(db.String(255), nullable=False)  # WebRTC session ID
     connected_at = db.Column(db.DateTime, default=db.func.current_timestamp())
     disconnected_at = db.Column(db.DateTime, nullable=True)
@@ -74,6 +81,17 @@ class GuestSession(db.Model):
     packets_sent = db.Column(db.Integer, default=0)
     bytes_sent = db.Column(db.BigInteger, default=0)
     bytes_received = db.Column(db.BigInteger, default=0)
+    # Per-minute telemetry rollups packed by src.services.guest_telemetry, written when the session ends
+    telemetry_rollups = db.deferred(db.Column(db.LargeBinary, nullable=True))
+
+    serialized_fields = ('id', 'guest_id', 'session_id', 'connected_at', 'disconnected_at',
+                         'avg_latency_ms', 'min_latency_ms', 'max_latency_ms', 'packets_lost',
+                         'packets_sent', 'bytes_sent', 'bytes_received')
+
+    __table_args__ = (
+        db.Index('ix_guest_session_guest_connected', 'guest_id', 'connected_at'),
+        db.Index('ix_guest_session_user_connected', 'user_id', 'connected_at', 'id'),
+    )
 
     def to_dict(self):
         return {
@@ -0,0 +1,120 @@
+"""
+Schema upgrades for databases created before indexes and newer columns were
+declared on the models.
+
+db.create_all() only creates missing tables, so existing databases need the
+new columns and indexes created explicitly (and denormalized columns filled
+in). The route blueprints do this when they are registered (``init_app``);
+it can also be run by hand from the backend directory:
+
+    python -m src.models.migrations
+"""
+import os
+import logging
+import threading
+from sqlalchemy import create_engine, inspect, text
+from src.models.user import db
+# Imported so every model table is registered on db.metadata
+from src.models.platform import Platform, StreamSession
+from src.models.guest import Guest, GuestSession
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DATABASE_URL = 'sqlite:///src/database/app.db'
+
+
+def add_missing_columns(engine=None):
+    """Add nullable columns declared on the models that existing tables lack"""
+    engine = engine or db.engine
+    inspector = inspect(engine)
+    added = []
+
+    with engine.begin() as connection:
+        for table in db.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing or not column.nullable:
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                connection.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+                added.append(f'{table.name}.{column.name}')
+
+    if added:
+        logger.info(f"Columns added: {', '.join(added)}")
+    return added
+
+
+def backfill_columns(engine=None):
+    """Fill denormalized columns left empty on rows created before they existed"""
+    engine = engine or db.engine
+    if not inspect(engine).has_table('guest_session'):
+        return 0
+    with engine.begin() as connection:
+        # Sessions of deleted guests keep a NULL host, so they stay out of the host's listing
+        result = connection.execute(text(
+            'UPDATE guest_session SET user_id = '
+            '(SELECT guest.user_id FROM guest WHERE guest.id = guest_session.guest_id) '
+            'WHERE user_id IS NULL'
+        ))
+    if result.rowcount:
+        logger.info(f"guest_session.user_id filled on {result.rowcount} rows")
+    return result.rowcount
+
+
+def create_missing_indexes(engine=None):
+    """Create every index declared on the models that the database lacks"""
+    engine = engine or db.engine
+    inspector = inspect(engine)
+    created = []
+
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+            created.append(index.name)
+
+    logger.info(f"Indexes verified: {', '.join(created)}")
+    return created
+
+
+def upgrade_schema(engine=None):
+    """Add missing columns, fill denormalized ones and create missing indexes"""
+    add_missing_columns(engine)
+    backfill_columns(engine)
+    create_missing_indexes(engine)
+
+
+def init_app(app):
+    """Upgrade the schema of ``app``'s database once.
+
+    Runs right away when Flask-SQLAlchemy is already set up on the app, so the
+    background workers started by the blueprints see the new columns; otherwise
+    before the first request.
+    """
+    if app.extensions.get('schema_upgrade'):
+        return
+    app.extensions['schema_upgrade'] = True
+
+    if 'sqlalchemy' in app.extensions:
+        with app.app_context():
+            upgrade_schema()
+        return
+
+    lock = threading.Lock()
+    pending = [True]
+
+    @app.before_request
+    def _upgrade_schema():
+        if pending:
+            with lock:
+                if pending:
+                    upgrade_schema()
+                    pending.clear()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    upgrade_schema(create_engine(os.environ.get('DATABASE_URL', DEFAULT_DATABASE_URL)))
@@ -1,14 +1,80 @@
+from flask import g, has_request_context
 from flask_sqlalchemy import SQLAlchemy
-from cryptography.fernet import Fernet
+from sqlalchemy import event
+from cryptography.fernet import Fernet, MultiFernet
 import os
 import base64
+import threading
 from src.models.user import db
 
+SECRET_FIELDS = ('access_token', 'refresh_token', 'stream_key')
+
+# App-level ids the integrations authenticate with, next to each user's tokens
+APP_CREDENTIALS = {
+    'twitch': {'client_id': 'TWITCH_CLIENT_ID'},
+    'youtube': {'api_key': 'YOUTUBE_API_KEY', 'client_id': 'YOUTUBE_CLIENT_ID'},
+    'facebook': {'app_id': 'FACEBOOK_APP_ID'},
+    'instagram': {'client_id': 'INSTAGRAM_CLIENT_ID'},
+}
+
+# Account the integration acts on, stored in Platform.account_id
+ACCOUNT_ID_FIELDS = {
+    'facebook': 'page_id',
+    'instagram': 'user_id',
+    'tiktok': 'user_id',
+}
+
+DISPLAY_NAMES = {
+    'twitch': 'Twitch',
+    'youtube': 'YouTube',
+    'facebook': 'Facebook',
+    'instagram': 'Instagram',
+    'tiktok': 'TikTok',
+}
+
+_cipher_lock = threading.Lock()
+_cipher_cache = {}
+
+def get_cipher():
+    """Get the process-wide cipher for sensitive platform data.
+
+    ENCRYPTION_KEYS may hold a comma-separated list of keys for rotation: the
+    first one encrypts, all of them decrypt. Falls back to ENCRYPTION_KEY.
+    """
+    keys = os.environ.get('ENCRYPTION_KEYS') or os.environ.get('ENCRYPTION_KEY')
+    if not keys:
+        with _cipher_lock:
+            keys = os.environ.get('ENCRYPTION_KEY')
+            if not keys:
+                # Generate a new key if not exists (for development)
+                keys = base64.urlsafe_b64encode(Fernet.generate_key()).decode()
+                os.environ['ENCRYPTION_KEY'] = keys
+
+    cipher = _cipher_cache.get(keys)
+    if cipher is None:
+        with _cipher_lock:
+            fernets = [Fernet(base64.urlsafe_b64decode(key.strip().encode()))
+                       for key in keys.split(',') if key.strip()]
+            cipher = MultiFernet(fernets)
+            _cipher_cache.clear()
+            _cipher_cache[keys] = cipher
+    return cipher
+
+def _request_memo():
+    """Decrypted secrets memoized for the duration of the current request"""
+    if not has_request_context():
+        return {}
+    if not hasattr(g, '_platform_secrets'):
+        g._platform_secrets = {}
+    return g._platform_secrets
+
 class Platform(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     platform_name = db.Column(db.String(50), nullable=False)  # twitch, youtube, facebook, tiktok, instagram
     platform_username = db.Column(db.String(100), nullable=True)
+    # Platform-side id of the account (Facebook page, Instagram/TikTok user)
+    account_id = db.Column(db.String(100), nullable=True)
     access_token = db.Column(db.Text, nullable=True)  # Encrypted
     refresh_token = db.Column(db.Text, nullable=True)  # Encrypted
     stream_key = db.Column(db.Text, nullable=True)  # Encrypted
@@ -17,20 +83,63 @@ class Platform(db.Model):
     created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
     updated_at = db.Column(db.DateTime, default=db.func.current_timestamp(), onupdate=db.func.current_timestamp())
 
+    # Fields exposed by to_dict(), in order (used by column-only list queries)
+    serialized_fields = ('id', 'user_id', 'platform_name', 'platform_username', 'account_id', 'ingest_url',
+                         'is_active', 'created_at', 'updated_at')
+
+    __table_args__ = (
+        db.Index('ix_platform_user_active', 'user_id', 'is_active'),
+        db.Index('ix_platform_user_name', 'user_id', 'platform_name'),
+    )
+
     def __init__(self, **kwargs):
         super(Platform, self).__init__(**kwargs)
         self._cipher = self._get_cipher()
 
     def _get_cipher(self):
-        """Get or create encryption key for sensitive data"""
-        key = os.environ.get('ENCRYPTION_KEY')
-        if not key:
-            # Generate a new key if not exists (for development)
-            key = Fernet.generate_key()
-            os.environ['ENCRYPTION_KEY'] = base64.urlsafe_b64encode(key).decode()
-        else:
-            key = base64.urlsafe_b64decode(key.encode())
-        return Fernet(key)
+        """Get the shared encryption cipher for sensitive data"""
+        return get_cipher()
+
+    def _decrypt(self, field):
+        """Decrypt a single secret field, memoized per request"""
+        value = getattr(self, field)
+        if not value:
+            return None
+
+        memo = _request_memo()
+        plaintext = memo.get(value)
+        if plaintext is None:
+            plaintext = self._cipher.decrypt(value.encode()).decode()
+            memo[value] = plaintext
+        return plaintext
+
+    def get_secrets(self):
+        """Decrypt all secret fields in one pass"""
+        return {field: self._decrypt(field) for field in SECRET_FIELDS}
+
+    def get_credentials(self):
+        """Credentials for the platform integration: app ids from the environment, the account id
+        and the decrypted secrets"""
+        names = APP_CREDENTIALS.get(self.platform_name.lower(), {})
+        credentials = {key: os.environ[var] for key, var in names.items() if os.environ.get(var)}
+        account_field = ACCOUNT_ID_FIELDS.get(self.platform_name.lower())
+        # Rows created before account_id existed may carry the id in platform_username
+        account_id = self.account_id or self.platform_username
+        if account_field and account_id:
+            credentials[account_field] = account_id
+        credentials.update({field: value for field, value in self.get_secrets().items() if value})
+        return credentials
+
+    @property
+    def display_name(self):
+        return DISPLAY_NAMES.get(self.platform_name.lower(), self.platform_name)
+
+    def rotate_secrets(self):
+        """Re-encrypt secret fields with the current primary key"""
+        for field in SECRET_FIELDS:
+            value = getattr(self, field)
+            if value:
+                setattr(self, field, self._cipher.rotate(value.encode()).decode())
 
     def set_access_token(self, token):
         """Encrypt and store access token"""
@@ -39,9 +148,7 @@ class Platform(db.Model):
 
     def get_access_token(self):
         """Decrypt and return access token"""
-        if self.access_token:
-            return self._cipher.decrypt(self.access_token.encode()).decode()
-        return None
+        return self._decrypt('access_token')
 
     def set_refresh_token(self, token):
         """Encrypt and store refresh token"""
@@ -50,9 +157,7 @@ class Platform(db.Model):
 
     def get_refresh_token(self):
         """Decrypt and return refresh token"""
-        if self.refresh_token:
-            return self._cipher.decrypt(self.refresh_token.encode()).decode()
-        return None
+        return self._decrypt('refresh_token')
 
     def set_stream_key(self, key):
         """Encrypt and store stream key"""
@@ -61,9 +166,7 @@ class Platform(db.Model):
 
     def get_stream_key(self):
         """Decrypt and return stream key"""
-        if self.stream_key:
-            return self._cipher.decrypt(self.stream_key.encode()).decode()
-        return None
+        return self._decrypt('stream_key')
 
     def to_dict(self, include_sensitive=False):
         """Convert to dictionary, optionally including sensitive data"""
@@ -72,6 +175,7 @@ class Platform(db.Model):
             'user_id': self.user_id,
             'platform_name': self.platform_name,
             'platform_username': self.platform_username,
+            'account_id': self.account_id,
             'ingest_url': self.ingest_url,
             'is_active': self.is_active,
             'created_at': self.created_at.isoformat() if self.created_at else None,
@@ -79,11 +183,7 @@ class Platform(db.Model):
         }
         
         if include_sensitive:
-            data.update({
-                'access_token': self.get_access_token(),
-                'refresh_token': self.get_refresh_token(),
-                'stream_key': self.get_stream_key()
-            })
+            data.update(self.get_secrets())
         
         return data
 
@@ -91,6 +191,12 @@ class Platform(db.Model):
         return f'<Platform {self.platform_name} for User {self.user_id}>'
 
 
+@event.listens_for(Platform, 'load')
+def _attach_cipher(target, context):
+    """Rows loaded from the database skip __init__, so attach the cipher here"""
+    target._cipher = get_cipher()
+
+
 class StreamSession(db.Model):
     """Track streaming sessions and metrics"""
     id = db.Column(db.Integer, primary_key=True)
@@ -103,6 +209,13 @@ class StreamSession(db.Model):
     total_messages = db.Column(db.Integer, default=0)
     is_active = db.Column(db.Boolean, default=True)
 
+    serialized_fields = ('id', 'user_id', 'platform_id', 'stream_title', 'started_at', 'ended_at',
+                         'max_viewers', 'total_messages', 'is_active')
+
+    __table_args__ = (
+        db.Index('ix_stream_session_user_started', 'user_id', 'started_at'),
+    )
+
     def to_dict(self):
         return {
             'id': self.id,
@@ -2,17 +2,37 @@ from flask import Blueprint, jsonify, request
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from src.models.guest import Guest, GuestSession, db
 from src.models.user import User
+from src.models import migrations
+from src.services.event_bus import event_bus
+from src.services.pagination import InvalidCursor, get_page_size, paginate_desc, paginated_response
+from src.services.serialization import json_response, rows_to_dicts, select_columns
+from src.services.guest_quality_buffer import guest_quality_buffer, parse_quality_sample
+from src.services.guest_telemetry import decode_rollups, guest_telemetry
+from src.services.viewer_history import latency_history
 from datetime import datetime
 
 guest_bp = Blueprint('guest', __name__)
 
+@guest_bp.record_once
+def _upgrade_schema(state):
+    """Add columns and indexes missing from databases created by older versions"""
+    migrations.init_app(state.app)
+
+@guest_bp.record_once
+def _start_quality_buffer(state):
+    """Start the write-behind flusher for guest quality samples"""
+    guest_quality_buffer.init_app(state.app)
+
 @guest_bp.route('/guests', methods=['GET'])
 @jwt_required()
 def get_guests():
     """Get all guests for the current user"""
     current_user_id = get_jwt_identity()
-    guests = Guest.query.filter_by(user_id=current_user_id).all()
-    return jsonify([guest.to_dict() for guest in guests])
+    query, columns = select_columns(Guest, Guest.serialized_fields)
+    guests = query.filter(Guest.user_id == current_user_id).all()
+    # Live quality values may not have been flushed to the database yet
+    return json_response([guest_quality_buffer.overlay(guest)
+                          for guest in rows_to_dicts(guests, Guest.serialized_fields, columns)])
 
 @guest_bp.route('/guests', methods=['POST'])
 @jwt_required()
@@ -47,7 +67,7 @@ def get_guest(guest_id):
     if not guest:
         return jsonify({'error': 'Guest not found'}), 404
     
-    return jsonify(guest.to_dict())
+    return jsonify(guest_quality_buffer.overlay(guest.to_dict()))
 
 @guest_bp.route('/guests/<int:guest_id>', methods=['PUT'])
 @jwt_required()
@@ -79,6 +99,9 @@ def update_guest(guest_id):
     
     db.session.commit()
     
+    if 'is_active' in data:
+        guest_quality_buffer.forget_guest(guest.id)
+    
     return jsonify(guest.to_dict())
 
 @guest_bp.route('/guests/<int:guest_id>', methods=['DELETE'])
@@ -91,9 +114,14 @@ def delete_guest(guest_id):
     if not guest:
         return jsonify({'error': 'Guest not found'}), 404
     
+    # Past sessions are kept but no longer listed for the host
+    GuestSession.query.filter_by(guest_id=guest_id).update({'user_id': None})
     db.session.delete(guest)
     db.session.commit()
     
+    guest_quality_buffer.forget_guest(guest_id)
+    latency_history.discard(current_user_id, f'guest:{guest_id}')
+    
     return '', 204
 
 @guest_bp.route('/guests/<int:guest_id>/regenerate-token', methods=['POST'])
@@ -109,6 +137,8 @@ def regenerate_guest_token(guest_id):
     new_token = guest.generate_new_token()
     db.session.commit()
     
+    guest_quality_buffer.forget_guest(guest_id)
+    
     return jsonify({
         'guest_id': guest_id,
         'new_token': new_token
@@ -143,7 +173,7 @@ def get_guest_by_token(guest_token):
     if not guest:
         return jsonify({'error': 'Invalid or expired guest token'}), 404
     
-    return jsonify(guest.to_dict())
+    return jsonify(guest_quality_buffer.overlay(guest.to_dict()))
 
 @guest_bp.route('/guest-access/<guest_token>/connect', methods=['POST'])
 def connect_guest(guest_token):
@@ -158,6 +188,12 @@ def connect_guest(guest_token):
     
     db.session.commit()
     
+    event_bus.publish(guest.user_id, 'guest_status', f'guest:{guest.id}', {
+        'guest_id': guest.id,
+        'guest_name': guest.guest_name,
+        'is_connected': True
+    })
+    
     return jsonify({
         'status': 'connected',
         'guest_name': guest.guest_name,
@@ -177,39 +213,65 @@ def disconnect_guest(guest_token):
     
     db.session.commit()
     
+    event_bus.publish(guest.user_id, 'guest_status', f'guest:{guest.id}', {
+        'guest_id': guest.id,
+        'guest_name': guest.guest_name,
+        'is_connected': False
+    })
+    
     return jsonify({'status': 'disconnected'})
 
 @guest_bp.route('/guest-access/<guest_token>/update-quality', methods=['POST'])
 def update_guest_quality(guest_token):
-    """Update guest connection quality metrics"""
-    guest = Guest.query.filter_by(guest_token=guest_token, is_active=True).first()
+    """Update guest connection quality metrics.
+
+    Samples are buffered in memory and written to the database in batches.
+    """
+    guest_ref = guest_quality_buffer.resolve(guest_token)
     
-    if not guest:
+    if not guest_ref:
         return jsonify({'error': 'Invalid or expired guest token'}), 404
     
-    data = request.json
+    try:
+        sample = parse_quality_sample(request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
-    if 'latency_ms' in data:
-        guest.latency_ms = data['latency_ms']
-    if 'connection_quality' in data:
-        guest.connection_quality = data['connection_quality']
+    state = guest_quality_buffer.record(guest_ref['guest_id'], sample)
+    if 'latency_ms' in sample:
+        latency_history.record(guest_ref['user_id'], f"guest:{guest_ref['guest_id']}", sample['latency_ms'])
     
-    db.session.commit()
+    event_bus.publish(guest_ref['user_id'], 'guest_quality', f"guest:{guest_ref['guest_id']}:quality", {
+        'guest_id': guest_ref['guest_id'],
+        'latency_ms': state.get('latency_ms'),
+        'connection_quality': state.get('connection_quality')
+    })
     
     return jsonify({'status': 'updated'})
 
 @guest_bp.route('/guest-sessions', methods=['GET'])
 @jwt_required()
 def get_guest_sessions():
-    """Get guest sessions for the current user's guests"""
+    """Get guest sessions for the current user's guests, newest first.
+
+    Paginated by cursor: pass ``?cursor=`` from the ``X-Next-Cursor`` header to get
+    the next page and ``?limit=`` to choose the page size (capped server-side).
+    """
     current_user_id = get_jwt_identity()
     
-    # Get all guests for the current user
-    guest_ids = [g.id for g in Guest.query.filter_by(user_id=current_user_id).all()]
+    # Sessions carry the host id, so the (user_id, connected_at, id) index serves filter and order
+    query, columns = select_columns(GuestSession, GuestSession.serialized_fields)
+    query = query.filter(GuestSession.user_id == current_user_id)
     
-    sessions = GuestSession.query.filter(GuestSession.guest_id.in_(guest_ids)).order_by(GuestSession.connected_at.desc()).all()
+    try:
+        sessions, next_cursor = paginate_desc(
+            query, GuestSession.connected_at, GuestSession.id,
+            request.args.get('cursor'), get_page_size(request.args)
+        )
+    except InvalidCursor:
+        return jsonify({'error': 'Invalid cursor'}), 400
     
-    return jsonify([session.to_dict() for session in sessions])
+    return paginated_response(rows_to_dicts(sessions, GuestSession.serialized_fields, columns), next_cursor)
 
 @guest_bp.route('/guest-sessions', methods=['POST'])
 def create_guest_session():
@@ -226,6 +288,7 @@ def create_guest_session():
     
     session = GuestSession(
         guest_id=guest.id,
+        user_id=guest.user_id,
         session_id=data['session_id']
     )
     
@@ -243,6 +306,16 @@ def end_guest_session(session_id):
     
     session.disconnected_at = datetime.utcnow()
     
+    # Latency summary from the telemetry series, unless the client sent its own
+    telemetry = guest_telemetry.close(session_id)
+    if telemetry:
+        count, total, low, high = telemetry.totals['rtt_ms']
+        if count:
+            session.avg_latency_ms = round(total / count)
+            session.min_latency_ms = round(low)
+            session.max_latency_ms = round(high)
+        session.telemetry_rollups = telemetry.rollup_bytes()
+    
     # Update session metrics if provided
     if 'avg_latency_ms' in data:
         session.avg_latency_ms = data['avg_latency_ms']
@@ -263,3 +336,100 @@ def end_guest_session(session_id):
     
     return jsonify(session.to_dict())
 
+def _evict_idle_telemetry():
+    """Drop abandoned telemetry series from memory, keeping their rollups on the session"""
+    evicted = guest_telemetry.evict_idle()
+    for evicted_id, telemetry in evicted.items():
+        session = db.session.get(GuestSession, evicted_id)
+        if session is not None:
+            session.telemetry_rollups = telemetry.rollup_bytes()
+    if evicted:
+        db.session.commit()
+    return len(evicted)
+
+@guest_bp.route('/guest-sessions/<int:session_id>/telemetry', methods=['POST'])
+def ingest_guest_session_telemetry(session_id):
+    """Ingest per-second link samples for an active guest session (called by WebRTC system).
+
+    Accepts ``{"guest_token", "samples": [{ts, rtt_ms, jitter_ms, packet_loss, bitrate_kbps}]}``
+    or a single sample at the top level. Samples are kept in memory only; the
+    per-minute rollups are persisted when the session ends.
+    """
+    data = request.json or {}
+    
+    guest_ref = guest_quality_buffer.resolve(data.get('guest_token', ''))
+    if not guest_ref:
+        return jsonify({'error': 'Invalid guest token'}), 404
+    
+    telemetry = guest_telemetry.get(session_id)
+    if telemetry is None:
+        session = db.session.get(GuestSession, session_id)
+        if not session or session.disconnected_at is not None:
+            return jsonify({'error': 'Session not found or already ended'}), 404
+        if session.guest_id != guest_ref['guest_id']:
+            return jsonify({'error': 'Session does not belong to this guest'}), 403
+        telemetry = guest_telemetry.open(session_id, session.guest_id)
+        if telemetry is None and _evict_idle_telemetry():
+            telemetry = guest_telemetry.open(session_id, session.guest_id)
+        if telemetry is None:
+            return jsonify({'error': 'Telemetry capacity reached'}), 503
+    elif telemetry.guest_id != guest_ref['guest_id']:
+        return jsonify({'error': 'Session does not belong to this guest'}), 403
+    
+    samples = data.get('samples')
+    if samples is None:
+        samples = [data]
+    if not isinstance(samples, list):
+        return jsonify({'error': 'samples must be a list'}), 400
+    
+    accepted = guest_telemetry.ingest(session_id, samples)
+    if samples and not accepted:
+        return jsonify({'error': 'No valid samples'}), 400
+    
+    if accepted:
+        with telemetry.lock:
+            metrics = telemetry.summary()['metrics']
+        event_bus.publish(guest_ref['user_id'], 'guest_telemetry', f'guest_session:{session_id}:telemetry', {
+            'session_id': session_id,
+            'guest_id': guest_ref['guest_id'],
+            'metrics': metrics
+        })
+    
+    return jsonify({'accepted': accepted})
+
+@guest_bp.route('/guest-sessions/<int:session_id>/telemetry', methods=['GET'])
+@jwt_required()
+def get_guest_session_telemetry(session_id):
+    """Get rolling aggregates, per-minute rollups and recent samples for a guest session.
+
+    Live sessions are served from memory; ended sessions from their stored rollups.
+    ``?recent=`` limits how many raw samples are returned (0 disables them).
+    """
+    current_user_id = get_jwt_identity()
+    
+    session = GuestSession.query.join(Guest, Guest.id == GuestSession.guest_id).filter(
+        GuestSession.id == session_id, Guest.user_id == current_user_id
+    ).first()
+    
+    if not session:
+        return jsonify({'error': 'Session not found'}), 404
+    
+    telemetry = guest_telemetry.get(session_id)
+    if telemetry is None:
+        return json_response({
+            'session_id': session_id,
+            'live': False,
+            'rollups': decode_rollups(session.telemetry_rollups)
+        })
+    
+    try:
+        recent = max(0, int(request.args.get('recent', 60)))
+    except ValueError:
+        return jsonify({'error': 'recent must be an integer'}), 400
+    
+    with telemetry.lock:
+        payload = dict(telemetry.summary(), session_id=session_id, live=True)
+        payload['rollups'] = decode_rollups(telemetry.rollup_bytes())
+        payload['recent'] = telemetry.series.recent(recent)
+    
+    return json_response(payload)
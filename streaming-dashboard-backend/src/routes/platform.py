@@ -2,16 +2,37 @@ from flask import Blueprint, jsonify, request
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from src.models.platform import Platform, StreamSession, db
 from src.models.user import User
+from src.models import migrations
+from src.services.auth_cache import auth_cache
+from src.services.status_poller import snapshot_store
+from src.services.viewer_history import viewer_history
+from src.services.session_metrics import session_metrics
+from src.services.rtmp_endpoints import rtmp_endpoint_cache
+from src.services.rtmp_relay import rtmp_relay
+from src.services.pagination import InvalidCursor, get_page_size, paginate_desc, paginated_response
+from src.services.serialization import json_response, rows_to_dicts, select_columns
+from datetime import datetime, timezone
 
 platform_bp = Blueprint('platform', __name__)
 
+@platform_bp.record_once
+def _upgrade_schema(state):
+    """Add columns and indexes missing from databases created by older versions"""
+    migrations.init_app(state.app)
+
+@platform_bp.record_once
+def _start_session_metrics(state):
+    """Start the write-behind flusher for stream session counters"""
+    session_metrics.init_app(state.app)
+
 @platform_bp.route('/platforms', methods=['GET'])
 @jwt_required()
 def get_platforms():
     """Get all platforms for the current user"""
     current_user_id = get_jwt_identity()
-    platforms = Platform.query.filter_by(user_id=current_user_id).all()
-    return jsonify([platform.to_dict() for platform in platforms])
+    query, columns = select_columns(Platform, Platform.serialized_fields)
+    platforms = query.filter(Platform.user_id == current_user_id).all()
+    return json_response(rows_to_dicts(platforms, Platform.serialized_fields, columns))
 
 @platform_bp.route('/platforms', methods=['POST'])
 @jwt_required()
@@ -37,6 +58,7 @@ def create_platform():
         user_id=current_user_id,
         platform_name=data['platform_name'],
         platform_username=data.get('platform_username'),
+        account_id=data.get('account_id'),
         ingest_url=data.get('ingest_url')
     )
     
@@ -51,6 +73,8 @@ def create_platform():
     db.session.add(platform)
     db.session.commit()
     
+    rtmp_endpoint_cache.invalidate(current_user_id)
+    
     return jsonify(platform.to_dict()), 201
 
 @platform_bp.route('/platforms/<int:platform_id>', methods=['GET'])
@@ -80,6 +104,8 @@ def update_platform(platform_id):
     # Update basic fields
     if 'platform_username' in data:
         platform.platform_username = data['platform_username']
+    if 'account_id' in data:
+        platform.account_id = data['account_id']
     if 'ingest_url' in data:
         platform.ingest_url = data['ingest_url']
     if 'is_active' in data:
@@ -95,6 +121,12 @@ def update_platform(platform_id):
     
     db.session.commit()
     
+    # Identidades autenticadas com os tokens antigos não valem mais
+    if any(field in data for field in ('access_token', 'refresh_token', 'account_id', 'platform_username', 'is_active')):
+        auth_cache.invalidate(current_user_id, platform.platform_name)
+        snapshot_store.discard(current_user_id, platform.id)
+    rtmp_endpoint_cache.invalidate(current_user_id)
+    
     return jsonify(platform.to_dict())
 
 @platform_bp.route('/platforms/<int:platform_id>', methods=['DELETE'])
@@ -110,6 +142,12 @@ def delete_platform(platform_id):
     db.session.delete(platform)
     db.session.commit()
     
+    auth_cache.invalidate(current_user_id, platform.platform_name)
+    snapshot_store.discard(current_user_id, platform_id)
+    viewer_history.discard(current_user_id, platform.platform_name.lower())
+    rtmp_endpoint_cache.invalidate(current_user_id)
+    rtmp_relay.stop(current_user_id, [platform.platform_name])
+    
     return '', 204
 
 @platform_bp.route('/platforms/<int:platform_id>/credentials', methods=['GET'])
@@ -144,13 +182,63 @@ def test_platform_connection(platform_id):
         'message': 'Connection test successful'
     })
 
+def _parse_datetime_arg(name):
+    """Parse an optional ISO 8601 query argument into a naive UTC datetime"""
+    value = request.args.get(name)
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo is not None:
+        # Stored timestamps are naive UTC
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
 @platform_bp.route('/stream-sessions', methods=['GET'])
 @jwt_required()
 def get_stream_sessions():
-    """Get stream sessions for the current user"""
+    """Get stream sessions for the current user, newest first.
+
+    Query arguments: ``since``/``until`` (ISO dates on started_at), ``platform_id``
+    (repeatable or comma-separated), ``fields`` (comma-separated subset of the
+    session fields) and ``cursor``/``limit`` for keyset pagination.
+    """
     current_user_id = get_jwt_identity()
-    sessions = StreamSession.query.filter_by(user_id=current_user_id).order_by(StreamSession.started_at.desc()).all()
-    return jsonify([session.to_dict() for session in sessions])
+    
+    fields = StreamSession.serialized_fields
+    if request.args.get('fields'):
+        fields = [f.strip() for f in request.args['fields'].split(',') if f.strip()]
+        unknown = [f for f in fields if f not in StreamSession.serialized_fields]
+        if unknown:
+            return jsonify({'error': f"Unknown fields: {', '.join(unknown)}"}), 400
+    
+    try:
+        since = _parse_datetime_arg('since')
+        until = _parse_datetime_arg('until')
+        platform_ids = [int(p) for value in request.args.getlist('platform_id') for p in value.split(',') if p]
+    except ValueError:
+        return jsonify({'error': 'Invalid filter value'}), 400
+    
+    # Load only the requested columns (plus the pagination keys), no ORM hydration
+    selected = list(dict.fromkeys(list(fields) + ['id', 'started_at']))
+    query, columns = select_columns(StreamSession, selected)
+    query = query.filter(StreamSession.user_id == current_user_id)
+    
+    if since:
+        query = query.filter(StreamSession.started_at >= since)
+    if until:
+        query = query.filter(StreamSession.started_at < until)
+    if platform_ids:
+        query = query.filter(StreamSession.platform_id.in_(platform_ids))
+    
+    try:
+        sessions, next_cursor = paginate_desc(
+            query, StreamSession.started_at, StreamSession.id,
+            request.args.get('cursor'), get_page_size(request.args)
+        )
+    except InvalidCursor:
+        return jsonify({'error': 'Invalid cursor'}), 400
+    
+    return paginated_response(rows_to_dicts(sessions, fields, columns), next_cursor)
 
 @platform_bp.route('/stream-sessions', methods=['POST'])
 @jwt_required()
@@ -176,13 +264,41 @@ def create_stream_session():
     db.session.add(session)
     db.session.commit()
     
+    session_metrics.track(session.id, current_user_id, session.platform_id)
+    
     return jsonify(session.to_dict()), 201
 
+@platform_bp.route('/stream-sessions/<int:session_id>/messages', methods=['POST'])
+@jwt_required()
+def add_stream_session_messages(session_id):
+    """Count chat messages for an active stream session.
+
+    Counts are accumulated in memory and added to ``total_messages`` in batches.
+    """
+    current_user_id = get_jwt_identity()
+    owner = session_metrics.owner(session_id)
+    
+    if not owner or owner[0] != str(current_user_id):
+        return jsonify({'error': 'Active stream session not found'}), 404
+    
+    count = (request.json or {}).get('count', 1)
+    if not isinstance(count, int) or count < 0:
+        return jsonify({'error': 'count must be a non-negative integer'}), 400
+    
+    session_metrics.add_messages(session_id, count)
+    
+    return jsonify({'status': 'accepted'}), 202
+
 @platform_bp.route('/stream-sessions/<int:session_id>/end', methods=['POST'])
 @jwt_required()
 def end_stream_session(session_id):
     """End a stream session"""
     current_user_id = get_jwt_identity()
+    owner = session_metrics.owner(session_id)
+    if owner and owner[0] == str(current_user_id):
+        # Write pending counters first so the response carries the final values
+        session_metrics.untrack(session_id)
+    
     session = StreamSession.query.filter_by(id=session_id, user_id=current_user_id).first()
     
     if not session:
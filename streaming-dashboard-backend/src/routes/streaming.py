@@ -1,18 +1,45 @@
 """
 Rotas para controle de streaming multicast
 """
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, Response, request, jsonify, current_app, stream_with_context, url_for
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from src.services.platform_integrations import PlatformManager
+from src.services.platform_integrations import PlatformManagerPool
+from src.services.fanout import FanOutExecutor
+from src.services.status_poller import snapshot_store, status_poller
+from src.services.event_bus import event_bus, format_sse
+from src.services.multicast import multicast_orchestrator
+from src.services.jobs import job_queue
+from src.services.rtmp_endpoints import rtmp_endpoint_cache
+from src.services.rtmp_relay import RelayUnavailable, rtmp_relay
+from src.services.serialization import json_response
+from src.services.viewer_history import latency_history, parse_range_args, viewer_history
+from src.services.viewer_analytics import load_matrix, summarize, total_series
 from src.models.platform import Platform
+from src.models.guest import Guest
 from src.models.user import User
-import json
+from src.models import migrations
+import os
+import math
+import time
 import logging
+import functools
 
 logger = logging.getLogger(__name__)
 
 streaming_bp = Blueprint('streaming', __name__)
-platform_manager = PlatformManager()
+# Um PlatformManager por usuário: as integrações guardam estado de autenticação
+manager_pool = PlatformManagerPool()
+status_fanout = FanOutExecutor()
+
+@streaming_bp.record_once
+def _upgrade_schema(state):
+    """Adiciona colunas e índices ausentes em bancos criados por versões anteriores"""
+    migrations.init_app(state.app)
+
+@streaming_bp.record_once
+def _start_status_poller(state):
+    """Inicia a coleta de status em segundo plano quando o blueprint é registrado"""
+    status_poller.init_app(state.app, manager_pool)
 
 @streaming_bp.route('/platforms', methods=['GET'])
 @jwt_required()
@@ -20,6 +47,7 @@ def get_platforms():
     """Lista todas as plataformas disponíveis"""
     try:
         user_id = get_jwt_identity()
+        platform_manager = manager_pool.get(user_id)
         user = User.query.get(user_id)
         
         if not user:
@@ -31,20 +59,22 @@ def get_platforms():
         platforms_data = []
         for platform in user_platforms:
             # Descriptografar credenciais
-            credentials = json.loads(platform.decrypt_credentials())
+            credentials = platform.get_credentials()
             
             # Autenticar com a plataforma
             is_authenticated = platform_manager.authenticate_platform(
-                platform.name, credentials
+                platform.platform_name, credentials, user_id
             )
             
             # Obter status do stream
-            platform_service = platform_manager.get_platform(platform.name)
+            platform_service = platform_manager.get_platform(platform.platform_name)
             status = {"is_live": False, "viewer_count": 0}
             rtmp_info = {"rtmp_url": "", "stream_key": ""}
             
             if is_authenticated and platform_service:
-                status = platform_service.get_stream_status()
+                # Status vem do snapshot do poller; consulta direta apenas se ausente
+                snapshot = status_poller.snapshot(user_id, platform.id)
+                status = snapshot["status"] if snapshot else platform_service.get_stream_status()
                 rtmp_url = platform_service.get_rtmp_url()
                 stream_key = platform_service.get_stream_key() if hasattr(platform_service, 'get_stream_key') else None
                 
@@ -55,7 +85,7 @@ def get_platforms():
             
             platforms_data.append({
                 "id": platform.id,
-                "name": platform.name,
+                "name": platform.platform_name,
                 "display_name": platform.display_name,
                 "is_active": platform.is_active,
                 "is_authenticated": is_authenticated,
@@ -80,23 +110,24 @@ def get_platform_status(platform_id):
     """Obtém status detalhado de uma plataforma específica"""
     try:
         user_id = get_jwt_identity()
+        platform_manager = manager_pool.get(user_id)
         platform = Platform.query.filter_by(id=platform_id, user_id=user_id).first()
         
         if not platform:
             return jsonify({"error": "Plataforma não encontrada"}), 404
         
         # Descriptografar credenciais e autenticar
-        credentials = json.loads(platform.decrypt_credentials())
-        is_authenticated = platform_manager.authenticate_platform(platform.name, credentials)
+        credentials = platform.get_credentials()
+        is_authenticated = platform_manager.authenticate_platform(platform.platform_name, credentials, user_id)
         
         if not is_authenticated:
             return jsonify({
                 "error": "Falha na autenticação com a plataforma",
-                "platform": platform.name
+                "platform": platform.platform_name
             }), 401
         
         # Obter serviço da plataforma
-        platform_service = platform_manager.get_platform(platform.name)
+        platform_service = platform_manager.get_platform(platform.platform_name)
         if not platform_service:
             return jsonify({"error": "Serviço da plataforma não disponível"}), 503
         
@@ -108,7 +139,7 @@ def get_platform_status(platform_id):
         return jsonify({
             "platform": {
                 "id": platform.id,
-                "name": platform.name,
+                "name": platform.platform_name,
                 "display_name": platform.display_name
             },
             "status": status,
@@ -124,59 +155,48 @@ def get_platform_status(platform_id):
         logger.error(f"Erro ao obter status da plataforma {platform_id}: {e}")
         return jsonify({"error": "Erro interno do servidor"}), 500
 
+def _fetch_platform_status(platform_manager, user_id, platform_name, credentials):
+    """Autentica e obtém o status de uma plataforma (executado no pool de fan-out)"""
+    is_authenticated = platform_manager.authenticate_platform(platform_name, credentials, user_id)
+    if not is_authenticated:
+        return {"is_authenticated": False, "error": "Falha na autenticação"}
+
+    platform_service = platform_manager.get_platform(platform_name)
+    if not platform_service:
+        return {"is_authenticated": False, "error": "Serviço não disponível"}
+
+    return {"is_authenticated": True, "status": platform_service.get_stream_status()}
+
 @streaming_bp.route('/status/all', methods=['GET'])
 @jwt_required()
 def get_all_platforms_status():
     """Obtém status de todas as plataformas do usuário"""
     try:
         user_id = get_jwt_identity()
+        platform_manager = manager_pool.get(user_id)
         user_platforms = Platform.query.filter_by(user_id=user_id, is_active=True).all()
         
         all_status = {}
         total_viewers = 0
         active_streams = 0
+        tasks = {}
+        results = {}
         
         for platform in user_platforms:
+            # Snapshots recentes do poller dispensam chamadas às plataformas
+            snapshot = status_poller.snapshot(user_id, platform.id)
+            if snapshot:
+                results[platform.platform_name] = {"ok": True, "result": snapshot, "error": None}
+                continue
+            
             try:
-                # Descriptografar credenciais e autenticar
-                credentials = json.loads(platform.decrypt_credentials())
-                is_authenticated = platform_manager.authenticate_platform(platform.name, credentials)
-                
-                if is_authenticated:
-                    platform_service = platform_manager.get_platform(platform.name)
-                    if platform_service:
-                        status = platform_service.get_stream_status()
-                        all_status[platform.name] = {
-                            "platform_id": platform.id,
-                            "display_name": platform.display_name,
-                            "status": status,
-                            "is_authenticated": True
-                        }
-                        
-                        # Somar visualizadores
-                        if status.get("is_live"):
-                            total_viewers += status.get("viewer_count", 0)
-                            active_streams += 1
-                    else:
-                        all_status[platform.name] = {
-                            "platform_id": platform.id,
-                            "display_name": platform.display_name,
-                            "status": {"is_live": False, "viewer_count": 0},
-                            "is_authenticated": False,
-                            "error": "Serviço não disponível"
-                        }
-                else:
-                    all_status[platform.name] = {
-                        "platform_id": platform.id,
-                        "display_name": platform.display_name,
-                        "status": {"is_live": False, "viewer_count": 0},
-                        "is_authenticated": False,
-                        "error": "Falha na autenticação"
-                    }
-                    
+                # Descriptografar credenciais na thread da requisição (acesso ao ORM)
+                credentials = platform.get_credentials()
+                tasks[platform.platform_name] = functools.partial(_fetch_platform_status, platform_manager, user_id,
+                                                          platform.platform_name, credentials)
             except Exception as e:
-                logger.error(f"Erro ao processar plataforma {platform.name}: {e}")
-                all_status[platform.name] = {
+                logger.error(f"Erro ao processar plataforma {platform.platform_name}: {e}")
+                all_status[platform.platform_name] = {
                     "platform_id": platform.id,
                     "display_name": platform.display_name,
                     "status": {"is_live": False, "viewer_count": 0},
@@ -184,6 +204,45 @@ def get_all_platforms_status():
                     "error": str(e)
                 }
         
+        # Autenticação e status das plataformas sem snapshot, em paralelo
+        fetched = status_fanout.run(tasks)
+        for platform in user_platforms:
+            outcome = fetched.get(platform.platform_name)
+            if outcome and outcome["ok"]:
+                snapshot_store.set(user_id, platform.id, dict(
+                    outcome["result"], platform_id=platform.id, name=platform.platform_name,
+                    display_name=platform.display_name
+                ))
+        results.update(fetched)
+        
+        for platform in user_platforms:
+            if platform.platform_name not in results:
+                continue
+            
+            outcome = results[platform.platform_name]
+            entry = {
+                "platform_id": platform.id,
+                "display_name": platform.display_name,
+                "status": {"is_live": False, "viewer_count": 0},
+                "is_authenticated": False
+            }
+            
+            if not outcome["ok"]:
+                entry["error"] = outcome["error"]
+            elif not outcome["result"]["is_authenticated"]:
+                entry["error"] = outcome["result"].get("error")
+            else:
+                status = outcome["result"]["status"]
+                entry["status"] = status
+                entry["is_authenticated"] = True
+                
+                # Somar visualizadores
+                if status.get("is_live"):
+                    total_viewers += status.get("viewer_count", 0)
+                    active_streams += 1
+            
+            all_status[platform.platform_name] = entry
+        
         return jsonify({
             "platforms": all_status,
             "summary": {
@@ -198,122 +257,386 @@ def get_all_platforms_status():
         logger.error(f"Erro ao obter status de todas as plataformas: {e}")
         return jsonify({"error": "Erro interno do servidor"}), 500
 
+@streaming_bp.route('/events', methods=['GET'])
+@jwt_required()
+def stream_events():
+    """Canal de push (Server-Sent Events) com mudanças de status das plataformas e convidados.
+
+    Envia um evento ``snapshot`` com o estado atual e, em seguida, apenas deltas
+    (audiência, entrada/saída do ar, conexão e latência de convidados). Requer
+    workers com threads (gthread/gevent), pois a conexão permanece aberta.
+    """
+    user_id = get_jwt_identity()
+    subscription = event_bus.subscribe(user_id)
+    if subscription is None:
+        return jsonify({"error": "Limite de conexões de eventos atingido"}), 503
+    
+    heartbeat = float(os.environ.get('EVENTS_HEARTBEAT_INTERVAL', 15))
+    coalesce_window = float(os.environ.get('EVENTS_COALESCE_WINDOW', 0.25))
+    initial_state = {
+        "platforms": {
+            str(platform_id): {
+                "name": snapshot.get("name"),
+                "is_authenticated": snapshot.get("is_authenticated", False),
+                "is_live": snapshot["status"].get("is_live", False),
+                "viewer_count": snapshot["status"].get("viewer_count", 0)
+            }
+            for platform_id, snapshot in snapshot_store.get_user(user_id).items()
+        }
+    }
+    
+    def generate():
+        try:
+            yield format_sse({"type": "snapshot", "data": initial_state, "timestamp": time.time()})
+            while not subscription.closed:
+                events = subscription.drain(heartbeat, coalesce_window)
+                if not events:
+                    # Comentário SSE mantém a conexão viva através de proxies
+                    yield ": keep-alive\n\n"
+                    continue
+                for event in events:
+                    yield format_sse(event)
+        finally:
+            event_bus.unsubscribe(subscription)
+    
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"
+    })
+
+@streaming_bp.route('/rate-limits', methods=['GET'])
+@jwt_required()
+def get_rate_limits():
+    """Saldo restante de rate limit/cota das APIs para as credenciais do usuário"""
+    user_id = get_jwt_identity()
+    platform_manager = manager_pool.get(user_id)
+    return jsonify({"rate_limits": platform_manager.get_rate_limit_status()})
+
+@streaming_bp.route('/analytics/viewers', methods=['GET'])
+@jwt_required()
+def get_viewers_analytics():
+    """Histórico de espectadores por plataforma e total, em colunas prontas para gráficos.
+
+    Parâmetros: ``window`` (segundos) ou ``since``/``until`` (epoch), ``max_points``
+    e ``resolution`` (segundos). A resolução é escolhida automaticamente entre os
+    níveis do histórico para não ultrapassar ``max_points``.
+    """
+    user_id = get_jwt_identity()
+    try:
+        since, until, max_points, resolution = parse_range_args(request.args)
+    except ValueError:
+        return jsonify({"error": "Parâmetros de intervalo inválidos"}), 400
+    
+    history = viewer_history.query(user_id, since, until, max_points, resolution)
+    by_platform = {
+        snapshot["name"].lower(): snapshot["status"].get("viewer_count", 0)
+        for snapshot in snapshot_store.get_user(user_id).values()
+        if snapshot["status"].get("is_live")
+    }
+    
+    return jsonify({
+        "total_viewers": sum(by_platform.values()),
+        "by_platform": by_platform,
+        "resolution": history["resolution"],
+        "since": history["since"],
+        "until": history["until"],
+        "series": history["series"],
+        "total": total_series(history["series"])
+    })
+
+@streaming_bp.route('/analytics/summary', methods=['GET'])
+@jwt_required()
+def get_analytics_summary():
+    """Séries pré-calculadas para os gráficos: total, média móvel, retenção e participação.
+
+    Mesmos parâmetros de /analytics/viewers, mais ``smooth`` (janela da média
+    móvel em segundos, padrão 60).
+    """
+    user_id = get_jwt_identity()
+    try:
+        since, until, max_points, resolution = parse_range_args(request.args)
+        smooth = float(request.args.get('smooth', 60))
+        if not math.isfinite(smooth) or smooth < 0:
+            raise ValueError("smooth inválido")
+    except ValueError:
+        return jsonify({"error": "Parâmetros de intervalo inválidos"}), 400
+    
+    matrix = load_matrix(viewer_history, user_id, since, until, max_points, resolution)
+    return jsonify(dict(summarize(matrix, smooth), since=since, until=until))
+
+@streaming_bp.route('/analytics/latency', methods=['GET'])
+@jwt_required()
+def get_latency_analytics():
+    """Latência atual e histórico por convidado (mesmos parâmetros de /analytics/viewers)"""
+    user_id = get_jwt_identity()
+    try:
+        since, until, max_points, resolution = parse_range_args(request.args)
+    except ValueError:
+        return jsonify({"error": "Parâmetros de intervalo inválidos"}), 400
+    
+    names = dict(Guest.query.with_entities(Guest.id, Guest.guest_name).filter_by(user_id=user_id).all())
+    latest = latency_history.latest(user_id)
+    history = latency_history.query(user_id, since, until, max_points, resolution)
+    
+    guests = []
+    for key, sample in latest.items():
+        guest_id = int(key.split(':', 1)[1])
+        if guest_id in names:
+            guests.append({"guest_id": guest_id, "name": names[guest_id], "latency": sample["value"],
+                           "updated_at": sample["ts"]})
+    recent = [g["latency"] for g in guests if g["updated_at"] >= until - 60]
+    
+    return jsonify({
+        "guests": guests,
+        "average": round(sum(recent) / len(recent), 1) if recent else None,
+        "resolution": history["resolution"],
+        "series": history["series"]
+    })
+
+def _discover(getter):
+    """Valor obtido pela API da plataforma e se ela oferece essa consulta"""
+    try:
+        return getter(), True
+    except NotImplementedError:
+        return None, False
+
+def _build_rtmp_endpoints(platform_manager, user_id):
+    """Autentica cada plataforma ativa e resolve URL de ingest e chave; retorna (endpoints, completo).
+
+    Plataformas sem consulta de chave pela API (YouTube, Facebook, Instagram) usam
+    a URL e a chave cadastradas; como uma nova montagem não mudaria o resultado,
+    elas não deixam a tabela incompleta.
+    """
+    user_platforms = Platform.query.filter_by(user_id=user_id, is_active=True).all()
+    
+    endpoints = {}
+    complete = True
+    
+    for platform in user_platforms:
+        try:
+            # Descriptografar credenciais e autenticar
+            credentials = platform.get_credentials()
+            is_authenticated = platform_manager.authenticate_platform(platform.platform_name, credentials, user_id)
+            
+            if is_authenticated:
+                platform_service = platform_manager.get_platform(platform.platform_name)
+                if platform_service:
+                    rtmp_url, _ = _discover(platform_service.get_rtmp_url)
+                    stream_key, key_discoverable = _discover(platform_service.get_stream_key)
+                    rtmp_url = rtmp_url or platform.ingest_url
+                    stream_key = stream_key or platform.get_stream_key()
+                    
+                    endpoints[platform.platform_name] = {
+                        "platform_id": platform.id,
+                        "display_name": platform.display_name,
+                        "rtmp_url": rtmp_url or "",
+                        "stream_key": stream_key or "CONFIGURE_IN_PLATFORM",
+                        "full_url": f"{rtmp_url}{stream_key}" if rtmp_url and stream_key else "",
+                        "is_ready": bool(rtmp_url and stream_key)
+                    }
+                    # Só vale montar de novo se a API poderia trazer o que falta
+                    complete = complete and (endpoints[platform.platform_name]["is_ready"] or not key_discoverable)
+            else:
+                complete = False
+                
+        except Exception as e:
+            logger.error(f"Erro ao obter RTMP para {platform.platform_name}: {e}")
+            complete = False
+            endpoints[platform.platform_name] = {
+                "platform_id": platform.id,
+                "display_name": platform.display_name,
+                "rtmp_url": "",
+                "stream_key": "",
+                "full_url": "",
+                "is_ready": False,
+                "error": str(e)
+            }
+    
+    return endpoints, complete
+
+def _rtmp_endpoints(user_id):
+    """Tabela de endpoints RTMP do usuário, montada só quando invalidada ou expirada"""
+    return rtmp_endpoint_cache.get(
+        user_id, functools.partial(_build_rtmp_endpoints, manager_pool.get(user_id), user_id))
+
 @streaming_bp.route('/rtmp/endpoints', methods=['GET'])
 @jwt_required()
 def get_rtmp_endpoints():
-    """Obtém endpoints RTMP de todas as plataformas configuradas"""
+    """Obtém endpoints RTMP de todas as plataformas configuradas (servidos da tabela em memória)"""
+    try:
+        table = _rtmp_endpoints(get_jwt_identity())
+        
+        return json_response({
+            "endpoints": table["endpoints"],
+            "total_count": len(table["endpoints"]),
+            "updated_at": table["built_at"]
+        })
+        
+    except Exception as e:
+        logger.error(f"Erro ao obter endpoints RTMP: {e}")
+        return jsonify({"error": "Erro interno do servidor"}), 500
+
+def _multicast_destinations(platform_manager, user_id, platforms):
+    """Destinos do orquestrador: a autenticação roda em paralelo, dentro de cada tarefa"""
+    destinations = []
+    for platform in platforms:
+        platform_service = platform_manager.get_platform(platform.platform_name)
+        if not platform_service:
+            continue
+        credentials = platform.get_credentials()
+        destinations.append({
+            "key": platform.id,
+            "name": platform.platform_name,
+            "service": platform_service,
+            "authenticate": functools.partial(platform_manager.authenticate_platform,
+                                              platform.platform_name, credentials, user_id)
+        })
+    return destinations
+
+def _selected_platforms(user_id, selected_platforms):
+    user_platforms = Platform.query.filter_by(user_id=user_id, is_active=True).all()
+    
+    # Filtrar plataformas selecionadas se especificado
+    if selected_platforms:
+        user_platforms = [p for p in user_platforms if p.id in selected_platforms or p.platform_name in selected_platforms]
+    return user_platforms
+
+def _job_accepted(job, created):
+    """Resposta 202 com o id do job e onde acompanhar o progresso"""
+    if job is None:
+        return jsonify({"error": "Fila de operações cheia, tente novamente"}), 503
+    
+    status_url = url_for('streaming.get_job', job_id=job["id"])
+    response = jsonify({"job_id": job["id"], "status": job["status"], "status_url": status_url,
+                        "created": created})
+    response.status_code = 202
+    response.headers["Location"] = status_url
+    return response
+
+def _start_summary(names, outcomes):
+    results = {names[key]: result for key, result in outcomes.items()}
+    for name in names.values():
+        results.setdefault(name, {"success": False, "message": "Plataforma não suportada"})
+    
+    successful_starts = sum(1 for result in results.values() if result["success"])
+    live_times = [result["live_at"] for result in results.values() if result.get("live_at")]
+    
+    return {
+        "results": results,
+        "summary": {
+            "total_platforms": len(names),
+            "successful_starts": successful_starts,
+            "failed_starts": len(names) - successful_starts,
+            # Diferença entre a primeira e a última plataforma a entrar no ar
+            "go_live_spread_ms": round((max(live_times) - min(live_times)) * 1000) if live_times else None
+        },
+        "message": f"Multicast iniciado em {successful_starts}/{len(names)} plataformas"
+    }
+
+def _stop_summary(names, outcomes):
+    results = {names[key]: result for key, result in outcomes.items()}
+    for name in names.values():
+        results.setdefault(name, {"success": False, "message": "Plataforma não suportada"})
+    
+    successful_stops = sum(1 for result in results.values() if result["success"])
+    
+    return {
+        "results": results,
+        "summary": {
+            "total_platforms": len(names),
+            "successful_stops": successful_stops,
+            "failed_stops": len(names) - successful_stops
+        },
+        "message": f"Multicast parado em {successful_stops}/{len(names)} plataformas"
+    }
+
+def _prepare_summary(names, outcomes):
+    results = {names[key]: result for key, result in outcomes.items()}
+    for name in names.values():
+        results.setdefault(name, {"success": False, "message": "Plataforma não suportada"})
+    
+    prepared = sum(1 for result in results.values() if result["success"])
+    
+    return {
+        "results": results,
+        "summary": {
+            "total_platforms": len(names),
+            "prepared": prepared,
+            "failed": len(names) - prepared,
+            "expires_in": multicast_orchestrator.prepared_ttl
+        },
+        "message": f"Multicast preparado em {prepared}/{len(names)} plataformas"
+    }
+
+@streaming_bp.route('/multicast/prepare', methods=['POST'])
+@jwt_required()
+def prepare_multicast():
+    """Prepara o multicast com antecedência (como job).
+
+    Autentica, cria broadcasts e resolve URLs de ingest e chaves de todas as
+    plataformas, que ficam válidos por MULTICAST_PREPARED_TTL segundos. Um
+    /multicast/start com o mesmo título nesse prazo só coloca os destinos no ar.
+    """
     try:
         user_id = get_jwt_identity()
-        user_platforms = Platform.query.filter_by(user_id=user_id, is_active=True).all()
+        platform_manager = manager_pool.get(user_id)
+        data = request.get_json()
         
-        endpoints = {}
+        title = data.get('title', 'Live Stream')
+        description = data.get('description', '')
         
-        for platform in user_platforms:
-            try:
-                # Descriptografar credenciais e autenticar
-                credentials = json.loads(platform.decrypt_credentials())
-                is_authenticated = platform_manager.authenticate_platform(platform.name, credentials)
-                
-                if is_authenticated:
-                    platform_service = platform_manager.get_platform(platform.name)
-                    if platform_service:
-                        rtmp_url = platform_service.get_rtmp_url()
-                        stream_key = platform_service.get_stream_key() if hasattr(platform_service, 'get_stream_key') else None
-                        
-                        endpoints[platform.name] = {
-                            "platform_id": platform.id,
-                            "display_name": platform.display_name,
-                            "rtmp_url": rtmp_url or "",
-                            "stream_key": stream_key or "CONFIGURE_IN_PLATFORM",
-                            "full_url": f"{rtmp_url}{stream_key}" if rtmp_url and stream_key else "",
-                            "is_ready": bool(rtmp_url and stream_key)
-                        }
-                    
-            except Exception as e:
-                logger.error(f"Erro ao obter RTMP para {platform.name}: {e}")
-                endpoints[platform.name] = {
-                    "platform_id": platform.id,
-                    "display_name": platform.display_name,
-                    "rtmp_url": "",
-                    "stream_key": "",
-                    "full_url": "",
-                    "is_ready": False,
-                    "error": str(e)
-                }
+        user_platforms = _selected_platforms(user_id, data.get('platforms', []))
+        names = {platform.id: platform.platform_name for platform in user_platforms}
+        destinations = _multicast_destinations(platform_manager, user_id, user_platforms)
         
-        return jsonify({
-            "endpoints": endpoints,
-            "total_count": len(endpoints)
-        })
+        def run(progress):
+            return _prepare_summary(names, multicast_orchestrator.prepare(
+                user_id, destinations, title, description, on_result=progress))
+        
+        return _job_accepted(*job_queue.submit(user_id, "multicast_prepare", run, dedupe_key="multicast_prepare",
+                                               platforms=list(names.values())))
         
     except Exception as e:
-        logger.error(f"Erro ao obter endpoints RTMP: {e}")
+        logger.error(f"Erro ao preparar multicast: {e}")
         return jsonify({"error": "Erro interno do servidor"}), 500
 
+@streaming_bp.route('/multicast/streams', methods=['GET'])
+@jwt_required()
+def get_multicast_streams():
+    """Estado de cada destino no orquestrador (preparado, ao vivo) e validade da preparação"""
+    streams = multicast_orchestrator.get_streams(get_jwt_identity())
+    return jsonify({"streams": {str(key): entry for key, entry in streams.items()}})
+
 @streaming_bp.route('/multicast/start', methods=['POST'])
 @jwt_required()
 def start_multicast():
-    """Inicia streaming multicast para todas as plataformas ativas"""
+    """Inicia streaming multicast para todas as plataformas ativas.
+
+    A operação roda como job em segundo plano: a resposta (202) traz o ``job_id``
+    e o progresso de cada plataforma sai em ``/jobs/<id>`` e no canal de eventos.
+    Todas as plataformas são preparadas em paralelo e colocadas no ar juntas;
+    as já preparadas por /multicast/prepare vão direto para a transição.
+    """
     try:
         user_id = get_jwt_identity()
+        platform_manager = manager_pool.get(user_id)
         data = request.get_json()
         
         title = data.get('title', 'Live Stream')
         description = data.get('description', '')
         selected_platforms = data.get('platforms', [])  # Lista de IDs ou nomes de plataformas
         
-        user_platforms = Platform.query.filter_by(user_id=user_id, is_active=True).all()
-        
-        # Filtrar plataformas selecionadas se especificado
-        if selected_platforms:
-            user_platforms = [p for p in user_platforms if p.id in selected_platforms or p.name in selected_platforms]
+        # Consultas ao banco ficam na requisição; o job só conversa com as plataformas
+        user_platforms = _selected_platforms(user_id, selected_platforms)
+        names = {platform.id: platform.platform_name for platform in user_platforms}
+        destinations = _multicast_destinations(platform_manager, user_id, user_platforms)
         
-        results = {}
-        successful_starts = 0
+        def run(progress):
+            return _start_summary(names, multicast_orchestrator.start(
+                user_id, destinations, title, description, on_result=progress))
         
-        for platform in user_platforms:
-            try:
-                # Descriptografar credenciais e autenticar
-                credentials = json.loads(platform.decrypt_credentials())
-                is_authenticated = platform_manager.authenticate_platform(platform.name, credentials)
-                
-                if is_authenticated:
-                    platform_service = platform_manager.get_platform(platform.name)
-                    if platform_service and hasattr(platform_service, 'start_stream'):
-                        success = platform_service.start_stream(title, description)
-                        results[platform.name] = {
-                            "success": success,
-                            "message": "Stream iniciado com sucesso" if success else "Falha ao iniciar stream"
-                        }
-                        if success:
-                            successful_starts += 1
-                    else:
-                        results[platform.name] = {
-                            "success": False,
-                            "message": "Plataforma não suporta início automático de stream"
-                        }
-                else:
-                    results[platform.name] = {
-                        "success": False,
-                        "message": "Falha na autenticação"
-                    }
-                    
-            except Exception as e:
-                logger.error(f"Erro ao iniciar stream em {platform.name}: {e}")
-                results[platform.name] = {
-                    "success": False,
-                    "message": f"Erro: {str(e)}"
-                }
-        
-        return jsonify({
-            "results": results,
-            "summary": {
-                "total_platforms": len(user_platforms),
-                "successful_starts": successful_starts,
-                "failed_starts": len(user_platforms) - successful_starts
-            },
-            "message": f"Multicast iniciado em {successful_starts}/{len(user_platforms)} plataformas"
-        })
+        return _job_accepted(*job_queue.submit(user_id, "multicast_start", run, dedupe_key="multicast_start",
+                                               platforms=list(names.values())))
         
     except Exception as e:
         logger.error(f"Erro ao iniciar multicast: {e}")
@@ -322,106 +645,204 @@ def start_multicast():
 @streaming_bp.route('/multicast/stop', methods=['POST'])
 @jwt_required()
 def stop_multicast():
-    """Para streaming multicast em todas as plataformas ativas"""
+    """Para streaming multicast em todas as plataformas ativas, em paralelo (como job)"""
     try:
         user_id = get_jwt_identity()
+        platform_manager = manager_pool.get(user_id)
         data = request.get_json() or {}
         selected_platforms = data.get('platforms', [])
         
-        user_platforms = Platform.query.filter_by(user_id=user_id, is_active=True).all()
+        user_platforms = _selected_platforms(user_id, selected_platforms)
+        names = {platform.id: platform.platform_name for platform in user_platforms}
+        destinations = _multicast_destinations(platform_manager, user_id, user_platforms)
         
-        # Filtrar plataformas selecionadas se especificado
-        if selected_platforms:
-            user_platforms = [p for p in user_platforms if p.id in selected_platforms or p.name in selected_platforms]
+        def run(progress):
+            return _stop_summary(names, multicast_orchestrator.stop(user_id, destinations, on_result=progress))
         
-        results = {}
-        successful_stops = 0
+        return _job_accepted(*job_queue.submit(user_id, "multicast_stop", run, dedupe_key="multicast_stop",
+                                               platforms=list(names.values())))
         
-        for platform in user_platforms:
-            try:
-                # Descriptografar credenciais e autenticar
-                credentials = json.loads(platform.decrypt_credentials())
-                is_authenticated = platform_manager.authenticate_platform(platform.name, credentials)
-                
-                if is_authenticated:
-                    platform_service = platform_manager.get_platform(platform.name)
-                    if platform_service and hasattr(platform_service, 'stop_stream'):
-                        success = platform_service.stop_stream()
-                        results[platform.name] = {
-                            "success": success,
-                            "message": "Stream parado com sucesso" if success else "Falha ao parar stream"
-                        }
-                        if success:
-                            successful_stops += 1
-                    else:
-                        results[platform.name] = {
-                            "success": False,
-                            "message": "Plataforma não suporta parada automática de stream"
-                        }
-                else:
-                    results[platform.name] = {
-                        "success": False,
-                        "message": "Falha na autenticação"
-                    }
-                    
-            except Exception as e:
-                logger.error(f"Erro ao parar stream em {platform.name}: {e}")
-                results[platform.name] = {
-                    "success": False,
-                    "message": f"Erro: {str(e)}"
-                }
+    except Exception as e:
+        logger.error(f"Erro ao parar multicast: {e}")
+        return jsonify({"error": "Erro interno do servidor"}), 500
+
+@streaming_bp.route('/multicast/refresh', methods=['POST'])
+@jwt_required()
+def refresh_multicast():
+    """Reautentica e atualiza o status das plataformas ativas (como job).
+
+    Descarta as identidades em cache, consulta todas as plataformas em paralelo e
+    grava os resultados nos snapshots usados por /status/all e /platforms.
+    """
+    try:
+        user_id = get_jwt_identity()
+        platform_manager = manager_pool.get(user_id)
+        data = request.get_json(silent=True) or {}
+        
+        user_platforms = _selected_platforms(user_id, data.get('platforms', []))
+        targets = {
+            platform.id: {
+                "name": platform.platform_name,
+                "display_name": platform.display_name,
+                "credentials": platform.get_credentials()
+            }
+            for platform in user_platforms
+        }
+        
+        def run(progress):
+            results = {}
+            # Chaves e URLs de ingest também são resolvidas de novo na próxima leitura
+            rtmp_endpoint_cache.invalidate(user_id)
+            
+            def refresh(platform_id, target):
+                platform_manager.invalidate_authentication(user_id, target["name"])
+                result = _fetch_platform_status(platform_manager, user_id, target["name"], target["credentials"])
+                snapshot_store.set(user_id, platform_id, dict(
+                    result, platform_id=platform_id, name=target["name"], display_name=target["display_name"]
+                ))
+                progress(platform_id, result)
+                return result
+            
+            fetched = status_fanout.run({
+                platform_id: functools.partial(refresh, platform_id, target)
+                for platform_id, target in targets.items()
+            })
+            for platform_id, outcome in fetched.items():
+                results[targets[platform_id]["name"]] = outcome["result"] if outcome["ok"] else {
+                    "is_authenticated": False, "error": outcome["error"]}
+            return {"platforms": results}
+        
+        return _job_accepted(*job_queue.submit(user_id, "multicast_refresh", run, dedupe_key="multicast_refresh",
+                                               platforms=[t["name"] for t in targets.values()]))
+        
+    except Exception as e:
+        logger.error(f"Erro ao atualizar plataformas: {e}")
+        return jsonify({"error": "Erro interno do servidor"}), 500
+
+@streaming_bp.route('/jobs', methods=['GET'])
+@jwt_required()
+def list_jobs():
+    """Jobs recentes do usuário"""
+    return jsonify({"jobs": job_queue.list(get_jwt_identity())})
+
+@streaming_bp.route('/jobs/<job_id>', methods=['GET'])
+@jwt_required()
+def get_job(job_id):
+    """Status e progresso de um job (queued, running, succeeded, failed)"""
+    job = job_queue.get(get_jwt_identity(), job_id)
+    if not job:
+        return jsonify({"error": "Job não encontrado"}), 404
+    return jsonify(job)
+
+def _relay_destinations(user_id, selected_platforms):
+    """URLs de publicação de cada plataforma pronta, para o relay.
+
+    Usa a tabela de endpoints RTMP; destinos preparados pelo orquestrador
+    (YouTube/Facebook criam ingest e chave por transmissão) têm prioridade.
+    """
+    table = _rtmp_endpoints(user_id)
+    prepared = multicast_orchestrator.get_ingest(user_id)
+    
+    destinations = {}
+    for name, endpoint in table["endpoints"].items():
+        if selected_platforms and endpoint["platform_id"] not in selected_platforms and name not in selected_platforms:
+            continue
+        
+        ingest = prepared.get(endpoint["platform_id"])
+        if ingest and ingest["rtmp_url"]:
+            url = f"{ingest['rtmp_url'].rstrip('/')}/{ingest['stream_key']}"
+        elif endpoint["is_ready"]:
+            url = endpoint["full_url"]
+        else:
+            continue
+        destinations[name] = {"url": url, "platform_id": endpoint["platform_id"]}
+    
+    return destinations
+
+@streaming_bp.route('/relay/start', methods=['POST'])
+@jwt_required()
+def start_relay():
+    """Inicia o relay RTMP: um stream recebido no ingest do backend, republicado em cada plataforma.
+
+    O streamer configura uma única saída (``ingest``) e o backend mantém um
+    processo ffmpeg por destino, reiniciado automaticamente em caso de falha.
+    """
+    try:
+        user_id = get_jwt_identity()
+        data = request.get_json(silent=True) or {}
+        
+        destinations = _relay_destinations(user_id, data.get('platforms', []))
+        if not destinations:
+            return jsonify({"error": "Nenhuma plataforma com endpoint RTMP pronto"}), 400
+        
+        workers = rtmp_relay.start(user_id, destinations)
         
         return jsonify({
-            "results": results,
-            "summary": {
-                "total_platforms": len(user_platforms),
-                "successful_stops": successful_stops,
-                "failed_stops": len(user_platforms) - successful_stops
-            },
-            "message": f"Multicast parado em {successful_stops}/{len(user_platforms)} plataformas"
+            "ingest": rtmp_relay.ingest_for(user_id),
+            "destinations": workers,
+            "message": f"Relay iniciado para {len(workers)} plataformas"
         })
         
+    except RelayUnavailable as e:
+        return jsonify({"error": str(e)}), 503
     except Exception as e:
-        logger.error(f"Erro ao parar multicast: {e}")
+        logger.error(f"Erro ao iniciar relay RTMP: {e}")
         return jsonify({"error": "Erro interno do servidor"}), 500
 
-@streaming_bp.route('/obs/config', methods=['GET'])
+@streaming_bp.route('/relay/stop', methods=['POST'])
 @jwt_required()
-def get_obs_config():
-    """Gera configuração para OBS Studio com múltiplos outputs RTMP"""
+def stop_relay():
+    """Encerra o relay RTMP (todas as plataformas ou só as indicadas)"""
     try:
         user_id = get_jwt_identity()
-        user_platforms = Platform.query.filter_by(user_id=user_id, is_active=True).all()
+        data = request.get_json(silent=True) or {}
         
-        obs_outputs = []
+        stopped = rtmp_relay.stop(user_id, data.get('platforms') or None)
         
-        for platform in user_platforms:
-            try:
-                # Descriptografar credenciais e autenticar
-                credentials = json.loads(platform.decrypt_credentials())
-                is_authenticated = platform_manager.authenticate_platform(platform.name, credentials)
-                
-                if is_authenticated:
-                    platform_service = platform_manager.get_platform(platform.name)
-                    if platform_service:
-                        rtmp_url = platform_service.get_rtmp_url()
-                        stream_key = platform_service.get_stream_key() if hasattr(platform_service, 'get_stream_key') else None
-                        
-                        if rtmp_url and stream_key:
-                            obs_outputs.append({
-                                "name": f"{platform.display_name} Stream",
-                                "type": "rtmp_output",
-                                "settings": {
-                                    "server": rtmp_url,
-                                    "key": stream_key,
-                                    "use_auth": False
-                                },
-                                "platform": platform.name,
-                                "platform_id": platform.id
-                            })
-                        
-            except Exception as e:
-                logger.error(f"Erro ao gerar config OBS para {platform.name}: {e}")
+        return jsonify({
+            "stopped": stopped,
+            "destinations": rtmp_relay.status(user_id),
+            "message": f"Relay encerrado em {stopped} plataformas"
+        })
+        
+    except Exception as e:
+        logger.error(f"Erro ao parar relay RTMP: {e}")
+        return jsonify({"error": "Erro interno do servidor"}), 500
+
+@streaming_bp.route('/relay/status', methods=['GET'])
+@jwt_required()
+def get_relay_status():
+    """Estado de cada processo do relay (no ar, em backoff), reinícios e bytes enviados"""
+    user_id = get_jwt_identity()
+    return jsonify({
+        "enabled": rtmp_relay.enabled,
+        "ingest": rtmp_relay.ingest_for(user_id) if rtmp_relay.enabled else None,
+        "destinations": rtmp_relay.status(user_id)
+    })
+
+@streaming_bp.route('/obs/config', methods=['GET'])
+@jwt_required()
+def get_obs_config():
+    """Gera configuração para OBS Studio com múltiplos outputs RTMP (a partir da tabela em memória)"""
+    try:
+        user_id = get_jwt_identity()
+        table = _rtmp_endpoints(user_id)
+        
+        obs_outputs = [
+            {
+                "name": f"{endpoint['display_name']} Stream",
+                "type": "rtmp_output",
+                "settings": {
+                    "server": endpoint["rtmp_url"],
+                    "key": endpoint["stream_key"],
+                    "use_auth": False
+                },
+                "platform": name,
+                "platform_id": endpoint["platform_id"]
+            }
+            for name, endpoint in table["endpoints"].items()
+            if endpoint["is_ready"]
+        ]
         
         # Configuração completa do OBS
         obs_config = {
@@ -453,7 +874,18 @@ def get_obs_config():
             ]
         }
         
-        return jsonify(obs_config)
+        if rtmp_relay.enabled:
+            # Uma única saída: o backend republica o stream em todas as plataformas
+            obs_config["relay"] = rtmp_relay.ingest_for(user_id)
+            obs_config["instructions"] = [
+                "1. Abra o OBS Studio",
+                "2. Vá em Configurações > Stream e escolha 'Personalizado'",
+                "3. Use o servidor e a chave de 'relay' (uma única saída, sem plugins)",
+                "4. Inicie o relay pelo painel (/relay/start) e comece a transmitir",
+                "5. O backend envia o stream para cada plataforma em 'multicast_outputs'"
+            ]
+        
+        return json_response(obs_config)
         
     except Exception as e:
         logger.error(f"Erro ao gerar configuração OBS: {e}")
@@ -0,0 +1,110 @@
+"""
+Cache de identidades autenticadas nas plataformas de streaming
+"""
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL = float(os.environ.get('AUTH_CACHE_TTL', 900))
+# Margem de segurança antes da expiração real do token
+EXPIRY_MARGIN = 60
+
+
+def credentials_fingerprint(credentials: Dict[str, Any]) -> str:
+    """Gera uma impressão digital estável das credenciais (sem armazená-las)"""
+    payload = json.dumps(credentials, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def token_expiry(credentials: Dict[str, Any]) -> Optional[float]:
+    """Extrai o instante de expiração do token (epoch) das credenciais, se informado"""
+    expires_at = credentials.get("expires_at")
+    if expires_at:
+        try:
+            return float(expires_at)
+        except (TypeError, ValueError):
+            try:
+                return datetime.fromisoformat(str(expires_at).replace("Z", "+00:00")).timestamp()
+            except ValueError:
+                return None
+
+    expires_in = credentials.get("expires_in")
+    if expires_in:
+        try:
+            return time.time() + float(expires_in)
+        except (TypeError, ValueError):
+            return None
+
+    return None
+
+
+class AuthCache:
+    """Armazena identidades validadas (broadcaster_id, channel_id, page_id...) por usuário e plataforma.
+
+    Cada entrada é associada à impressão digital das credenciais usadas na
+    autenticação: se as credenciais mudarem, a entrada deixa de valer. O TTL é o
+    menor entre o padrão configurado e o tempo restante até a expiração do token.
+    """
+
+    def __init__(self, default_ttl: float = DEFAULT_TTL):
+        self.default_ttl = default_ttl
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(user_id, platform_name: str):
+        return (str(user_id), platform_name.lower())
+
+    def get(self, user_id, platform_name: str, fingerprint: str) -> Optional[Dict[str, Any]]:
+        """Retorna a identidade em cache ou None se ausente, expirada ou de outras credenciais"""
+        key = self._key(user_id, platform_name)
+        with self._lock:
+            entry = self._entries.get(key)
+            if not entry:
+                return None
+            if entry["fingerprint"] != fingerprint or entry["expires_at"] <= time.time():
+                del self._entries[key]
+                return None
+            return entry["identity"]
+
+    def set(self, user_id, platform_name: str, fingerprint: str, identity: Dict[str, Any],
+            token_expires_at: Optional[float] = None):
+        """Armazena a identidade validada"""
+        expires_at = time.time() + self.default_ttl
+        if token_expires_at:
+            expires_at = min(expires_at, token_expires_at - EXPIRY_MARGIN)
+
+        if expires_at <= time.time():
+            return
+
+        with self._lock:
+            self._entries[self._key(user_id, platform_name)] = {
+                "fingerprint": fingerprint,
+                "identity": identity,
+                "expires_at": expires_at
+            }
+
+    def invalidate(self, user_id, platform_name: Optional[str] = None):
+        """Remove as identidades de um usuário (de uma plataforma ou de todas)"""
+        with self._lock:
+            if platform_name:
+                self._entries.pop(self._key(user_id, platform_name), None)
+                return
+
+            for key in [k for k in self._entries if k[0] == str(user_id)]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# Cache compartilhado pelo processo
+auth_cache = AuthCache()
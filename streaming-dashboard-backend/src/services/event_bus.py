@@ -0,0 +1,122 @@
+"""
+Barramento de eventos em memória para o canal de push (Server-Sent Events)
+"""
+import os
+import json
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class Subscription:
+    """Fila de eventos pendentes de um cliente conectado.
+
+    Eventos com a mesma chave são coalescidos (apenas o mais recente é mantido),
+    então um cliente lento recebe o estado atual em vez de todo o histórico. Se
+    ainda assim a fila passar de ``max_pending`` chaves, os eventos mais antigos são
+    descartados e o cliente recebe um evento ``resync`` para recarregar o estado.
+    """
+
+    def __init__(self, topic: str, max_pending: int):
+        self.topic = topic
+        self.max_pending = max_pending
+        self._pending = OrderedDict()
+        self._overflowed = False
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def push(self, key: str, event: Dict[str, Any]):
+        with self._cond:
+            if key in self._pending:
+                self._pending[key] = event
+            else:
+                if len(self._pending) >= self.max_pending:
+                    self._pending.popitem(last=False)
+                    self._overflowed = True
+                self._pending[key] = event
+            self._cond.notify()
+
+    def drain(self, timeout: float, coalesce_window: float = 0.0) -> List[Dict[str, Any]]:
+        """Aguarda até ``timeout`` por eventos e retorna todos os pendentes"""
+        with self._cond:
+            if not self._pending and not self._closed:
+                self._cond.wait(timeout)
+
+        # Janela curta para agrupar rajadas de atualizações em um único envio
+        if coalesce_window and self._pending:
+            time.sleep(coalesce_window)
+
+        with self._cond:
+            events = list(self._pending.values())
+            self._pending.clear()
+            if self._overflowed:
+                events.insert(0, {"type": "resync", "data": {}, "timestamp": time.time()})
+                self._overflowed = False
+            return events
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+
+class EventBus:
+    """Distribui eventos por tópico (um tópico por usuário) para as assinaturas ativas"""
+
+    def __init__(self, max_pending: Optional[int] = None, max_subscribers: Optional[int] = None):
+        self.max_pending = max_pending or int(os.environ.get('EVENTS_MAX_PENDING', 256))
+        self.max_subscribers = max_subscribers or int(os.environ.get('EVENTS_MAX_SUBSCRIBERS', 500))
+        self._subscriptions = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, topic) -> Optional[Subscription]:
+        """Cria uma assinatura para o tópico, ou None se o limite de clientes foi atingido"""
+        topic = str(topic)
+        with self._lock:
+            if self.subscriber_count() >= self.max_subscribers:
+                return None
+            subscription = Subscription(topic, self.max_pending)
+            self._subscriptions.setdefault(topic, set()).add(subscription)
+            return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        subscription.close()
+        with self._lock:
+            subscribers = self._subscriptions.get(subscription.topic)
+            if subscribers:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscriptions[subscription.topic]
+
+    def publish(self, topic, event_type: str, key: str, data: Dict[str, Any]):
+        """Publica um evento; eventos com a mesma chave substituem os ainda não enviados"""
+        with self._lock:
+            subscribers = list(self._subscriptions.get(str(topic), ()))
+
+        if not subscribers:
+            return
+
+        event = {"type": event_type, "data": data, "timestamp": time.time()}
+        for subscription in subscribers:
+            subscription.push(key, event)
+
+    def subscriber_count(self) -> int:
+        return sum(len(subscribers) for subscribers in self._subscriptions.values())
+
+
+def format_sse(event: Dict[str, Any]) -> str:
+    """Formata um evento no protocolo text/event-stream"""
+    payload = json.dumps(dict(event["data"], timestamp=event["timestamp"]), default=str)
+    return f"event: {event['type']}\ndata: {payload}\n\n"
+
+
+# Barramento compartilhado pelo processo
+event_bus = EventBus()
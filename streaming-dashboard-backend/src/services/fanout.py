@@ -0,0 +1,102 @@
+"""
+Execução paralela limitada de chamadas às plataformas de streaming
+"""
+import os
+import time
+import logging
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Optional
+
+from src.services.http_transport import request_deadline
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_WORKERS = int(os.environ.get('PLATFORM_FANOUT_WORKERS', 8))
+DEFAULT_TIMEOUT = float(os.environ.get('PLATFORM_FANOUT_TIMEOUT', 8))
+
+
+class FanOutExecutor:
+    """Distribui tarefas independentes (uma por plataforma) em um pool limitado de threads.
+
+    Cada tarefa tem o próprio prazo, contado de quando começa a executar: uma
+    tarefa que esperou na fila atrás de outras não perde seu tempo. O mesmo prazo
+    vale para as chamadas HTTP feitas dentro dela (``request_deadline``), então o
+    retry do transporte não segura a thread do pool depois que a tarefa foi
+    abandonada. Tarefas que nem começaram depois de ``timeout`` na fila são
+    canceladas.
+    """
+
+    def __init__(self, max_workers: int = DEFAULT_MAX_WORKERS, timeout: float = DEFAULT_TIMEOUT):
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="platform-fanout")
+
+    @staticmethod
+    def _run_task(task: Callable[[], Any], started: Dict[str, float], key: str, timeout: float) -> Any:
+        started[key] = time.time()
+        with request_deadline(started[key] + timeout):
+            return task()
+
+    def run(self, tasks: Dict[str, Callable[[], Any]], timeout: Optional[float] = None) -> Dict[str, Dict[str, Any]]:
+        """Executa todas as tarefas em paralelo e retorna o resultado de cada uma.
+
+        Cada entrada do retorno tem a forma ``{"ok": bool, "result": ..., "error": str}``.
+        Tarefas que não terminam dentro do tempo limite são reportadas com
+        ``"timed_out": True`` e não bloqueiam as demais.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        submitted_at = time.time()
+        started = {}
+        futures = {key: self._executor.submit(self._run_task, task, started, key, timeout)
+                   for key, task in tasks.items()}
+
+        results = {}
+        pending = dict(futures)
+        while pending:
+            now = time.time()
+            deadlines = {}
+            for key, future in list(pending.items()):
+                if future.done():
+                    results[key] = self._outcome(key, future)
+                    del pending[key]
+                    continue
+                start = started.get(key)
+                if start is None:
+                    # Ainda na fila: cancelada se não começar até ``timeout`` depois da submissão
+                    if now < submitted_at + timeout:
+                        deadlines[key] = submitted_at + timeout
+                        continue
+                    if future.cancel():
+                        results[key] = self._timed_out(key, timeout)
+                        del pending[key]
+                        continue
+                    # Começou agora: o prazo conta a partir daqui
+                    start = started.get(key, now)
+                if now >= start + timeout:
+                    results[key] = self._timed_out(key, timeout)
+                    del pending[key]
+                    continue
+                deadlines[key] = start + timeout
+
+            if pending:
+                wait(pending.values(), timeout=max(0.0, min(deadlines.values()) - time.time()),
+                     return_when=FIRST_COMPLETED)
+
+        return {key: results[key] for key in futures}
+
+    @staticmethod
+    def _timed_out(key: str, timeout: float) -> Dict[str, Any]:
+        logger.warning(f"Tempo limite excedido para {key} ({timeout}s)")
+        return {"ok": False, "result": None, "error": "Tempo limite excedido", "timed_out": True}
+
+    @staticmethod
+    def _outcome(key: str, future) -> Dict[str, Any]:
+        try:
+            return {"ok": True, "result": future.result(), "error": None}
+        except Exception as e:
+            logger.error(f"Erro na tarefa paralela {key}: {e}")
+            return {"ok": False, "result": None, "error": str(e)}
+
+    def shutdown(self):
+        """Encerra o pool de threads"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
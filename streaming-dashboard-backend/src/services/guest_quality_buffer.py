@@ -0,0 +1,183 @@
+"""
+Buffer write-behind para as métricas de qualidade enviadas pelos convidados
+"""
+import os
+import time
+import atexit
+import logging
+import threading
+from typing import Any, Dict, Optional
+
+from sqlalchemy import bindparam, update
+
+logger = logging.getLogger(__name__)
+
+QUALITY_FIELDS = ('latency_ms', 'connection_quality')
+CONNECTION_QUALITIES = ('good', 'fair', 'poor', 'unknown')
+# Latência acima disso (ms) não é uma medida válida
+MAX_LATENCY_MS = 600000
+
+
+def parse_quality_sample(data: Any) -> Dict[str, Any]:
+    """Valida e normaliza uma amostra enviada pelo convidado; ValueError (mensagem da API) se inválida.
+
+    A validação acontece antes do buffer: um valor inválido enfileirado faria o
+    lote inteiro falhar a cada gravação.
+    """
+    if not isinstance(data, dict):
+        raise ValueError('Request body must be a JSON object')
+
+    sample = {}
+    latency = data.get('latency_ms')
+    if latency is not None:
+        if isinstance(latency, bool) or not isinstance(latency, (int, float)) \
+                or not 0 <= latency <= MAX_LATENCY_MS:
+            raise ValueError(f'latency_ms must be a number between 0 and {MAX_LATENCY_MS}')
+        sample['latency_ms'] = int(round(latency))
+
+    quality = data.get('connection_quality')
+    if quality is not None:
+        if quality not in CONNECTION_QUALITIES:
+            raise ValueError(f"connection_quality must be one of: {', '.join(CONNECTION_QUALITIES)}")
+        sample['connection_quality'] = quality
+
+    return sample
+
+
+class GuestQualityBuffer:
+    """Mantém a última amostra de qualidade de cada convidado em memória.
+
+    As amostras chegam várias vezes por segundo; em vez de um commit por amostra,
+    apenas a mais recente de cada convidado é guardada e todas são gravadas em
+    uma única transação a cada ``flush_interval`` segundos ou quando há mais de
+    ``max_pending`` convidados pendentes. Leituras do estado ao vivo usam o buffer.
+
+    Tokens resolvidos ficam em cache por ``token_ttl`` segundos: com vários
+    workers, ``forget_guest`` só limpa o cache do próprio processo, então um token
+    revogado em outro worker deixa de ser aceito depois desse prazo.
+    """
+
+    def __init__(self, flush_interval: Optional[float] = None, max_pending: Optional[int] = None,
+                 max_tokens: int = 10000, token_ttl: Optional[float] = None):
+        self.flush_interval = flush_interval or float(os.environ.get('GUEST_QUALITY_FLUSH_INTERVAL', 5))
+        self.max_pending = max_pending or int(os.environ.get('GUEST_QUALITY_MAX_PENDING', 500))
+        self.max_tokens = max_tokens
+        self.token_ttl = token_ttl or float(os.environ.get('GUEST_TOKEN_CACHE_TTL', 30))
+
+        self.app = None
+        self._latest = {}
+        self._dirty = set()
+        # token -> (referência do convidado, validade)
+        self._tokens = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def init_app(self, app):
+        """Associa o buffer à aplicação e inicia a thread de gravação"""
+        self.app = app
+        if self._thread and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, name="guest-quality-flush", daemon=True)
+        self._thread.start()
+        atexit.register(self.flush)
+
+    def resolve(self, guest_token: str) -> Optional[Dict[str, Any]]:
+        """Resolve o token de um convidado ativo, consultando o banco no máximo a cada ``token_ttl``"""
+        cached = self._tokens.get(guest_token)
+        if cached is not None and time.time() < cached[1]:
+            return cached[0]
+
+        from src.models.guest import Guest
+        guest = Guest.query.filter_by(guest_token=guest_token, is_active=True).first()
+        if not guest:
+            return None
+
+        ref = {'guest_id': guest.id, 'user_id': guest.user_id}
+        with self._lock:
+            if len(self._tokens) >= self.max_tokens:
+                self._tokens.clear()
+            self._tokens[guest_token] = (ref, time.time() + self.token_ttl)
+        return ref
+
+    def record(self, guest_id: int, sample: Dict[str, Any]) -> Dict[str, Any]:
+        """Registra uma amostra e retorna o estado de qualidade atual do convidado"""
+        sample = {key: sample[key] for key in QUALITY_FIELDS if key in sample}
+        with self._lock:
+            state = dict(self._latest.get(guest_id, {}), **sample)
+            self._latest[guest_id] = state
+            if sample:
+                self._dirty.add(guest_id)
+            pending = len(self._dirty)
+
+        if pending >= self.max_pending:
+            self._wakeup.set()
+        return state
+
+    def get(self, guest_id: int) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            state = self._latest.get(guest_id)
+            return dict(state) if state else None
+
+    def overlay(self, guest: Dict[str, Any]) -> Dict[str, Any]:
+        """Aplica ao dicionário de um convidado os valores mais recentes do buffer"""
+        state = self.get(guest['id'])
+        if state:
+            guest.update(state)
+        return guest
+
+    def forget_guest(self, guest_id: int):
+        """Descarta estado e tokens de um convidado (token regenerado, removido ou desativado)"""
+        with self._lock:
+            self._latest.pop(guest_id, None)
+            self._dirty.discard(guest_id)
+            for token in [t for t, (ref, _) in self._tokens.items() if ref['guest_id'] == guest_id]:
+                del self._tokens[token]
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Erro ao gravar métricas de qualidade dos convidados: {e}")
+
+    def flush(self) -> int:
+        """Grava todas as amostras pendentes em uma única transação"""
+        if self.app is None:
+            return 0
+
+        with self._lock:
+            dirty = self._dirty
+            self._dirty = set()
+            rows = [dict(self._latest[guest_id], gid=guest_id) for guest_id in dirty if guest_id in self._latest]
+
+        if not rows:
+            return 0
+
+        # executemany exige as mesmas colunas em todas as linhas de um lote
+        batches = {}
+        for row in rows:
+            batches.setdefault(tuple(sorted(row)), []).append(row)
+
+        from src.models.guest import Guest, db
+        table = Guest.__table__
+        # UPDATE do Core: convidados removidos nesse meio tempo só não atualizam nenhuma linha
+        statement = update(table).where(table.c.id == bindparam('gid'))
+        with self.app.app_context():
+            try:
+                for batch in batches.values():
+                    db.session.execute(statement, batch)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                # Devolver ao buffer para a próxima tentativa
+                with self._lock:
+                    self._dirty.update(row['gid'] for row in rows)
+                raise
+
+        return len(rows)
+
+
+guest_quality_buffer = GuestQualityBuffer()
@@ -0,0 +1,269 @@
+"""
+Série temporal compacta da telemetria de conexão dos convidados
+"""
+import os
+import time
+import math
+import struct
+import bisect
+import logging
+import threading
+from array import array
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+METRICS = ('rtt_ms', 'jitter_ms', 'packet_loss', 'bitrate_kbps')
+PERCENTILE_METRICS = ('rtt_ms', 'jitter_ms')
+PERCENTILES = (50, 95, 99)
+
+# Rollup por minuto: início (epoch), nº de amostras e, por métrica, média/mínimo/máximo
+ROLLUP_STRUCT = struct.Struct('<dI' + 'fff' * len(METRICS))
+# Maior valor representável em float32 (formato dos rollups e do buffer)
+FLOAT32_MAX = 3.4028234663852886e38
+
+
+class RingSeries:
+    """Buffer circular de tamanho fixo com timestamps e uma coluna float32 por métrica"""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.timestamps = array('d', [0.0] * capacity)
+        self.values = {metric: array('f', [math.nan] * capacity) for metric in METRICS}
+        self.count = 0
+        self.head = 0
+
+    def append(self, timestamp: float, sample: Dict[str, float]) -> Optional[Dict[str, float]]:
+        """Adiciona uma amostra; retorna a amostra descartada quando o buffer está cheio"""
+        evicted = None
+        if self.count == self.capacity:
+            evicted = {metric: self.values[metric][self.head] for metric in METRICS}
+
+        self.timestamps[self.head] = timestamp
+        for metric in METRICS:
+            self.values[metric][self.head] = sample.get(metric, math.nan)
+
+        self.head = (self.head + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+        return evicted
+
+    def recent(self, limit: int) -> List[Dict[str, Any]]:
+        """Últimas ``limit`` amostras, da mais antiga para a mais nova"""
+        limit = min(limit, self.count)
+        start = (self.head - limit) % self.capacity
+        samples = []
+        for offset in range(limit):
+            i = (start + offset) % self.capacity
+            sample = {'ts': self.timestamps[i]}
+            for metric in METRICS:
+                value = self.values[metric][i]
+                sample[metric] = None if math.isnan(value) else round(value, 3)
+            samples.append(sample)
+        return samples
+
+
+class SessionTelemetry:
+    """Telemetria de uma sessão: janela recente, agregados incrementais e rollups por minuto"""
+
+    def __init__(self, guest_id: int, window: int, ewma_alpha: float, max_rollups: int):
+        self.guest_id = guest_id
+        self.series = RingSeries(window)
+        self.ewma_alpha = ewma_alpha
+        self.max_rollups = max_rollups
+        self.ewma = {}
+        # Valores da janela mantidos ordenados para percentis em O(1)
+        self.sorted_window = {metric: [] for metric in PERCENTILE_METRICS}
+        self.totals = {metric: [0, 0.0, math.inf, -math.inf] for metric in METRICS}
+        self.rollups = bytearray()
+        self._minute = None
+        self._minute_stats = None
+        # Última amostra recebida (relógio do servidor), para descartar sessões abandonadas
+        self.last_seen = time.time()
+        self.lock = threading.Lock()
+
+    def ingest(self, timestamp: float, sample: Dict[str, float]):
+        evicted = self.series.append(timestamp, sample)
+
+        for metric in PERCENTILE_METRICS:
+            window = self.sorted_window[metric]
+            if evicted and not math.isnan(evicted[metric]):
+                index = bisect.bisect_left(window, evicted[metric])
+                if index < len(window):
+                    del window[index]
+            if metric in sample:
+                # Mesmo arredondamento float32 do buffer, para a remoção achar o valor
+                bisect.insort(window, array('f', [sample[metric]])[0])
+
+        minute = int(timestamp // 60) * 60
+        if minute != self._minute:
+            self._close_minute()
+            self._minute = minute
+            self._minute_stats = {metric: [0, 0.0, math.inf, -math.inf] for metric in METRICS}
+
+        for metric, value in sample.items():
+            previous = self.ewma.get(metric)
+            self.ewma[metric] = value if previous is None else previous + self.ewma_alpha * (value - previous)
+            for stats in (self.totals[metric], self._minute_stats[metric]):
+                stats[0] += 1
+                stats[1] += value
+                stats[2] = min(stats[2], value)
+                stats[3] = max(stats[3], value)
+
+    def _pack_minute(self) -> bytes:
+        count = max(stats[0] for stats in self._minute_stats.values())
+        fields = []
+        for metric in METRICS:
+            n, total, low, high = self._minute_stats[metric]
+            fields.extend((total / n, low, high) if n else (math.nan, math.nan, math.nan))
+        return ROLLUP_STRUCT.pack(self._minute, count, *fields)
+
+    def _close_minute(self):
+        if self._minute is None:
+            return
+
+        self.rollups += self._pack_minute()
+
+        # Descartar os rollups mais antigos além do limite
+        excess = len(self.rollups) - self.max_rollups * ROLLUP_STRUCT.size
+        if excess > 0:
+            del self.rollups[:excess]
+
+    def percentiles(self, metric: str) -> Dict[str, Optional[float]]:
+        window = self.sorted_window[metric]
+        if not window:
+            return {f'p{p}': None for p in PERCENTILES}
+        return {f'p{p}': round(window[min(len(window) - 1, int(len(window) * p / 100))], 3)
+                for p in PERCENTILES}
+
+    def summary(self) -> Dict[str, Any]:
+        data = {'guest_id': self.guest_id, 'samples': self.series.count, 'metrics': {}}
+        for metric in METRICS:
+            n, total, low, high = self.totals[metric]
+            entry = {
+                'ewma': round(self.ewma[metric], 3) if metric in self.ewma else None,
+                'avg': round(total / n, 3) if n else None,
+                'min': low if n else None,
+                'max': high if n else None
+            }
+            if metric in PERCENTILE_METRICS:
+                entry.update(self.percentiles(metric))
+            data['metrics'][metric] = entry
+        return data
+
+    def rollup_bytes(self) -> bytes:
+        """Rollups fechados mais o minuto corrente, no formato binário fixo"""
+        data = bytes(self.rollups)
+        if self._minute is not None:
+            data += self._pack_minute()
+        return data[-self.max_rollups * ROLLUP_STRUCT.size:]
+
+
+def decode_rollups(data: Optional[bytes]) -> List[Dict[str, Any]]:
+    """Converte rollups binários em dicionários para a API"""
+    rollups = []
+    for values in ROLLUP_STRUCT.iter_unpack(data or b''):
+        rollup = {'ts': values[0], 'samples': values[1]}
+        for i, metric in enumerate(METRICS):
+            avg, low, high = values[2 + i * 3:5 + i * 3]
+            rollup[metric] = None if math.isnan(avg) else {
+                'avg': round(avg, 3), 'min': round(low, 3), 'max': round(high, 3)
+            }
+        rollups.append(rollup)
+    return rollups
+
+
+def _number(value, limit: float = math.inf) -> Optional[float]:
+    """Valor numérico finito (e com módulo até ``limit``) enviado pelo cliente, ou None"""
+    if isinstance(value, bool):
+        return None
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return number if math.isfinite(number) and abs(number) <= limit else None
+
+
+class GuestTelemetryStore:
+    """Telemetria em memória de todas as sessões de convidados ativas.
+
+    Sessões que não recebem amostras por ``idle_ttl`` segundos (convidado que caiu
+    sem encerrar a sessão) podem ser descartadas por ``evict_idle`` para liberar
+    espaço quando ``max_sessions`` é atingido.
+    """
+
+    def __init__(self, window: Optional[int] = None, ewma_alpha: Optional[float] = None,
+                 max_rollups: Optional[int] = None, max_sessions: Optional[int] = None,
+                 idle_ttl: Optional[float] = None):
+        self.window = window or int(os.environ.get('GUEST_TELEMETRY_WINDOW', 300))
+        self.ewma_alpha = ewma_alpha or float(os.environ.get('GUEST_TELEMETRY_EWMA_ALPHA', 0.2))
+        self.max_rollups = max_rollups or int(os.environ.get('GUEST_TELEMETRY_MAX_ROLLUPS', 1440))
+        self.max_sessions = max_sessions or int(os.environ.get('GUEST_TELEMETRY_MAX_SESSIONS', 1000))
+        self.idle_ttl = idle_ttl or float(os.environ.get('GUEST_TELEMETRY_IDLE_TTL', 300))
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def get(self, session_id: int) -> Optional[SessionTelemetry]:
+        return self._sessions.get(session_id)
+
+    def open(self, session_id: int, guest_id: int) -> Optional[SessionTelemetry]:
+        """Obtém (ou cria) a série de uma sessão; None se o limite de sessões foi atingido"""
+        with self._lock:
+            telemetry = self._sessions.get(session_id)
+            if telemetry is None:
+                if len(self._sessions) >= self.max_sessions:
+                    return None
+                telemetry = SessionTelemetry(guest_id, self.window, self.ewma_alpha, self.max_rollups)
+                self._sessions[session_id] = telemetry
+            return telemetry
+
+    def evict_idle(self) -> Dict[int, SessionTelemetry]:
+        """Remove as sessões sem amostras há mais de ``idle_ttl`` segundos e as retorna"""
+        cutoff = time.time() - self.idle_ttl
+        with self._lock:
+            idle = [session_id for session_id, telemetry in self._sessions.items()
+                    if telemetry.last_seen < cutoff]
+            evicted = {session_id: self._sessions.pop(session_id) for session_id in idle}
+        if evicted:
+            logger.info(f"Telemetria de {len(evicted)} sessões ociosas descartada da memória")
+        return evicted
+
+    def ingest(self, session_id: int, samples: List[Any]) -> int:
+        """Adiciona amostras (``ts`` opcional, métricas numéricas) e retorna quantas foram aceitas.
+
+        Amostras que não são objetos, sem nenhuma métrica numérica ou com ``ts``
+        inválido são ignoradas; métricas não numéricas ou fora da faixa do float32
+        são descartadas da amostra. Amostras com ``ts`` anterior ao minuto corrente
+        também são ignoradas, para não reabrir minutos já fechados nos rollups.
+        """
+        telemetry = self._sessions.get(session_id)
+        if telemetry is None:
+            return 0
+
+        accepted = 0
+        with telemetry.lock:
+            for raw in samples:
+                if not isinstance(raw, dict):
+                    continue
+                sample = {}
+                for metric in METRICS:
+                    value = _number(raw.get(metric), FLOAT32_MAX)
+                    if value is not None:
+                        sample[metric] = value
+                timestamp = _number(raw['ts']) if raw.get('ts') is not None else time.time()
+                if not sample or timestamp is None:
+                    continue
+                if telemetry._minute is not None and timestamp < telemetry._minute:
+                    continue
+                telemetry.ingest(timestamp, sample)
+                accepted += 1
+            if accepted:
+                telemetry.last_seen = time.time()
+        return accepted
+
+    def close(self, session_id: int) -> Optional[SessionTelemetry]:
+        """Remove a sessão da memória e a retorna para persistência"""
+        with self._lock:
+            return self._sessions.pop(session_id, None)
+
+
+guest_telemetry = GuestTelemetryStore()
@@ -0,0 +1,140 @@
+"""
+Camada de transporte HTTP compartilhada pelas integrações de plataformas
+"""
+import os
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import MaxRetryError, ResponseError
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+# 429 fica de fora: respostas de rate limit voltam ao RateLimitGovernor, que
+# bloqueia a credencial até o Retry-After em vez de repetir por baixo do orçamento
+RETRY_STATUS_CODES = (500, 502, 503, 504)
+
+
+# Prazo da operação em andamento na thread (ver ``request_deadline``)
+_deadline = threading.local()
+
+
+@contextmanager
+def request_deadline(deadline_at: float):
+    """Limita as requisições feitas na thread, retries incluídos, ao instante ``deadline_at``"""
+    previous = getattr(_deadline, "at", None)
+    _deadline.at = deadline_at if previous is None else min(previous, deadline_at)
+    try:
+        yield
+    finally:
+        _deadline.at = previous
+
+
+def _remaining() -> Optional[float]:
+    deadline_at = getattr(_deadline, "at", None)
+    return None if deadline_at is None else deadline_at - time.time()
+
+
+class TransportRetry(Retry):
+    """Retry que não repete 429 nem quando a resposta traz Retry-After.
+
+    Dentro de um ``request_deadline``, uma nova tentativa só é feita se ela e a
+    espera antes dela couberem no prazo restante.
+    """
+
+    RETRY_AFTER_STATUS_CODES = frozenset(Retry.RETRY_AFTER_STATUS_CODES) - {429}
+
+    def increment(self, method=None, url=None, response=None, error=None, _pool=None, _stacktrace=None):
+        retry = super().increment(method, url, response, error, _pool, _stacktrace)
+        remaining = _remaining()
+        if remaining is not None:
+            wait = retry.get_backoff_time()
+            if response is not None and retry.respect_retry_after_header:
+                wait = max(wait, retry.get_retry_after(response) or 0)
+            if wait >= remaining:
+                raise MaxRetryError(_pool, url, error or ResponseError("prazo da operação esgotado"))
+        return retry
+
+
+class HttpTransport:
+    """Sessão HTTP com pool de conexões keep-alive por host, timeouts e retry com backoff.
+
+    Uma única instância é compartilhada por todas as integrações de um
+    PlatformManager, de forma que as conexões TLS com cada API sejam reaproveitadas
+    entre chamadas. Apenas métodos idempotentes (GET, PUT, DELETE...) são
+    repetidos automaticamente; POSTs que criam recursos não são.
+
+    Chamadas feitas dentro de ``request_deadline`` (as tarefas do FanOutExecutor)
+    têm os timeouts limitados ao tempo restante e não iniciam depois do prazo.
+    """
+
+    def __init__(self,
+                 pool_connections: Optional[int] = None,
+                 pool_maxsize: Optional[int] = None,
+                 connect_timeout: Optional[float] = None,
+                 read_timeout: Optional[float] = None,
+                 max_retries: Optional[int] = None,
+                 backoff_factor: Optional[float] = None):
+        self.pool_connections = pool_connections or int(os.environ.get('HTTP_POOL_CONNECTIONS', 10))
+        self.pool_maxsize = pool_maxsize or int(os.environ.get('HTTP_POOL_MAXSIZE', 20))
+        self.connect_timeout = connect_timeout or float(os.environ.get('HTTP_CONNECT_TIMEOUT', 3.05))
+        self.read_timeout = read_timeout or float(os.environ.get('HTTP_READ_TIMEOUT', 10))
+        self.max_retries = max_retries if max_retries is not None else int(os.environ.get('HTTP_MAX_RETRIES', 3))
+        self.backoff_factor = backoff_factor if backoff_factor is not None else float(os.environ.get('HTTP_BACKOFF_FACTOR', 0.5))
+
+        self.session = self._build_session()
+
+    @property
+    def timeout(self) -> Tuple[float, float]:
+        """Timeout padrão (connect, read) aplicado a todas as requisições"""
+        return (self.connect_timeout, self.read_timeout)
+
+    def _build_session(self) -> requests.Session:
+        retry = TransportRetry(
+            total=self.max_retries,
+            connect=self.max_retries,
+            read=self.max_retries,
+            status=self.max_retries,
+            backoff_factor=self.backoff_factor,
+            status_forcelist=RETRY_STATUS_CODES,
+            respect_retry_after_header=True,
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(
+            pool_connections=self.pool_connections,
+            pool_maxsize=self.pool_maxsize,
+            max_retries=retry
+        )
+
+        session = requests.Session()
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """Executa uma requisição usando o pool compartilhado"""
+        remaining = _remaining()
+        if remaining is None:
+            kwargs.setdefault("timeout", self.timeout)
+        else:
+            if remaining <= 0:
+                raise requests.exceptions.Timeout(f"Prazo da operação esgotado antes de {method} {url}")
+            timeout = kwargs.get("timeout") or self.timeout
+            connect_timeout, read_timeout = timeout if isinstance(timeout, tuple) else (timeout, timeout)
+            kwargs["timeout"] = (min(connect_timeout, remaining), min(read_timeout, remaining))
+        return self.session.request(method, url, **kwargs)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def close(self):
+        """Fecha todas as conexões abertas"""
+        self.session.close()
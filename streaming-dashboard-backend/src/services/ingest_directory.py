@@ -0,0 +1,117 @@
+"""
+Descoberta e seleção de servidores de ingest RTMP da Twitch
+"""
+import os
+import time
+import socket
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+TWITCH_INGESTS_URL = "https://ingest.twitch.tv/ingests"
+TWITCH_FALLBACK_RTMP_URL = "rtmp://live.twitch.tv/app/"
+RTMP_DEFAULT_PORT = 1935
+
+
+class TwitchIngestDirectory:
+    """Lista de servidores de ingest da Twitch em cache, com seleção opcional por latência.
+
+    A lista muda raramente, então é baixada no máximo uma vez a cada ``ttl``
+    segundos. Com ``probe`` habilitado, mede o tempo de conexão TCP aos primeiros
+    ``probe_candidates`` servidores recomendados e escolhe o mais rápido; caso
+    contrário usa o primeiro da lista.
+    """
+
+    def __init__(self, ttl: Optional[float] = None, probe: Optional[bool] = None,
+                 probe_candidates: Optional[int] = None, probe_timeout: Optional[float] = None):
+        self.ttl = ttl or float(os.environ.get('TWITCH_INGEST_TTL', 21600))
+        if probe is None:
+            probe = os.environ.get('TWITCH_INGEST_PROBE', 'false').lower() in ('1', 'true', 'yes')
+        self.probe = probe
+        self.probe_candidates = probe_candidates or int(os.environ.get('TWITCH_INGEST_PROBE_CANDIDATES', 5))
+        self.probe_timeout = probe_timeout or float(os.environ.get('TWITCH_INGEST_PROBE_TIMEOUT', 1.5))
+
+        self._rtmp_url = None
+        self._ingests = []
+        self._expires_at = 0.0
+        self._lock = threading.Lock()
+
+    def get_rtmp_url(self, transport) -> str:
+        """URL RTMP (sem a chave) do servidor de ingest selecionado"""
+        if self._rtmp_url and time.time() < self._expires_at:
+            return self._rtmp_url
+
+        with self._lock:
+            # Outra thread pode ter atualizado enquanto esta aguardava
+            if self._rtmp_url and time.time() < self._expires_at:
+                return self._rtmp_url
+            return self._refresh(transport)
+
+    def get_ingests(self) -> List[Dict[str, Any]]:
+        """Última lista de servidores baixada (com RTT medido, se houver sondagem)"""
+        return list(self._ingests)
+
+    def invalidate(self):
+        self._expires_at = 0.0
+
+    def _refresh(self, transport) -> str:
+        try:
+            response = transport.get(TWITCH_INGESTS_URL)
+            if response.status_code != 200:
+                raise ValueError(f"HTTP {response.status_code}")
+
+            ingests = [i for i in response.json().get("ingests", []) if i.get("availability", 1) > 0]
+            if not ingests:
+                raise ValueError("lista de ingests vazia")
+
+            selected = ingests[0]
+            if self.probe:
+                selected = self._select_fastest(ingests[:self.probe_candidates]) or selected
+
+            self._ingests = ingests
+            self._rtmp_url = selected["url_template"].replace("{stream_key}", "")
+            self._expires_at = time.time() + self.ttl
+            logger.info(f"Servidor de ingest Twitch selecionado: {selected.get('name')}")
+
+        except Exception as e:
+            logger.error(f"Erro ao obter servidores de ingest Twitch: {e}")
+            # Tentar novamente em breve, mantendo a última seleção válida
+            self._expires_at = time.time() + min(self.ttl, 60)
+            if not self._rtmp_url:
+                self._rtmp_url = TWITCH_FALLBACK_RTMP_URL
+
+        return self._rtmp_url
+
+    def _select_fastest(self, candidates: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """Mede o RTT de conexão a cada candidato, em paralelo, e retorna o mais rápido"""
+        with ThreadPoolExecutor(max_workers=len(candidates), thread_name_prefix="ingest-probe") as executor:
+            rtts = list(executor.map(self._probe, candidates))
+
+        for ingest, rtt in zip(candidates, rtts):
+            ingest["rtt_ms"] = round(rtt * 1000, 1) if rtt is not None else None
+
+        measured = [(rtt, ingest) for ingest, rtt in zip(candidates, rtts) if rtt is not None]
+        if not measured:
+            return None
+        return min(measured, key=lambda item: item[0])[1]
+
+    def _probe(self, ingest: Dict[str, Any]) -> Optional[float]:
+        parsed = urlparse(ingest["url_template"])
+        if not parsed.hostname:
+            return None
+
+        started = time.perf_counter()
+        try:
+            with socket.create_connection((parsed.hostname, parsed.port or RTMP_DEFAULT_PORT),
+                                          timeout=self.probe_timeout):
+                return time.perf_counter() - started
+        except OSError:
+            return None
+
+
+# Diretório compartilhado pelo processo
+twitch_ingests = TwitchIngestDirectory()
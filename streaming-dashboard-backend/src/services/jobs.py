@@ -0,0 +1,146 @@
+"""
+Fila de jobs em processo para operações longas (início/parada de multicast, atualização de status)
+"""
+import os
+import time
+import uuid
+import queue
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from src.services.event_bus import EventBus, event_bus
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_STATUSES = ("queued", "running")
+
+
+class JobQueue:
+    """Executa operações longas em threads próprias, fora dos workers HTTP.
+
+    A rota enfileira o job e responde imediatamente com o id; o progresso fica
+    disponível em ``get`` (rota de status) e é publicado no canal de eventos a
+    cada atualização. Um job é uma função que recebe ``progress(chave, dados)``
+    e retorna o resultado final. Jobs ativos com a mesma ``dedupe_key`` não são
+    duplicados (ex.: duplo clique em "iniciar"). Jobs encerrados ficam
+    disponíveis por ``retention`` segundos.
+    """
+
+    def __init__(self, workers: Optional[int] = None, retention: Optional[float] = None,
+                 max_queued: Optional[int] = None, events: Optional[EventBus] = None):
+        self.workers = workers or int(os.environ.get('JOB_WORKERS', 2))
+        self.retention = retention or float(os.environ.get('JOB_RETENTION', 3600))
+        self.max_queued = max_queued or int(os.environ.get('JOB_MAX_QUEUED', 100))
+        self.events = events or event_bus
+
+        self._jobs = {}
+        self._functions = {}
+        self._active = {}
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def _start_workers(self):
+        if self._threads:
+            return
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"job-worker-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, user_id, kind: str, function: Callable[[Callable[[Any, Any], None]], Any],
+               dedupe_key: Optional[str] = None, **meta) -> Tuple[Optional[Dict[str, Any]], bool]:
+        """Enfileira um job; retorna (job, criado). Job None indica fila cheia"""
+        with self._lock:
+            self._prune()
+            if dedupe_key:
+                existing = self._jobs.get(self._active.get((str(user_id), dedupe_key)))
+                if existing and existing["status"] in ACTIVE_STATUSES:
+                    return self._public(existing), False
+
+            if self._queue.qsize() >= self.max_queued:
+                return None, False
+
+            job = {
+                "id": uuid.uuid4().hex,
+                "user_id": str(user_id),
+                "kind": kind,
+                "status": "queued",
+                "meta": meta,
+                "progress": {},
+                "result": None,
+                "error": None,
+                "created_at": time.time(),
+                "started_at": None,
+                "finished_at": None
+            }
+            self._jobs[job["id"]] = job
+            self._functions[job["id"]] = function
+            if dedupe_key:
+                self._active[(str(user_id), dedupe_key)] = job["id"]
+            self._start_workers()
+
+        self._queue.put(job["id"])
+        self._publish(job)
+        return self._public(job), True
+
+    def get(self, user_id, job_id: str) -> Optional[Dict[str, Any]]:
+        """Job do usuário, ou None se não existe ou pertence a outro usuário"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if not job or job["user_id"] != str(user_id):
+                return None
+            return self._public(job)
+
+    def list(self, user_id) -> List[Dict[str, Any]]:
+        """Jobs recentes do usuário, do mais novo para o mais antigo"""
+        with self._lock:
+            jobs = [self._public(job) for job in self._jobs.values() if job["user_id"] == str(user_id)]
+        return sorted(jobs, key=lambda job: job["created_at"], reverse=True)
+
+    @staticmethod
+    def _public(job: Dict[str, Any]) -> Dict[str, Any]:
+        data = {key: value for key, value in job.items() if key != "user_id"}
+        data["progress"] = dict(job["progress"])
+        return data
+
+    def _publish(self, job: Dict[str, Any]):
+        self.events.publish(job["user_id"], "job", f"job:{job['id']}", self._public(job))
+
+    def _prune(self):
+        cutoff = time.time() - self.retention
+        for job_id in [job_id for job_id, job in self._jobs.items()
+                       if job["finished_at"] and job["finished_at"] < cutoff]:
+            del self._jobs[job_id]
+        self._active = {key: job_id for key, job_id in self._active.items() if job_id in self._jobs}
+
+    def _run(self):
+        while True:
+            job_id = self._queue.get()
+            with self._lock:
+                job = self._jobs.get(job_id)
+                function = self._functions.pop(job_id, None)
+            if job is None or function is None:
+                continue
+
+            job.update(status="running", started_at=time.time())
+            self._publish(job)
+
+            def progress(key, data, job=job):
+                with self._lock:
+                    job["progress"][str(key)] = data
+                self._publish(job)
+
+            try:
+                result = function(progress)
+                job.update(status="succeeded", result=result)
+            except Exception as e:
+                logger.error(f"Erro no job {job['kind']} {job_id}: {e}")
+                job.update(status="failed", error=str(e))
+
+            job["finished_at"] = time.time()
+            self._publish(job)
+
+
+job_queue = JobQueue()
@@ -0,0 +1,323 @@
+"""
+Orquestração paralela de início/parada de multicast em duas fases (preparar e ir ao ar)
+"""
+import os
+import time
+import logging
+import functools
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+from src.services.fanout import FanOutExecutor
+from src.services.event_bus import EventBus, event_bus
+from src.services.rate_limiter import RateLimitExceeded
+
+logger = logging.getLogger(__name__)
+
+
+class MulticastOrchestrator:
+    """Inicia e para transmissões em várias plataformas ao mesmo tempo.
+
+    O início tem duas fases. Na preparação, cada destino autentica e cria seus
+    recursos (broadcast, ingest, chave) em paralelo, com prazo próprio. Na segunda
+    fase, cada destino preparado espera o ingest receber vídeo (nas plataformas que
+    exigem isso, como o YouTube), os destinos esperam uns pelos outros em uma
+    barreira e fazem a transição para "ao vivo" juntos, para que o público veja a transmissão
+    começar em todas as plataformas praticamente no mesmo instante.
+
+    Falhas são parciais: um destino que falha não impede os demais. Cada passo
+    é repetido com backoff dentro do prazo do destino; os passos são idempotentes
+    (o estado preparado é reaproveitado), então repetir uma operação inteira
+    também não cria recursos duplicados. O resultado de cada destino é publicado
+    no canal de eventos assim que fica pronto.
+
+    A preparação também pode ser feita com antecedência (``prepare``), minutos
+    antes de um programa agendado: broadcasts, URLs de ingest e chaves ficam
+    guardados por ``prepared_ttl`` segundos e o ``start`` seguinte só faz a
+    transição para "ao vivo" nesses destinos.
+
+    Um destino é um dicionário com ``key`` (id da plataforma), ``name``,
+    ``service`` (a integração) e ``authenticate`` (callable sem argumentos).
+    """
+
+    def __init__(self, events: Optional[EventBus] = None,
+                 prepare_deadline: Optional[float] = None,
+                 go_live_deadline: Optional[float] = None,
+                 retries: Optional[int] = None,
+                 backoff: Optional[float] = None,
+                 max_workers: Optional[int] = None,
+                 prepared_ttl: Optional[float] = None):
+        self.events = events or event_bus
+        self.prepare_deadline = prepare_deadline or float(os.environ.get('MULTICAST_PREPARE_DEADLINE', 20))
+        self.go_live_deadline = go_live_deadline or float(os.environ.get('MULTICAST_GO_LIVE_DEADLINE', 10))
+        self.retries = retries if retries is not None else int(os.environ.get('MULTICAST_RETRIES', 2))
+        self.backoff = backoff or float(os.environ.get('MULTICAST_RETRY_BACKOFF', 0.5))
+        self.prepared_ttl = prepared_ttl or float(os.environ.get('MULTICAST_PREPARED_TTL', 900))
+        self._executor = FanOutExecutor(max_workers=max_workers or int(os.environ.get('MULTICAST_WORKERS', 16)))
+
+        # usuário -> id da plataforma -> {"name", "title", "prepared", "state", "updated_at", "expires_at"}
+        self._streams = {}
+        self._user_locks = {}
+        self._lock = threading.Lock()
+
+    def _user_lock(self, user_id) -> threading.Lock:
+        with self._lock:
+            return self._user_locks.setdefault(str(user_id), threading.Lock())
+
+    def _state(self, user_id, key) -> Dict[str, Any]:
+        with self._lock:
+            return self._streams.setdefault(str(user_id), {}).setdefault(
+                key, {"prepared": {}, "state": "idle", "updated_at": time.time(), "expires_at": None})
+
+    def _existing(self, user_id, key) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self._streams.get(str(user_id), {}).get(key)
+
+    def _forget(self, user_id, key):
+        with self._lock:
+            self._streams.get(str(user_id), {}).pop(key, None)
+
+    def get_streams(self, user_id) -> Dict[Any, Dict[str, Any]]:
+        """Estado atual (preparado/ao vivo) de cada destino do usuário"""
+        with self._lock:
+            return {key: {"name": entry.get("name"), "state": entry["state"], "updated_at": entry["updated_at"],
+                          "expires_at": entry["expires_at"]}
+                    for key, entry in self._streams.get(str(user_id), {}).items()}
+
+    def get_ingest(self, user_id) -> Dict[Any, Dict[str, Any]]:
+        """URL de ingest e chave dos destinos preparados ou ao vivo (criados por transmissão)"""
+        with self._lock:
+            entries = dict(self._streams.get(str(user_id), {}))
+        return {key: self._ingest(entry) for key, entry in entries.items()
+                if entry["state"] in ("prepared", "live") and entry["prepared"].get("stream_key")}
+
+    @staticmethod
+    def _ingest(entry: Dict[str, Any]) -> Dict[str, Any]:
+        """URL de ingest e chave resolvidas na preparação, para configurar o encoder"""
+        return {"rtmp_url": entry["prepared"].get("rtmp_url"), "stream_key": entry["prepared"].get("stream_key")}
+
+    def _is_warm(self, entry: Dict[str, Any], title: str) -> bool:
+        """Destino preparado antes, dentro do prazo de validade e com o mesmo título"""
+        return (entry["state"] == "prepared" and entry.get("title") == title
+                and entry["expires_at"] is not None and entry["expires_at"] > time.time())
+
+    def _retry(self, action: Callable[[], Any], deadline_at: float) -> Any:
+        """Executa ``action`` até dar certo, respeitando o número de tentativas e o prazo"""
+        attempt = 0
+        while True:
+            try:
+                result = action()
+                if result is not False:
+                    return result
+                error = "Plataforma recusou a operação"
+            except (NotImplementedError, RateLimitExceeded):
+                raise
+            except Exception as e:
+                error = str(e)
+
+            attempt += 1
+            delay = self.backoff * 2 ** (attempt - 1)
+            if attempt > self.retries or time.time() + delay >= deadline_at:
+                raise RuntimeError(error)
+            time.sleep(delay)
+
+    def _authenticate(self, destination: Dict[str, Any], deadline_at: float):
+        """Autentica com as mesmas tentativas dos demais passos, distinguindo a recusa das credenciais"""
+        def attempt():
+            if not destination["authenticate"]():
+                raise RuntimeError("Falha na autenticação")
+            return True
+        self._retry(attempt, deadline_at)
+
+    def _wait_ingest(self, destination: Dict[str, Any], prepared: Dict[str, Any], deadline_at: float):
+        """Espera o ingest receber vídeo: a transição com o encoder desconectado colocaria
+        no ar uma transmissão vazia (ou seria recusada pela plataforma)"""
+        service = destination["service"]
+        while not service.ingest_active(prepared):
+            if time.time() + self.backoff >= deadline_at:
+                raise RuntimeError("O ingest ainda não recebe vídeo; configure o encoder com a chave "
+                                   "preparada e inicie novamente")
+            time.sleep(self.backoff)
+
+    def _report(self, user_id, destination: Dict[str, Any], result: Dict[str, Any],
+                on_result: Optional[Callable[[Any, Dict[str, Any]], None]]):
+        self.events.publish(user_id, "multicast", f"multicast:{destination['key']}",
+                            dict(result, platform_id=destination["key"], platform=destination["name"]))
+        if on_result is not None:
+            on_result(destination["key"], result)
+
+    @staticmethod
+    def _failure(phase: str, error: Exception) -> Dict[str, Any]:
+        if isinstance(error, NotImplementedError):
+            message = "Plataforma não suporta início automático de stream"
+        else:
+            message = f"Erro: {error}"
+        return {"success": False, "phase": phase, "message": message}
+
+    def _prepare_task(self, user_id, destination: Dict[str, Any], title: str, description: str,
+                      on_result) -> Dict[str, Any]:
+        deadline_at = time.time() + self.prepare_deadline
+        entry = self._state(user_id, destination["key"])
+        entry["name"] = destination["name"]
+        try:
+            self._authenticate(destination, deadline_at)
+            if self._is_warm(entry, title):
+                # Preparado com antecedência: só a autenticação (em cache) é refeita
+                result = dict(self._ingest(entry), success=True, phase="prepare", warm=True,
+                              message="Destino já preparado")
+                self._report(user_id, destination, result, on_result)
+                return result
+            if entry.get("title") != title:
+                # Recursos já criados são reaproveitados, mas o título do canal é reaplicado
+                entry["prepared"].pop("title_set", None)
+            # O mesmo dicionário é passado a cada tentativa: passos concluídos não se repetem
+            self._retry(functools.partial(destination["service"].prepare_stream, title, description,
+                                          entry["prepared"]), deadline_at)
+            if time.time() > deadline_at:
+                # O orquestrador já desistiu deste destino; o estado fica para uma nova tentativa
+                raise TimeoutError("Prazo de preparação excedido")
+        except Exception as e:
+            if not isinstance(e, NotImplementedError):
+                logger.error(f"Erro ao preparar stream em {destination['name']}: {e}")
+            if not entry["prepared"]:
+                self._forget(user_id, destination["key"])
+            result = self._failure("prepare", e)
+            self._report(user_id, destination, result, on_result)
+            return result
+
+        if entry["state"] != "live":
+            entry["state"] = "prepared"
+        entry.update(title=title, updated_at=time.time(), expires_at=time.time() + self.prepared_ttl)
+        result = dict(self._ingest(entry), success=True, phase="prepare", message="Destino preparado")
+        self._report(user_id, destination, result, on_result)
+        return result
+
+    def _go_live_task(self, user_id, destination: Dict[str, Any], barrier: threading.Barrier,
+                      on_result) -> Dict[str, Any]:
+        deadline_at = time.time() + self.go_live_deadline
+        entry = self._state(user_id, destination["key"])
+        try:
+            if entry["state"] != "live":
+                self._wait_ingest(destination, entry["prepared"], deadline_at)
+        except Exception as e:
+            # Libera os demais destinos da barreira; a preparação continua válida para um novo início
+            barrier.abort()
+            logger.error(f"Erro ao iniciar stream em {destination['name']}: {e}")
+            result = self._failure("go_live", e)
+            self._report(user_id, destination, result, on_result)
+            return result
+
+        try:
+            # Todos os destinos disparam a transição juntos
+            barrier.wait(timeout=max(0.0, deadline_at - time.time()))
+        except threading.BrokenBarrierError:
+            pass
+
+        try:
+            if entry["state"] != "live":
+                self._retry(functools.partial(destination["service"].go_live, entry["prepared"]), deadline_at)
+        except Exception as e:
+            logger.error(f"Erro ao iniciar stream em {destination['name']}: {e}")
+            result = self._failure("go_live", e)
+            self._report(user_id, destination, result, on_result)
+            return result
+
+        live_at = time.time()
+        entry.update(state="live", updated_at=live_at)
+        result = {"success": True, "phase": "go_live", "message": "Stream iniciado com sucesso",
+                  "live_at": live_at}
+        self._report(user_id, destination, result, on_result)
+        return result
+
+    def _prepare_all(self, user_id, by_key: Dict[Any, Dict[str, Any]], title: str, description: str,
+                     on_result) -> Dict[Any, Dict[str, Any]]:
+        prepare = self._executor.run({
+            key: functools.partial(self._prepare_task, user_id, destination, title, description, on_result)
+            for key, destination in by_key.items()
+        }, timeout=self.prepare_deadline + 1)
+
+        results = {}
+        for key, outcome in prepare.items():
+            results[key] = outcome["result"] if outcome["ok"] else self._failure("prepare", outcome["error"])
+            if outcome.get("timed_out"):
+                self._report(user_id, by_key[key], results[key], on_result)
+        return results
+
+    def prepare(self, user_id, destinations: List[Dict[str, Any]], title: str, description: str = "",
+                on_result: Optional[Callable[[Any, Dict[str, Any]], None]] = None) -> Dict[Any, Dict[str, Any]]:
+        """Só a primeira fase: cria broadcasts e resolve ingest e chaves para um ``start`` posterior"""
+        with self._user_lock(user_id):
+            by_key = {destination["key"]: destination for destination in destinations}
+            return self._prepare_all(user_id, by_key, title, description, on_result)
+
+    def start(self, user_id, destinations: List[Dict[str, Any]], title: str, description: str = "",
+              on_result: Optional[Callable[[Any, Dict[str, Any]], None]] = None) -> Dict[Any, Dict[str, Any]]:
+        """Prepara todos os destinos em paralelo e coloca no ar, juntos, os que ficaram prontos.
+
+        Destinos já preparados com ``prepare`` (e ainda válidos) pulam a preparação.
+        Nos que só vão ao ar com o ingest recebendo vídeo (YouTube cria uma chave nova
+        a cada preparação), a transição espera o encoder até o prazo; se ele não
+        conectar, o destino falha e continua preparado para um novo ``start``.
+        """
+        with self._user_lock(user_id):
+            by_key = {destination["key"]: destination for destination in destinations}
+            results = self._prepare_all(user_id, by_key, title, description, on_result)
+
+            ready = [key for key, result in results.items() if result["success"]]
+            if ready:
+                barrier = threading.Barrier(len(ready))
+                # Uma thread por participante da barreira: no pool compartilhado, limitado
+                # e usado por outros usuários, parte deles poderia ficar na fila enquanto os
+                # demais esperam na barreira até o prazo
+                executor = FanOutExecutor(max_workers=len(ready))
+                try:
+                    go_live = executor.run({
+                        key: functools.partial(self._go_live_task, user_id, by_key[key], barrier, on_result)
+                        for key in ready
+                    }, timeout=self.go_live_deadline + 1)
+                finally:
+                    executor.shutdown()
+                for key, outcome in go_live.items():
+                    results[key] = outcome["result"] if outcome["ok"] else self._failure("go_live", outcome["error"])
+                    if outcome.get("timed_out"):
+                        self._report(user_id, by_key[key], results[key], on_result)
+
+            return results
+
+    def _stop_task(self, user_id, destination: Dict[str, Any], on_result) -> Dict[str, Any]:
+        deadline_at = time.time() + self.go_live_deadline
+        # Destinos nunca iniciados não ganham estado (apareceriam como "idle" em get_streams)
+        entry = self._existing(user_id, destination["key"])
+        prepared = entry["prepared"] if entry else None
+        try:
+            self._authenticate(destination, deadline_at)
+            self._retry(functools.partial(destination["service"].stop_stream, prepared or None), deadline_at)
+        except Exception as e:
+            if isinstance(e, NotImplementedError):
+                result = {"success": False, "phase": "stop",
+                          "message": "Plataforma não suporta parada automática de stream"}
+            else:
+                logger.error(f"Erro ao parar stream em {destination['name']}: {e}")
+                result = {"success": False, "phase": "stop", "message": f"Erro: {e}"}
+            self._report(user_id, destination, result, on_result)
+            return result
+
+        self._forget(user_id, destination["key"])
+        result = {"success": True, "phase": "stop", "message": "Stream parado com sucesso"}
+        self._report(user_id, destination, result, on_result)
+        return result
+
+    def stop(self, user_id, destinations: List[Dict[str, Any]],
+             on_result: Optional[Callable[[Any, Dict[str, Any]], None]] = None) -> Dict[Any, Dict[str, Any]]:
+        """Encerra todos os destinos em paralelo"""
+        with self._user_lock(user_id):
+            stop = self._executor.run({
+                destination["key"]: functools.partial(self._stop_task, user_id, destination, on_result)
+                for destination in destinations
+            }, timeout=self.go_live_deadline + 1)
+            return {key: outcome["result"] if outcome["ok"]
+                    else {"success": False, "phase": "stop", "message": f"Erro: {outcome['error']}"}
+                    for key, outcome in stop.items()}
+
+
+multicast_orchestrator = MulticastOrchestrator()
@@ -0,0 +1,102 @@
+"""
+Paginação por cursor (keyset) para as rotas de listagem
+"""
+import os
+import json
+import base64
+from typing import Any, List, Optional, Tuple
+from urllib.parse import urlencode
+
+from flask import request
+from sqlalchemy import String, and_, or_, type_coerce
+
+from src.services.serialization import json_response
+
+# Cabeçalhos de paginação que o navegador deve expor a frontends de outra origem (CORS)
+PAGINATION_HEADERS = ('X-Next-Cursor', 'Link')
+
+DEFAULT_PAGE_SIZE = int(os.environ.get('API_DEFAULT_PAGE_SIZE', 50))
+MAX_PAGE_SIZE = int(os.environ.get('API_MAX_PAGE_SIZE', 200))
+
+
+class InvalidCursor(ValueError):
+    """Cursor de paginação malformado"""
+
+
+def get_page_size(args) -> int:
+    """Tamanho de página pedido em ``?limit=``, limitado a MAX_PAGE_SIZE"""
+    try:
+        limit = int(args.get('limit', DEFAULT_PAGE_SIZE))
+    except (TypeError, ValueError):
+        limit = DEFAULT_PAGE_SIZE
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def encode_cursor(sort_value: Optional[str], row_id: int) -> str:
+    payload = json.dumps([sort_value, row_id])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[Optional[str], int]:
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if sort_value is not None and not isinstance(sort_value, str):
+            raise TypeError("valor de ordenação inválido")
+        return sort_value, int(row_id)
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor(str(e))
+
+
+def paginate_desc(query, sort_column, id_column, cursor: Optional[str], limit: int) -> Tuple[List[Any], Optional[str]]:
+    """Aplica paginação keyset em ordem decrescente de (sort_column, id_column).
+
+    Retorna a página e o cursor da próxima (None na última). O custo independe de
+    quantas páginas já foram percorridas, ao contrário de OFFSET.
+
+    O cursor guarda o valor de ``sort_column`` exatamente como está gravado e a
+    comparação é feita nesse formato. No SQLite datas são texto: as gravadas por
+    CURRENT_TIMESTAMP não têm microssegundos, enquanto um datetime passado como
+    parâmetro é convertido para "...HH:MM:SS.ffffff"; comparar os dois formatos
+    repetiria a mesma página indefinidamente. ``query`` deve ser uma consulta de
+    colunas (``select_columns``): a coluna crua é acrescentada ao final de cada linha.
+    """
+    raw_sort = type_coerce(sort_column, String)
+
+    if cursor:
+        sort_value, row_id = decode_cursor(cursor)
+        # Na ordem decrescente do SQLite, NULLs vêm depois de qualquer valor
+        if sort_value is None:
+            query = query.filter(sort_column.is_(None), id_column < row_id)
+        else:
+            query = query.filter(or_(
+                raw_sort < sort_value,
+                and_(raw_sort == sort_value, id_column < row_id),
+                sort_column.is_(None)
+            ))
+
+    query = query.add_columns(raw_sort.label('_cursor_sort'))
+    rows = query.order_by(sort_column.desc(), id_column.desc()).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(last._mapping['_cursor_sort'], last._mapping[id_column])
+
+    return rows, next_cursor
+
+
+def paginated_response(items: List[Any], next_cursor: Optional[str]):
+    """Resposta JSON com a lista da página; a próxima página vai nos cabeçalhos.
+
+    Os cabeçalhos são liberados em Access-Control-Expose-Headers mesmo sem
+    configuração de CORS, para que um frontend em outra origem consiga lê-los.
+    """
+    headers = {'Access-Control-Expose-Headers': ', '.join(PAGINATION_HEADERS)}
+    if next_cursor:
+        args = request.args.to_dict()
+        args['cursor'] = next_cursor
+        headers['X-Next-Cursor'] = next_cursor
+        headers['Link'] = f'<{request.base_url}?{urlencode(args)}>; rel="next"'
+    return json_response(items, headers=headers)
@@ -1,27 +1,87 @@
 """
 Serviços de integração com plataformas de streaming
 """
-import requests
-import json
+import os
 import time
+import hashlib
+import threading
+import functools
+from collections import OrderedDict
 from typing import Dict, List, Optional, Any
-from datetime import datetime, timedelta
+from datetime import datetime
 import logging
 
+from src.services.http_transport import HttpTransport
+from src.services.auth_cache import AuthCache, auth_cache, credentials_fingerprint, token_expiry
+from src.services.rate_limiter import RateLimitGovernor, RateLimitExceeded, rate_governor
+from src.services.ingest_directory import twitch_ingests
+
 logger = logging.getLogger(__name__)
 
+def serve_last_status(method):
+    """Retorna o último status conhecido quando o orçamento da API está esgotado"""
+    @functools.wraps(method)
+    def wrapper(self):
+        try:
+            status = method(self)
+        except RateLimitExceeded as e:
+            logger.warning(f"{e}; usando último status conhecido")
+            return dict(self._last_status or {"is_live": False, "viewer_count": 0}, stale=True)
+        
+        self._last_status = status
+        return status
+    return wrapper
+
 class PlatformIntegrationService:
     """Classe base para integração com plataformas de streaming"""
     
-    def __init__(self, platform_name: str):
+    # Atributos preenchidos por authenticate() que identificam a conta autenticada
+    identity_fields = ()
+    
+    def __init__(self, platform_name: str, transport: Optional[HttpTransport] = None,
+                 governor: Optional[RateLimitGovernor] = None):
         self.platform_name = platform_name
         self.base_url = ""
         self.headers = {}
+        self.http = transport or HttpTransport()
+        self.governor = governor or rate_governor
+        self._last_status = None
+        
+    def _credential_key(self) -> str:
+        """Identifica a credencial no controle de rate limit sem expor o token"""
+        token = getattr(self, "access_token", None) or ""
+        return hashlib.sha256(token.encode()).hexdigest()[:16]
+        
+    def _app_key(self) -> Optional[str]:
+        """Identifica o app quando a plataforma também limita o app como um todo"""
+        return None
+        
+    def _request(self, method: str, url: str, cost: int = 1, **kwargs):
+        """Chamada à API da plataforma respeitando o orçamento de rate limit/cota"""
+        credential_key = self._credential_key()
+        app_key = self._app_key()
+        self.governor.acquire(self.platform_name, credential_key, cost, app_key=app_key)
+        response = self.http.request(method, url, **kwargs)
+        self.governor.update_from_response(self.platform_name, credential_key, response, app_key=app_key)
+        return response
+        
+    def get_rate_limit_status(self) -> Dict[str, Any]:
+        """Saldo restante do orçamento de chamadas desta credencial"""
+        return self.governor.status(self.platform_name, self._credential_key())
         
     def authenticate(self, credentials: Dict[str, str]) -> bool:
         """Autentica com a plataforma"""
         raise NotImplementedError
         
+    def export_identity(self) -> Dict[str, Any]:
+        """Exporta o estado obtido na autenticação para ser armazenado em cache"""
+        return {field: getattr(self, field) for field in self.identity_fields}
+        
+    def restore_identity(self, identity: Dict[str, Any]):
+        """Restaura um estado de autenticação previamente validado"""
+        for field in self.identity_fields:
+            setattr(self, field, identity.get(field))
+        
     def get_stream_key(self) -> Optional[str]:
         """Obtém a chave de stream"""
         raise NotImplementedError
@@ -38,19 +98,44 @@ class PlatformIntegrationService:
         """Obtém o número de visualizadores"""
         raise NotImplementedError
         
+    def prepare_stream(self, title: str = "", description: str = "",
+                       prepared: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Cria os recursos da transmissão (broadcast, ingest, chave) sem ir ao ar.
+
+        ``prepared`` é preenchido passo a passo com os ids criados; repetir a chamada
+        com o mesmo dicionário retoma de onde parou, sem criar recursos duplicados.
+        """
+        raise NotImplementedError
+        
+    def ingest_active(self, prepared: Dict[str, Any]) -> bool:
+        """Se o ingest preparado já recebe vídeo do encoder (pré-requisito do ``go_live``).
+
+        Por padrão não há verificação: a plataforma entra no ar quando o vídeo chega
+        ou aceita a transição antes disso.
+        """
+        return True
+        
+    def go_live(self, prepared: Dict[str, Any]) -> bool:
+        """Coloca no ar uma transmissão preparada; repetir a chamada não tem efeito extra"""
+        raise NotImplementedError
+        
     def start_stream(self, title: str = "", description: str = "") -> bool:
         """Inicia o stream"""
-        raise NotImplementedError
+        return self.go_live(self.prepare_stream(title, description))
         
-    def stop_stream(self) -> bool:
+    def stop_stream(self, prepared: Optional[Dict[str, Any]] = None) -> bool:
         """Para o stream"""
         raise NotImplementedError
 
+HELIX_MAX_IDS_PER_REQUEST = 100
+
 class TwitchIntegration(PlatformIntegrationService):
     """Integração com Twitch"""
     
-    def __init__(self):
-        super().__init__("twitch")
+    identity_fields = ("client_id", "access_token", "broadcaster_id", "headers")
+    
+    def __init__(self, transport: Optional[HttpTransport] = None, governor: Optional[RateLimitGovernor] = None):
+        super().__init__("twitch", transport, governor)
         self.base_url = "https://api.twitch.tv/helix"
         self.client_id = None
         self.access_token = None
@@ -71,7 +156,7 @@ class TwitchIntegration(PlatformIntegrationService):
                 "Client-Id": self.client_id
             }
             
-            response = requests.get(f"{self.base_url}/users", headers=headers)
+            response = self._request("GET", f"{self.base_url}/users", headers=headers)
             if response.status_code == 200:
                 data = response.json()
                 if data.get("data"):
@@ -94,7 +179,7 @@ class TwitchIntegration(PlatformIntegrationService):
             url = f"{self.base_url}/streams/key"
             params = {"broadcaster_id": self.broadcaster_id}
             
-            response = requests.get(url, headers=self.headers, params=params)
+            response = self._request("GET", url, headers=self.headers, params=params)
             if response.status_code == 200:
                 data = response.json()
                 if data.get("data"):
@@ -108,23 +193,37 @@ class TwitchIntegration(PlatformIntegrationService):
     
     def get_rtmp_url(self) -> Optional[str]:
         """Obtém URL RTMP do Twitch"""
-        try:
-            # Obter servidor de ingest recomendado
-            response = requests.get("https://ingest.twitch.tv/ingests")
-            if response.status_code == 200:
-                data = response.json()
-                if data.get("ingests"):
-                    # Usar o primeiro servidor disponível
-                    ingest_server = data["ingests"][0]["url_template"]
-                    return ingest_server.replace("{stream_key}", "")
-            
-            # Fallback para servidor padrão
-            return "rtmp://live.twitch.tv/app/"
-            
-        except Exception as e:
-            logger.error(f"Erro ao obter RTMP URL Twitch: {e}")
-            return "rtmp://live.twitch.tv/app/"
+        # Lista de ingests em cache compartilhado, com seleção opcional por latência
+        return twitch_ingests.get_rtmp_url(self.http)
+    
+    def prepare_stream(self, title: str = "", description: str = "",
+                       prepared: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Atualiza o título do canal e resolve ingest e chave"""
+        prepared = {} if prepared is None else prepared
+        
+        if title and not prepared.get("title_set"):
+            response = self._request("PATCH", f"{self.base_url}/channels", headers=self.headers,
+                                     params={"broadcaster_id": self.broadcaster_id}, json={"title": title})
+            if response.status_code not in (200, 204):
+                raise RuntimeError(f"Falha ao atualizar título do canal Twitch: HTTP {response.status_code}")
+            prepared["title_set"] = True
+        
+        if not prepared.get("stream_key"):
+            prepared["stream_key"] = self.get_stream_key()
+            if not prepared["stream_key"]:
+                raise RuntimeError("Chave de stream Twitch indisponível")
+        prepared["rtmp_url"] = self.get_rtmp_url()
+        return prepared
     
+    def go_live(self, prepared: Dict[str, Any]) -> bool:
+        """A Twitch entra no ar quando o ingest recebe vídeo; não há transição via API"""
+        return True
+    
+    def stop_stream(self, prepared: Optional[Dict[str, Any]] = None) -> bool:
+        """A transmissão termina quando o encoder desconecta"""
+        return True
+    
+    @serve_last_status
     def get_stream_status(self) -> Dict[str, Any]:
         """Obtém status do stream Twitch"""
         try:
@@ -134,25 +233,55 @@ class TwitchIntegration(PlatformIntegrationService):
             url = f"{self.base_url}/streams"
             params = {"user_id": self.broadcaster_id}
             
-            response = requests.get(url, headers=self.headers, params=params)
+            response = self._request("GET", url, headers=self.headers, params=params)
             if response.status_code == 200:
                 data = response.json()
                 if data.get("data"):
-                    stream_data = data["data"][0]
-                    return {
-                        "is_live": True,
-                        "viewer_count": stream_data.get("viewer_count", 0),
-                        "title": stream_data.get("title", ""),
-                        "game_name": stream_data.get("game_name", ""),
-                        "started_at": stream_data.get("started_at")
-                    }
+                    return self._format_stream(data["data"][0])
             
             return {"is_live": False, "viewer_count": 0}
             
+        except RateLimitExceeded:
+            raise
         except Exception as e:
             logger.error(f"Erro ao obter status Twitch: {e}")
             return {"is_live": False, "viewer_count": 0}
     
+    def get_streams_status(self, broadcaster_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Obtém o status de vários canais com o mínimo de chamadas à Helix.
+
+        A Helix aceita até 100 parâmetros ``user_id`` por requisição; canais que
+        não aparecem na resposta estão offline. Usa o token desta integração.
+        """
+        statuses = {broadcaster_id: {"is_live": False, "viewer_count": 0} for broadcaster_id in broadcaster_ids}
+        ids = list(statuses)
+        url = f"{self.base_url}/streams"
+        
+        for start in range(0, len(ids), HELIX_MAX_IDS_PER_REQUEST):
+            chunk = ids[start:start + HELIX_MAX_IDS_PER_REQUEST]
+            params = [("user_id", broadcaster_id) for broadcaster_id in chunk]
+            params.append(("first", HELIX_MAX_IDS_PER_REQUEST))
+            
+            response = self._request("GET", url, headers=self.headers, params=params)
+            if response.status_code != 200:
+                logger.error(f"Erro ao obter status em lote Twitch: HTTP {response.status_code}")
+                continue
+            
+            for stream_data in response.json().get("data", []):
+                statuses[stream_data.get("user_id")] = self._format_stream(stream_data)
+        
+        return statuses
+    
+    @staticmethod
+    def _format_stream(stream_data: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "is_live": True,
+            "viewer_count": stream_data.get("viewer_count", 0),
+            "title": stream_data.get("title", ""),
+            "game_name": stream_data.get("game_name", ""),
+            "started_at": stream_data.get("started_at")
+        }
+    
     def get_viewer_count(self) -> int:
         """Obtém número de visualizadores"""
         status = self.get_stream_status()
@@ -161,17 +290,32 @@ class TwitchIntegration(PlatformIntegrationService):
 class YouTubeIntegration(PlatformIntegrationService):
     """Integração com YouTube Live"""
     
-    def __init__(self):
-        super().__init__("youtube")
+    identity_fields = ("api_key", "client_id", "access_token", "channel_id", "headers")
+    
+    def __init__(self, transport: Optional[HttpTransport] = None, governor: Optional[RateLimitGovernor] = None):
+        super().__init__("youtube", transport, governor)
         self.base_url = "https://www.googleapis.com/youtube/v3"
         self.api_key = None
+        self.client_id = None
         self.access_token = None
         self.channel_id = None
+        # Vídeo/broadcast ao vivo conhecido, consultado diretamente a cada poll
+        self.active_video_id = None
+        self.search_fallback_interval = float(os.environ.get('YOUTUBE_SEARCH_FALLBACK_INTERVAL', 600))
+        self._last_search_at = 0.0
+        
+    def _credential_key(self) -> str:
+        """A cota da Data API é do projeto do Google Cloud, não do token de cada usuário"""
+        project = self.client_id or self.api_key
+        if not project:
+            return super()._credential_key()
+        return "project:" + hashlib.sha256(project.encode()).hexdigest()[:16]
         
     def authenticate(self, credentials: Dict[str, str]) -> bool:
         """Autentica com YouTube"""
         try:
             self.api_key = credentials.get("api_key")
+            self.client_id = credentials.get("client_id")
             self.access_token = credentials.get("access_token")
             
             if not self.api_key or not self.access_token:
@@ -181,10 +325,12 @@ class YouTubeIntegration(PlatformIntegrationService):
             headers = {"Authorization": f"Bearer {self.access_token}"}
             params = {"part": "id", "mine": "true", "key": self.api_key}
             
-            response = requests.get(f"{self.base_url}/channels", headers=headers, params=params)
+            response = self._request("GET", f"{self.base_url}/channels", headers=headers, params=params)
             if response.status_code == 200:
                 data = response.json()
                 if data.get("items"):
+                    if data["items"][0]["id"] != self.channel_id:
+                        self.active_video_id = None
                     self.channel_id = data["items"][0]["id"]
                     self.headers = headers
                     return True
@@ -199,7 +345,7 @@ class YouTubeIntegration(PlatformIntegrationService):
         """Cria um broadcast no YouTube"""
         try:
             url = f"{self.base_url}/liveBroadcasts"
-            params = {"part": "snippet,status", "key": self.api_key}
+            params = {"part": "snippet,status,contentDetails", "key": self.api_key}
             
             data = {
                 "snippet": {
@@ -209,12 +355,19 @@ class YouTubeIntegration(PlatformIntegrationService):
                 },
                 "status": {
                     "privacyStatus": "public"
+                },
+                # Sem stream de monitoramento: go_live passa direto de "ready" para "live"
+                "contentDetails": {
+                    "enableAutoStart": False,
+                    "enableAutoStop": True,
+                    "monitorStream": {"enableMonitorStream": False}
                 }
             }
             
-            response = requests.post(url, headers=self.headers, params=params, json=data)
+            response = self._request("POST", url, cost=50, headers=self.headers, params=params, json=data)
             if response.status_code == 200:
                 result = response.json()
+                self.active_video_id = result.get("id")
                 return result.get("id")
             
             return None
@@ -239,7 +392,7 @@ class YouTubeIntegration(PlatformIntegrationService):
                 }
             }
             
-            response = requests.post(url, headers=self.headers, params=params, json=data)
+            response = self._request("POST", url, cost=50, headers=self.headers, params=params, json=data)
             if response.status_code == 200:
                 result = response.json()
                 return {
@@ -259,50 +412,152 @@ class YouTubeIntegration(PlatformIntegrationService):
         # YouTube usa URLs dinâmicas, precisa criar stream primeiro
         return "rtmp://a.rtmp.youtube.com/live2/"
     
+    def prepare_stream(self, title: str = "", description: str = "",
+                       prepared: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Cria broadcast e stream e faz o bind entre eles, retomando passos já concluídos"""
+        prepared = {} if prepared is None else prepared
+        
+        if not prepared.get("broadcast_id"):
+            prepared["broadcast_id"] = self.create_broadcast(title or "Live Stream", description)
+            if not prepared["broadcast_id"]:
+                raise RuntimeError("Falha ao criar broadcast YouTube")
+        
+        if not prepared.get("stream_id"):
+            stream = self.create_stream(title or "Live Stream")
+            if not stream:
+                raise RuntimeError("Falha ao criar stream YouTube")
+            prepared.update(stream_id=stream["stream_id"], rtmp_url=stream["rtmp_url"],
+                            stream_key=stream["stream_name"])
+        
+        if not prepared.get("bound"):
+            url = f"{self.base_url}/liveBroadcasts/bind"
+            params = {"id": prepared["broadcast_id"], "streamId": prepared["stream_id"],
+                      "part": "id,contentDetails", "key": self.api_key}
+            response = self._request("POST", url, cost=50, headers=self.headers, params=params)
+            if response.status_code != 200:
+                raise RuntimeError(f"Falha ao vincular stream YouTube: HTTP {response.status_code}")
+            prepared["bound"] = True
+        
+        self.active_video_id = prepared["broadcast_id"]
+        return prepared
+    
+    def _transition(self, broadcast_id: str, status: str) -> bool:
+        url = f"{self.base_url}/liveBroadcasts/transition"
+        params = {"broadcastStatus": status, "id": broadcast_id, "part": "status", "key": self.api_key}
+        response = self._request("POST", url, cost=50, headers=self.headers, params=params)
+        if response.status_code == 200:
+            return True
+        
+        # Broadcast já está no estado pedido (ex.: nova tentativa após timeout)
+        try:
+            reasons = {e.get("reason") for e in response.json().get("error", {}).get("errors", [])}
+        except ValueError:
+            reasons = set()
+        return "redundantTransition" in reasons
+    
+    def ingest_active(self, prepared: Dict[str, Any]) -> bool:
+        """O stream vinculado ao broadcast está recebendo vídeo (streamStatus "active")"""
+        url = f"{self.base_url}/liveStreams"
+        params = {"part": "status", "id": prepared["stream_id"], "key": self.api_key}
+        response = self._request("GET", url, headers=self.headers, params=params)
+        if response.status_code != 200:
+            return False
+        items = response.json().get("items") or [{}]
+        return items[0].get("status", {}).get("streamStatus") == "active"
+    
+    def go_live(self, prepared: Dict[str, Any]) -> bool:
+        """Transição do broadcast para "live" (o ingest precisa estar recebendo vídeo)"""
+        return self._transition(prepared["broadcast_id"], "live")
+    
+    def stop_stream(self, prepared: Optional[Dict[str, Any]] = None) -> bool:
+        """Encerra o broadcast preparado, ou o ao vivo conhecido"""
+        broadcast_id = (prepared or {}).get("broadcast_id") or self.active_video_id
+        if not broadcast_id:
+            return False
+        if self._transition(broadcast_id, "complete"):
+            self.active_video_id = None
+            return True
+        return False
+    
+    def _find_live_video_id(self) -> Optional[str]:
+        """Descobre o vídeo ao vivo do canal quando ainda não há um id conhecido"""
+        # liveBroadcasts custa 1 unidade de cota; o id do broadcast é o id do vídeo
+        url = f"{self.base_url}/liveBroadcasts"
+        params = {"part": "id", "broadcastStatus": "active", "broadcastType": "all", "key": self.api_key}
+        
+        response = self._request("GET", url, headers=self.headers, params=params)
+        if response.status_code == 200:
+            items = response.json().get("items")
+            if items:
+                return items[0]["id"]
+        
+        # Busca completa (100 unidades) apenas como fallback periódico
+        if time.time() - self._last_search_at < self.search_fallback_interval:
+            return None
+        self._last_search_at = time.time()
+        
+        url = f"{self.base_url}/search"
+        params = {
+            "part": "id",
+            "channelId": self.channel_id,
+            "eventType": "live",
+            "type": "video",
+            "key": self.api_key
+        }
+        
+        response = self._request("GET", url, cost=100, headers=self.headers, params=params)
+        if response.status_code == 200:
+            items = response.json().get("items")
+            if items:
+                return items[0]["id"]["videoId"]
+        
+        return None
+    
+    @serve_last_status
     def get_stream_status(self) -> Dict[str, Any]:
         """Obtém status do stream YouTube"""
         try:
             if not self.channel_id:
                 return {"is_live": False, "viewer_count": 0}
-                
-            url = f"{self.base_url}/search"
-            params = {
-                "part": "id",
-                "channelId": self.channel_id,
-                "eventType": "live",
-                "type": "video",
+            
+            if not self.active_video_id:
+                self.active_video_id = self._find_live_video_id()
+                if not self.active_video_id:
+                    return {"is_live": False, "viewer_count": 0}
+            
+            # Consultar apenas o vídeo já conhecido
+            video_url = f"{self.base_url}/videos"
+            video_params = {
+                "part": "liveStreamingDetails,snippet",
+                "id": self.active_video_id,
                 "key": self.api_key
             }
             
-            response = requests.get(url, headers=self.headers, params=params)
-            if response.status_code == 200:
-                data = response.json()
-                if data.get("items"):
-                    # Há streams ao vivo
-                    video_id = data["items"][0]["id"]["videoId"]
-                    
-                    # Obter detalhes do vídeo
-                    video_url = f"{self.base_url}/videos"
-                    video_params = {
-                        "part": "liveStreamingDetails,snippet",
-                        "id": video_id,
-                        "key": self.api_key
-                    }
-                    
-                    video_response = requests.get(video_url, headers=self.headers, params=video_params)
-                    if video_response.status_code == 200:
-                        video_data = video_response.json()
-                        if video_data.get("items"):
-                            item = video_data["items"][0]
-                            return {
-                                "is_live": True,
-                                "viewer_count": int(item.get("liveStreamingDetails", {}).get("concurrentViewers", 0)),
-                                "title": item.get("snippet", {}).get("title", ""),
-                                "started_at": item.get("liveStreamingDetails", {}).get("actualStartTime")
-                            }
+            video_response = self._request("GET", video_url, headers=self.headers, params=video_params)
+            if video_response.status_code != 200:
+                return {"is_live": False, "viewer_count": 0}
             
-            return {"is_live": False, "viewer_count": 0}
+            items = video_response.json().get("items")
+            details = items[0].get("liveStreamingDetails", {}) if items else {}
+            
+            if not items or details.get("actualEndTime"):
+                # Transmissão encerrada ou removida: descobrir novamente na próxima consulta
+                self.active_video_id = None
+                return {"is_live": False, "viewer_count": 0}
+            
+            if not details.get("actualStartTime"):
+                # Broadcast criado, mas ainda não iniciado
+                return {"is_live": False, "viewer_count": 0}
+            
+            return {
+                "is_live": True,
+                "viewer_count": int(details.get("concurrentViewers", 0)),
+                "title": items[0].get("snippet", {}).get("title", ""),
+                "started_at": details.get("actualStartTime")
+            }
             
+        except RateLimitExceeded:
+            raise
         except Exception as e:
             logger.error(f"Erro ao obter status YouTube: {e}")
             return {"is_live": False, "viewer_count": 0}
@@ -310,15 +565,22 @@ class YouTubeIntegration(PlatformIntegrationService):
 class FacebookIntegration(PlatformIntegrationService):
     """Integração com Facebook Live"""
     
-    def __init__(self):
-        super().__init__("facebook")
+    identity_fields = ("app_id", "access_token", "page_id")
+    
+    def __init__(self, transport: Optional[HttpTransport] = None, governor: Optional[RateLimitGovernor] = None):
+        super().__init__("facebook", transport, governor)
         self.base_url = "https://graph.facebook.com/v18.0"
+        self.app_id = None
         self.access_token = None
         self.page_id = None
         
+    def _app_key(self) -> Optional[str]:
+        return self.app_id
+        
     def authenticate(self, credentials: Dict[str, str]) -> bool:
         """Autentica com Facebook"""
         try:
+            self.app_id = credentials.get("app_id")
             self.access_token = credentials.get("access_token")
             self.page_id = credentials.get("page_id")
             
@@ -327,7 +589,7 @@ class FacebookIntegration(PlatformIntegrationService):
                 
             # Validar token
             params = {"access_token": self.access_token}
-            response = requests.get(f"{self.base_url}/me", params=params)
+            response = self._request("GET", f"{self.base_url}/me", params=params)
             
             return response.status_code == 200
             
@@ -335,8 +597,8 @@ class FacebookIntegration(PlatformIntegrationService):
             logger.error(f"Erro na autenticação Facebook: {e}")
             return False
     
-    def create_live_video(self, title: str, description: str = "") -> Optional[Dict[str, str]]:
-        """Cria um vídeo ao vivo no Facebook"""
+    def create_live_video(self, title: str, description: str = "", status: str = "LIVE_NOW") -> Optional[Dict[str, str]]:
+        """Cria um vídeo ao vivo no Facebook (``status="UNPUBLISHED"`` para publicar depois)"""
         try:
             url = f"{self.base_url}/{self.page_id}/live_videos"
             params = {"access_token": self.access_token}
@@ -344,10 +606,10 @@ class FacebookIntegration(PlatformIntegrationService):
             data = {
                 "title": title,
                 "description": description,
-                "status": "LIVE_NOW"
+                "status": status
             }
             
-            response = requests.post(url, params=params, data=data)
+            response = self._request("POST", url, params=params, data=data)
             if response.status_code == 200:
                 result = response.json()
                 return {
@@ -367,6 +629,38 @@ class FacebookIntegration(PlatformIntegrationService):
         # Facebook usa URLs dinâmicas, precisa criar live video primeiro
         return "rtmps://live-api-s.facebook.com:443/rtmp/"
     
+    def prepare_stream(self, title: str = "", description: str = "",
+                       prepared: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Cria o vídeo ao vivo não publicado e separa URL e chave do ingest"""
+        prepared = {} if prepared is None else prepared
+        
+        if not prepared.get("video_id"):
+            video = self.create_live_video(title or "Live Stream", description, status="UNPUBLISHED")
+            if not video or not video.get("video_id"):
+                raise RuntimeError("Falha ao criar live video Facebook")
+            stream_url = video.get("secure_stream_url") or video.get("stream_url") or ""
+            rtmp_url, _, stream_key = stream_url.rpartition("/")
+            prepared.update(video_id=video["video_id"], rtmp_url=rtmp_url + "/", stream_key=stream_key)
+        
+        return prepared
+    
+    def _update_live_video(self, video_id: str, data: Dict[str, Any]) -> bool:
+        params = {"access_token": self.access_token}
+        response = self._request("POST", f"{self.base_url}/{video_id}", params=params, data=data)
+        return response.status_code == 200
+    
+    def go_live(self, prepared: Dict[str, Any]) -> bool:
+        """Publica o vídeo preparado (UNPUBLISHED -> LIVE_NOW)"""
+        return self._update_live_video(prepared["video_id"], {"status": "LIVE_NOW"})
+    
+    def stop_stream(self, prepared: Optional[Dict[str, Any]] = None) -> bool:
+        """Encerra o vídeo ao vivo preparado"""
+        video_id = (prepared or {}).get("video_id")
+        if not video_id:
+            return False
+        return self._update_live_video(video_id, {"end_live_video": "true"})
+    
+    @serve_last_status
     def get_stream_status(self) -> Dict[str, Any]:
         """Obtém status do stream Facebook"""
         try:
@@ -376,7 +670,7 @@ class FacebookIntegration(PlatformIntegrationService):
             url = f"{self.base_url}/{self.page_id}/live_videos"
             params = {"access_token": self.access_token}
             
-            response = requests.get(url, params=params)
+            response = self._request("GET", url, params=params)
             if response.status_code == 200:
                 data = response.json()
                 if data.get("data"):
@@ -392,6 +686,8 @@ class FacebookIntegration(PlatformIntegrationService):
             
             return {"is_live": False, "viewer_count": 0}
             
+        except RateLimitExceeded:
+            raise
         except Exception as e:
             logger.error(f"Erro ao obter status Facebook: {e}")
             return {"is_live": False, "viewer_count": 0}
@@ -399,15 +695,22 @@ class FacebookIntegration(PlatformIntegrationService):
 class InstagramIntegration(PlatformIntegrationService):
     """Integração com Instagram Live"""
     
-    def __init__(self):
-        super().__init__("instagram")
+    identity_fields = ("client_id", "access_token", "user_id")
+    
+    def __init__(self, transport: Optional[HttpTransport] = None, governor: Optional[RateLimitGovernor] = None):
+        super().__init__("instagram", transport, governor)
         self.base_url = "https://graph.facebook.com/v18.0"
+        self.client_id = None
         self.access_token = None
         self.user_id = None
         
+    def _app_key(self) -> Optional[str]:
+        return self.client_id
+        
     def authenticate(self, credentials: Dict[str, str]) -> bool:
         """Autentica com Instagram"""
         try:
+            self.client_id = credentials.get("client_id")
             self.access_token = credentials.get("access_token")
             self.user_id = credentials.get("user_id")
             
@@ -416,7 +719,7 @@ class InstagramIntegration(PlatformIntegrationService):
                 
             # Validar token
             params = {"access_token": self.access_token}
-            response = requests.get(f"{self.base_url}/{self.user_id}", params=params)
+            response = self._request("GET", f"{self.base_url}/{self.user_id}", params=params)
             
             return response.status_code == 200
             
@@ -429,6 +732,7 @@ class InstagramIntegration(PlatformIntegrationService):
         # Instagram Live Producer usa URLs dinâmicas
         return "rtmps://live-upload.instagram.com/rtmp/"
     
+    @serve_last_status
     def get_stream_status(self) -> Dict[str, Any]:
         """Obtém status do stream Instagram"""
         try:
@@ -438,7 +742,7 @@ class InstagramIntegration(PlatformIntegrationService):
             url = f"{self.base_url}/{self.user_id}/live_media"
             params = {"access_token": self.access_token}
             
-            response = requests.get(url, params=params)
+            response = self._request("GET", url, params=params)
             if response.status_code == 200:
                 data = response.json()
                 if data.get("data"):
@@ -453,6 +757,8 @@ class InstagramIntegration(PlatformIntegrationService):
             
             return {"is_live": False, "viewer_count": 0}
             
+        except RateLimitExceeded:
+            raise
         except Exception as e:
             logger.error(f"Erro ao obter status Instagram: {e}")
             return {"is_live": False, "viewer_count": 0}
@@ -460,8 +766,10 @@ class InstagramIntegration(PlatformIntegrationService):
 class TikTokIntegration(PlatformIntegrationService):
     """Integração com TikTok Live"""
     
-    def __init__(self):
-        super().__init__("tiktok")
+    identity_fields = ("access_token", "user_id")
+    
+    def __init__(self, transport: Optional[HttpTransport] = None, governor: Optional[RateLimitGovernor] = None):
+        super().__init__("tiktok", transport, governor)
         self.base_url = "https://open-api.tiktok.com"
         self.access_token = None
         self.user_id = None
@@ -488,6 +796,7 @@ class TikTokIntegration(PlatformIntegrationService):
         # TikTok Live requer uso do app móvel ou ferramentas específicas
         return None
     
+    @serve_last_status
     def get_stream_status(self) -> Dict[str, Any]:
         """Obtém status do stream TikTok"""
         # TikTok API pública não fornece status de live streaming
@@ -496,25 +805,53 @@ class TikTokIntegration(PlatformIntegrationService):
 class PlatformManager:
     """Gerenciador de todas as integrações de plataformas"""
     
-    def __init__(self):
+    def __init__(self, transport: Optional[HttpTransport] = None, identity_cache: Optional[AuthCache] = None,
+                 governor: Optional[RateLimitGovernor] = None):
+        # Pool de conexões compartilhado por todas as integrações
+        self.transport = transport or HttpTransport()
+        self.identity_cache = identity_cache or auth_cache
+        self.governor = governor or rate_governor
         self.platforms = {
-            "twitch": TwitchIntegration(),
-            "youtube": YouTubeIntegration(),
-            "facebook": FacebookIntegration(),
-            "instagram": InstagramIntegration(),
-            "tiktok": TikTokIntegration()
+            "twitch": TwitchIntegration(self.transport, self.governor),
+            "youtube": YouTubeIntegration(self.transport, self.governor),
+            "facebook": FacebookIntegration(self.transport, self.governor),
+            "instagram": InstagramIntegration(self.transport, self.governor),
+            "tiktok": TikTokIntegration(self.transport, self.governor)
         }
         
     def get_platform(self, platform_name: str) -> Optional[PlatformIntegrationService]:
         """Obtém integração de uma plataforma específica"""
         return self.platforms.get(platform_name.lower())
     
-    def authenticate_platform(self, platform_name: str, credentials: Dict[str, str]) -> bool:
-        """Autentica com uma plataforma específica"""
+    def authenticate_platform(self, platform_name: str, credentials: Dict[str, str], user_id=None) -> bool:
+        """Autentica com uma plataforma específica.
+
+        Quando ``user_id`` é informado, identidades já validadas com as mesmas
+        credenciais são reaproveitadas do cache, evitando a chamada à API.
+        """
         platform = self.get_platform(platform_name)
-        if platform:
+        if not platform:
+            return False
+        
+        if user_id is None:
             return platform.authenticate(credentials)
-        return False
+        
+        fingerprint = credentials_fingerprint(credentials)
+        identity = self.identity_cache.get(user_id, platform_name, fingerprint)
+        if identity is not None:
+            platform.restore_identity(identity)
+            return True
+        
+        if not platform.authenticate(credentials):
+            return False
+        
+        self.identity_cache.set(user_id, platform_name, fingerprint, platform.export_identity(),
+                                token_expiry(credentials))
+        return True
+    
+    def invalidate_authentication(self, user_id, platform_name: Optional[str] = None):
+        """Descarta identidades em cache (ex.: após troca de tokens)"""
+        self.identity_cache.invalidate(user_id, platform_name)
     
     def get_all_stream_status(self) -> Dict[str, Dict[str, Any]]:
         """Obtém status de todas as plataformas autenticadas"""
@@ -528,6 +865,17 @@ class PlatformManager:
         
         return status
     
+    def get_twitch_status_batch(self, broadcaster_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Status de vários canais Twitch (de qualquer usuário) em lotes de até 100 por chamada.
+
+        A integração Twitch deste gerenciador precisa estar autenticada; seu token
+        é usado para a consulta.
+        """
+        twitch = self.platforms["twitch"]
+        if not twitch.headers:
+            raise ValueError("Integração Twitch não autenticada")
+        return twitch.get_streams_status(broadcaster_ids)
+    
     def get_total_viewers(self) -> int:
         """Obtém total de visualizadores em todas as plataformas"""
         total = 0
@@ -539,6 +887,14 @@ class PlatformManager:
         
         return total
     
+    def get_rate_limit_status(self) -> Dict[str, Dict[str, Any]]:
+        """Saldo de rate limit/cota das plataformas autenticadas"""
+        return {
+            name: platform.get_rate_limit_status()
+            for name, platform in self.platforms.items()
+            if getattr(platform, "access_token", None)
+        }
+    
     def get_rtmp_endpoints(self) -> Dict[str, Dict[str, str]]:
         """Obtém endpoints RTMP de todas as plataformas"""
         endpoints = {}
@@ -557,3 +913,43 @@ class PlatformManager:
         
         return endpoints
 
+
+class PlatformManagerPool:
+    """Pool LRU limitado de PlatformManager, um por usuário.
+
+    As integrações guardam estado mutável (tokens, broadcaster_id, headers), então
+    cada usuário recebe seu próprio conjunto de instâncias. Todos os gerenciadores
+    compartilham o mesmo transporte HTTP e o mesmo cache de identidades.
+    """
+    
+    def __init__(self, max_size: Optional[int] = None, transport: Optional[HttpTransport] = None,
+                 identity_cache: Optional[AuthCache] = None, governor: Optional[RateLimitGovernor] = None):
+        self.max_size = max_size or int(os.environ.get('PLATFORM_MANAGER_POOL_SIZE', 256))
+        self.transport = transport or HttpTransport()
+        self.identity_cache = identity_cache or auth_cache
+        self.governor = governor or rate_governor
+        self._managers = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, user_id) -> PlatformManager:
+        """Obtém (ou cria) o gerenciador de um usuário"""
+        key = str(user_id)
+        with self._lock:
+            manager = self._managers.get(key)
+            if manager is not None:
+                self._managers.move_to_end(key)
+                return manager
+            
+            manager = PlatformManager(self.transport, self.identity_cache, self.governor)
+            self._managers[key] = manager
+            if len(self._managers) > self.max_size:
+                self._managers.popitem(last=False)
+            return manager
+    
+    def discard(self, user_id):
+        """Remove o gerenciador de um usuário do pool"""
+        with self._lock:
+            self._managers.pop(str(user_id), None)
+    
+    def __len__(self):
+        return len(self._managers)
@@ -0,0 +1,230 @@
+"""
+Controle de limites de requisição (rate limit / cota) das APIs das plataformas
+"""
+import os
+import json
+import time
+import logging
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# (capacidade, reposição por segundo) padrão de cada API
+PLATFORM_LIMITS = {
+    # Helix: 800 pontos por minuto por token
+    "twitch": (800, 800 / 60),
+    # YouTube Data API: 10.000 unidades de cota por dia
+    "youtube": (int(os.environ.get('YOUTUBE_QUOTA_UNITS', 10000)),
+                int(os.environ.get('YOUTUBE_QUOTA_UNITS', 10000)) / 86400),
+    # Graph API: 200 chamadas por usuário por hora
+    "facebook": (200, 200 / 3600),
+    "instagram": (200, 200 / 3600),
+    "tiktok": (600, 600 / 60)
+}
+DEFAULT_LIMIT = (600, 600 / 60)
+
+# Percentual de uso do app (X-App-Usage) a partir do qual a Graph API deixa de ser chamada
+GRAPH_APP_USAGE_LIMIT = float(os.environ.get('GRAPH_APP_USAGE_LIMIT', 95))
+# Pausa (s) das chamadas do app quando o uso informado passa do limite
+GRAPH_APP_BACKOFF = float(os.environ.get('GRAPH_APP_BACKOFF', 300))
+
+
+class RateLimitExceeded(Exception):
+    """Orçamento de chamadas da plataforma esgotado"""
+
+    def __init__(self, platform_name: str, retry_after: float):
+        super().__init__(f"Limite de requisições de {platform_name} esgotado (tente em {retry_after:.1f}s)")
+        self.platform_name = platform_name
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Balde de tokens com reposição contínua"""
+
+    def __init__(self, capacity: float, refill_rate: float):
+        self.capacity = capacity
+        self.refill_rate = refill_rate
+        self.tokens = capacity
+        self.blocked_until = 0.0
+        self.updated_at = time.time()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.refill_rate)
+        self.updated_at = now
+
+    def try_acquire(self, cost: float) -> Tuple[bool, float]:
+        """Tenta consumir ``cost`` tokens; retorna (sucesso, segundos até haver saldo)"""
+        now = time.time()
+        self._refill(now)
+
+        if now < self.blocked_until:
+            return False, self.blocked_until - now
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return True, 0.0
+        return False, (cost - self.tokens) / self.refill_rate if self.refill_rate else float("inf")
+
+    def sync(self, remaining: Optional[float] = None, reset_at: Optional[float] = None,
+             limit: Optional[float] = None):
+        """Ajusta o saldo com o que a própria API informou"""
+        now = time.time()
+        self._refill(now)
+        if limit:
+            self.capacity = limit
+        if remaining is not None:
+            self.tokens = min(self.capacity, max(0.0, remaining))
+        if reset_at and remaining is not None and remaining <= 0:
+            self.blocked_until = max(self.blocked_until, reset_at)
+
+    @property
+    def remaining(self) -> float:
+        self._refill(time.time())
+        return self.tokens
+
+
+class RateLimitGovernor:
+    """Um balde de tokens por plataforma e credencial.
+
+    Chamadas aguardam até ``max_wait`` segundos por saldo e, depois disso, são
+    descartadas com RateLimitExceeded. O saldo é sincronizado com os cabeçalhos de
+    rate limit quando a API os fornece (Twitch ``Ratelimit-*``) e zerado em
+    respostas 429 ou de cota excedida.
+
+    Limites que valem para o app inteiro, e não para cada usuário, usam um balde
+    do app (``app_key``) compartilhado por todas as credenciais: a Graph API
+    informa o uso do app em ``X-App-Usage`` e, perto de 100%, as chamadas do app
+    são pausadas por GRAPH_APP_BACKOFF segundos. A cota da YouTube Data API é
+    por projeto, então a integração já usa o projeto como ``credential_key``.
+    """
+
+    def __init__(self, max_wait: Optional[float] = None, max_buckets: Optional[int] = None,
+                 sweep_interval: Optional[float] = None):
+        self.max_wait = max_wait if max_wait is not None else float(os.environ.get('RATE_LIMIT_MAX_WAIT', 2))
+        self.max_buckets = max_buckets or int(os.environ.get('RATE_LIMIT_MAX_BUCKETS', 10000))
+        self.sweep_interval = sweep_interval or float(os.environ.get('RATE_LIMIT_SWEEP_INTERVAL', 300))
+        self._buckets = {}
+        self._last_sweep = time.time()
+        self._lock = threading.Lock()
+
+    def _bucket(self, platform_name: str, credential_key: str) -> TokenBucket:
+        key = (platform_name, credential_key)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            now = time.time()
+            if len(self._buckets) >= self.max_buckets or now - self._last_sweep >= self.sweep_interval:
+                self._evict_idle(now)
+            bucket = TokenBucket(*PLATFORM_LIMITS.get(platform_name, DEFAULT_LIMIT))
+            self._buckets[key] = bucket
+        return bucket
+
+    def _evict_idle(self, now: float):
+        """Descarta baldes cheios e sem bloqueio: recriá-los depois dá no mesmo"""
+        self._last_sweep = now
+        for key in [key for key, bucket in self._buckets.items()
+                    if bucket.remaining >= bucket.capacity and bucket.blocked_until <= now]:
+            del self._buckets[key]
+
+    def acquire(self, platform_name: str, credential_key: str, cost: float = 1, app_key: Optional[str] = None):
+        """Reserva ``cost`` unidades do orçamento, aguardando na fila se necessário"""
+        deadline = time.time() + self.max_wait
+        while True:
+            with self._lock:
+                # O balde do app só bloqueia (pausa informada pela API); o saldo é o da credencial
+                acquired, wait = (True, 0.0)
+                if app_key:
+                    acquired, wait = self._bucket(platform_name, f"app:{app_key}").try_acquire(0)
+                if acquired:
+                    acquired, wait = self._bucket(platform_name, credential_key).try_acquire(cost)
+            if acquired:
+                return
+            if time.time() + wait > deadline:
+                raise RateLimitExceeded(platform_name, wait)
+            time.sleep(wait)
+
+    def update_from_response(self, platform_name: str, credential_key: str, response,
+                             app_key: Optional[str] = None):
+        """Atualiza o saldo a partir dos cabeçalhos e do status da resposta"""
+        headers = response.headers
+        with self._lock:
+            bucket = self._bucket(platform_name, credential_key)
+
+            if "Ratelimit-Remaining" in headers:
+                bucket.sync(
+                    remaining=_to_float(headers.get("Ratelimit-Remaining")),
+                    reset_at=_to_float(headers.get("Ratelimit-Reset")),
+                    limit=_to_float(headers.get("Ratelimit-Limit"))
+                )
+
+            app_bucket = self._bucket(platform_name, f"app:{app_key}") if app_key else None
+            if app_bucket is not None and "X-App-Usage" in headers:
+                usage = _graph_usage_percent(headers.get("X-App-Usage"))
+                if usage is not None and usage >= GRAPH_APP_USAGE_LIMIT:
+                    app_bucket.blocked_until = max(app_bucket.blocked_until, time.time() + GRAPH_APP_BACKOFF)
+                    logger.warning(f"Uso do app em {platform_name} em {usage:.0f}%; pausando chamadas")
+
+            if response.status_code == 429 or _is_quota_error(response):
+                retry_after = _to_float(headers.get("Retry-After")) or 60
+                bucket.sync(remaining=0, reset_at=time.time() + retry_after)
+                if app_bucket is not None and _is_app_limit_error(response):
+                    app_bucket.blocked_until = max(app_bucket.blocked_until, time.time() + retry_after)
+                logger.warning(f"Limite de requisições atingido em {platform_name}")
+
+    def status(self, platform_name: str, credential_key: str) -> Dict[str, Any]:
+        """Saldo atual de uma credencial (exposto como métrica)"""
+        with self._lock:
+            bucket = self._bucket(platform_name, credential_key)
+            return {
+                "remaining": round(bucket.remaining, 2),
+                "capacity": bucket.capacity,
+                "blocked_for": max(0.0, round(bucket.blocked_until - time.time(), 2))
+            }
+
+
+def _to_float(value) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _graph_usage_percent(header: str) -> Optional[float]:
+    try:
+        usage = json.loads(header)
+    except (TypeError, ValueError):
+        return None
+    if not isinstance(usage, dict):
+        return None
+    return max((float(v) for v in usage.values() if isinstance(v, (int, float))), default=None)
+
+
+def _error_body(response) -> Dict[str, Any]:
+    """Objeto ``error`` do corpo JSON da resposta (vazio se o corpo não tiver esse formato)"""
+    try:
+        body = response.json()
+    except ValueError:
+        return {}
+    error = body.get("error") if isinstance(body, dict) else None
+    return error if isinstance(error, dict) else {}
+
+
+def _graph_error_code(response) -> Optional[int]:
+    return _error_body(response).get("code")
+
+
+def _is_app_limit_error(response) -> bool:
+    """Graph API: código 4 indica o limite do app (o 17 é o do usuário)"""
+    return _graph_error_code(response) == 4
+
+
+def _is_quota_error(response) -> bool:
+    if response.status_code != 403:
+        return False
+    errors = _error_body(response).get("errors")
+    if not isinstance(errors, list):
+        return False
+    return any(isinstance(e, dict) and e.get("reason") in ("quotaExceeded", "rateLimitExceeded") for e in errors)
+
+
+# Governador compartilhado pelo processo
+rate_governor = RateLimitGovernor()
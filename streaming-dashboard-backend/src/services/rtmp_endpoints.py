@@ -0,0 +1,77 @@
+"""
+Tabela materializada, por usuário, dos endpoints RTMP (URL de ingest e chave) de cada plataforma
+"""
+import os
+import time
+import logging
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class RtmpEndpointCache:
+    """Guarda os endpoints RTMP já resolvidos de cada usuário.
+
+    URLs de ingest e chaves quase nunca mudam, mas resolvê-las exige autenticar e
+    consultar cada plataforma. A tabela é montada uma vez e servida da memória até
+    que uma plataforma do usuário seja criada, alterada ou removida
+    (``invalidate``) ou que ``ttl`` segundos se passem. Tabelas incompletas (alguma
+    plataforma sem autenticação ou sem chave) expiram após ``retry_ttl`` segundos.
+    A tabela é por processo: em vários workers, o TTL limita a defasagem.
+    """
+
+    def __init__(self, ttl: Optional[float] = None, retry_ttl: Optional[float] = None):
+        self.ttl = ttl or float(os.environ.get('RTMP_ENDPOINTS_TTL', 3600))
+        self.retry_ttl = retry_ttl or float(os.environ.get('RTMP_ENDPOINTS_RETRY_TTL', 60))
+
+        # usuário -> {"endpoints", "built_at", "expires_at"}
+        self._tables = {}
+        # usuário -> número de invalidações, para não guardar tabela montada com dados antigos
+        self._generations = {}
+        self._user_locks = {}
+        self._lock = threading.Lock()
+
+    def _user_lock(self, user_id) -> threading.Lock:
+        with self._lock:
+            return self._user_locks.setdefault(str(user_id), threading.Lock())
+
+    def _fresh(self, user_id) -> Optional[Dict[str, Any]]:
+        table = self._tables.get(str(user_id))
+        if table is not None and time.time() < table["expires_at"]:
+            return table
+        return None
+
+    def get(self, user_id, build: Callable[[], Tuple[Dict[str, Dict[str, Any]], bool]]) -> Dict[str, Any]:
+        """Tabela do usuário; ``build`` (que retorna endpoints e se estão completos) só roda se preciso"""
+        table = self._fresh(user_id)
+        if table is not None:
+            return table
+
+        with self._user_lock(user_id):
+            # Outra requisição pode ter montado a tabela enquanto esta aguardava
+            table = self._fresh(user_id)
+            if table is not None:
+                return table
+
+            generation = self._generations.get(str(user_id), 0)
+            endpoints, complete = build()
+            built_at = time.time()
+            table = {
+                "endpoints": endpoints,
+                "built_at": built_at,
+                "expires_at": built_at + (self.ttl if complete else min(self.ttl, self.retry_ttl))
+            }
+            with self._lock:
+                if self._generations.get(str(user_id), 0) == generation:
+                    self._tables[str(user_id)] = table
+            return table
+
+    def invalidate(self, user_id):
+        """Descarta a tabela do usuário (plataforma criada, alterada ou removida)"""
+        with self._lock:
+            self._tables.pop(str(user_id), None)
+            self._generations[str(user_id)] = self._generations.get(str(user_id), 0) + 1
+
+
+rtmp_endpoint_cache = RtmpEndpointCache()
@@ -0,0 +1,296 @@
+"""
+Relay RTMP gerenciado pelo backend: recebe um único stream do streamer e o
+republica, sem recodificar, em cada plataforma de destino
+"""
+import os
+import time
+import hmac
+import shutil
+import atexit
+import hashlib
+import logging
+import threading
+import subprocess
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class RelayUnavailable(Exception):
+    """Relay desabilitado, ffmpeg ausente ou limite de processos atingido"""
+
+
+class RelayWorker:
+    """Um processo ffmpeg (``-c copy``) que lê o ingest local e publica em um destino.
+
+    A saída de ``-progress`` é lida em uma thread própria; cada linha atualiza
+    ``last_progress``, usado pelo supervisor para detectar processos travados.
+    """
+
+    def __init__(self, name: str, platform_id: Optional[int], source_url: str, target_url: str):
+        self.name = name
+        self.platform_id = platform_id
+        self.source_url = source_url
+        self.target_url = target_url
+
+        self.process = None
+        self.state = "starting"
+        self.restarts = 0
+        self.backoff = 0.0
+        self.next_start_at = 0.0
+        self.started_at = None
+        self.last_progress = None
+        self.bytes_sent = 0
+        self.bitrate = None
+        self.errors = deque(maxlen=10)
+        # Serializa supervisor e stop: um destino parado não pode ser reiniciado
+        self.lock = threading.Lock()
+
+    def command(self, ffmpeg_path: str, rw_timeout: float) -> List[str]:
+        return [
+            ffmpeg_path, "-hide_banner", "-nostats", "-loglevel", "error",
+            "-progress", "pipe:1",
+            # Sem dados do ingest por rw_timeout segundos, o ffmpeg encerra e é reiniciado
+            "-rw_timeout", str(int(rw_timeout * 1_000_000)),
+            "-i", self.source_url,
+            "-c", "copy", "-f", "flv", self.target_url
+        ]
+
+    def spawn(self, ffmpeg_path: str, rw_timeout: float):
+        self.process = subprocess.Popen(
+            self.command(ffmpeg_path, rw_timeout),
+            stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+            text=True, bufsize=1
+        )
+        self.state = "running"
+        self.started_at = time.time()
+        self.last_progress = self.started_at
+        threading.Thread(target=self._read_output, args=(self.process,),
+                         name=f"relay-{self.name}", daemon=True).start()
+
+    def _read_output(self, process: subprocess.Popen):
+        for line in process.stdout:
+            key, separator, value = line.strip().partition("=")
+            if not separator:
+                # Com -loglevel error, o que não é progresso é mensagem de erro
+                if line.strip():
+                    self.errors.append(line.strip())
+                continue
+            if key == "total_size" and value.isdigit():
+                if int(value) > self.bytes_sent:
+                    self.last_progress = time.time()
+                self.bytes_sent = int(value)
+            elif key == "bitrate":
+                self.bitrate = value
+            elif key == "progress" and value == "end":
+                self.last_progress = time.time()
+
+    def terminate(self, timeout: float = 5):
+        process, self.process = self.process, None
+        if process is None or process.poll() is not None:
+            return
+        process.terminate()
+        try:
+            process.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "platform": self.name,
+            "platform_id": self.platform_id,
+            "state": self.state,
+            "pid": self.process.pid if self.process else None,
+            "restarts": self.restarts,
+            "started_at": self.started_at,
+            "last_progress": self.last_progress,
+            "bytes_sent": self.bytes_sent,
+            "bitrate": self.bitrate,
+            "errors": list(self.errors)
+        }
+
+
+class RtmpRelay:
+    """Supervisor dos processos de relay de todos os usuários.
+
+    O streamer envia um único stream para o servidor de ingest local
+    (``source_url``/<chave do usuário>, ex.: MediaMTX ou nginx-rtmp) e cada destino
+    ganha um processo ffmpeg que copia esse stream para a plataforma. Assim o
+    uplink do streamer carrega uma cópia, não uma por plataforma.
+
+    Uma única thread supervisiona todos os processos (limitados a
+    ``max_workers``): processos que saem ou ficam ``stall_timeout`` segundos sem
+    enviar dados são reiniciados com backoff exponencial até ``max_backoff``; o
+    backoff volta ao início depois de ``stable_after`` segundos no ar. Enquanto o
+    streamer não publica no ingest, os processos ficam nesse ciclo (estado
+    ``backoff``) e começam a enviar assim que o stream chega.
+
+    As chaves de ingest são derivadas de RTMP_RELAY_SECRET (ou SECRET_KEY); sem
+    nenhum dos dois o relay fica desabilitado, já que com um segredo vazio
+    qualquer um poderia calcular a chave de outro usuário.
+    """
+
+    def __init__(self, enabled: Optional[bool] = None, ffmpeg_path: Optional[str] = None,
+                 source_url: Optional[str] = None, public_url: Optional[str] = None,
+                 max_workers: Optional[int] = None, stall_timeout: Optional[float] = None,
+                 restart_backoff: Optional[float] = None, max_backoff: Optional[float] = None,
+                 stable_after: Optional[float] = None, check_interval: Optional[float] = None):
+        if enabled is None:
+            enabled = os.environ.get('RTMP_RELAY_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+        self.ffmpeg_path = ffmpeg_path or os.environ.get('FFMPEG_PATH', 'ffmpeg')
+        self.source_url = (source_url or os.environ.get('RTMP_RELAY_SOURCE_URL', 'rtmp://127.0.0.1:1935/live')).rstrip('/')
+        self.public_url = (public_url or os.environ.get('RTMP_RELAY_PUBLIC_URL', self.source_url)).rstrip('/')
+        self.max_workers = max_workers or int(os.environ.get('RTMP_RELAY_MAX_WORKERS', 32))
+        self.stall_timeout = stall_timeout or float(os.environ.get('RTMP_RELAY_STALL_TIMEOUT', 15))
+        self.restart_backoff = restart_backoff or float(os.environ.get('RTMP_RELAY_RESTART_BACKOFF', 1))
+        self.max_backoff = max_backoff or float(os.environ.get('RTMP_RELAY_MAX_BACKOFF', 30))
+        self.stable_after = stable_after or float(os.environ.get('RTMP_RELAY_STABLE_AFTER', 30))
+        self.check_interval = check_interval or float(os.environ.get('RTMP_RELAY_CHECK_INTERVAL', 1))
+        self._secret = (os.environ.get('RTMP_RELAY_SECRET') or os.environ.get('SECRET_KEY') or '').encode()
+
+        self.disabled_reason = None
+        if not enabled:
+            self.disabled_reason = "Relay RTMP desabilitado (RTMP_RELAY_ENABLED)"
+        elif not self._secret:
+            self.disabled_reason = "Relay RTMP sem segredo para as chaves de ingest (RTMP_RELAY_SECRET ou SECRET_KEY)"
+            logger.error(self.disabled_reason)
+        self.enabled = self.disabled_reason is None
+
+        # usuário -> nome da plataforma -> RelayWorker
+        self._workers = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def ingest_for(self, user_id) -> Dict[str, str]:
+        """Servidor e chave para onde o streamer deve enviar (uma única saída no OBS).
+
+        A chave é derivada do segredo da aplicação, então é a mesma em todos os
+        workers e sobrevive a reinícios; a configuração do OBS não precisa mudar.
+        """
+        if not self._secret:
+            raise RelayUnavailable("Relay RTMP sem segredo para as chaves de ingest")
+        key = hmac.new(self._secret, f"rtmp-relay:{user_id}".encode(), hashlib.sha256).hexdigest()[:32]
+        return {"server": f"{self.public_url}/", "key": key}
+
+    def _check_available(self):
+        if not self.enabled:
+            raise RelayUnavailable(self.disabled_reason)
+        if shutil.which(self.ffmpeg_path) is None:
+            raise RelayUnavailable(f"ffmpeg não encontrado ({self.ffmpeg_path})")
+
+    def _ensure_supervisor(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, name="rtmp-relay-supervisor", daemon=True)
+        self._thread.start()
+        atexit.register(self.shutdown)
+
+    def start(self, user_id, destinations: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Inicia (ou mantém) um processo por destino ``{nome: {"url", "platform_id"}}``.
+
+        Destinos já ativos com a mesma URL são mantidos; os que mudaram de URL
+        são reiniciados.
+        """
+        self._check_available()
+        source = f"{self.source_url}/{self.ingest_for(user_id)['key']}"
+
+        with self._lock:
+            workers = self._workers.setdefault(str(user_id), {})
+            running = sum(len(user_workers) for user_workers in self._workers.values())
+            added = [name for name, destination in destinations.items()
+                     if name not in workers or workers[name].target_url != destination["url"]]
+            if running + len([name for name in added if name not in workers]) > self.max_workers:
+                raise RelayUnavailable("Limite de processos de relay atingido")
+
+            replaced = [workers.pop(name) for name in added if name in workers]
+            for name in added:
+                workers[name] = RelayWorker(name, destinations[name].get("platform_id"), source,
+                                            destinations[name]["url"])
+
+        for worker in replaced:
+            self._stop_worker(worker)
+
+        self._ensure_supervisor()
+        self._wakeup.set()
+        return self.status(user_id)
+
+    def stop(self, user_id, names: Optional[List[str]] = None) -> int:
+        """Encerra os processos do usuário (todos ou só os destinos indicados)"""
+        with self._lock:
+            workers = self._workers.get(str(user_id), {})
+            stopped = [workers.pop(name) for name in list(workers) if names is None or name in names]
+            if not workers:
+                self._workers.pop(str(user_id), None)
+
+        for worker in stopped:
+            self._stop_worker(worker)
+        return len(stopped)
+
+    @staticmethod
+    def _stop_worker(worker: RelayWorker):
+        with worker.lock:
+            worker.state = "stopped"
+            worker.terminate()
+
+    def status(self, user_id) -> List[Dict[str, Any]]:
+        with self._lock:
+            workers = list(self._workers.get(str(user_id), {}).values())
+        return [worker.to_dict() for worker in workers]
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.check_interval)
+            self._wakeup.clear()
+            with self._lock:
+                workers = [worker for user_workers in self._workers.values() for worker in user_workers.values()]
+            for worker in workers:
+                try:
+                    with worker.lock:
+                        self._supervise(worker)
+                except Exception as e:
+                    logger.error(f"Erro ao supervisionar relay para {worker.name}: {e}")
+
+    def _supervise(self, worker: RelayWorker):
+        now = time.time()
+
+        if worker.process is None:
+            if worker.state == "stopped" or now < worker.next_start_at:
+                return
+            try:
+                worker.spawn(self.ffmpeg_path, self.stall_timeout)
+            except OSError as e:
+                self._schedule_restart(worker, now, f"falha ao executar ffmpeg: {e}")
+                return
+            logger.info(f"Relay para {worker.name} iniciado (pid {worker.process.pid})")
+            return
+
+        exit_code = worker.process.poll()
+        stalled = exit_code is None and now - worker.last_progress > self.stall_timeout
+        if exit_code is None and not stalled:
+            if now - worker.started_at >= self.stable_after:
+                worker.backoff = 0.0
+            return
+
+        worker.terminate()
+        self._schedule_restart(worker, now, "sem envio de dados" if stalled else f"código de saída {exit_code}")
+
+    def _schedule_restart(self, worker: RelayWorker, now: float, reason: str):
+        logger.warning(f"Relay para {worker.name} parou ({reason}); reiniciando")
+        worker.errors.append(f"Processo reiniciado: {reason}")
+        worker.backoff = min(self.max_backoff, worker.backoff * 2 if worker.backoff else self.restart_backoff)
+        worker.next_start_at = now + worker.backoff
+        worker.restarts += 1
+        worker.state = "backoff"
+
+    def shutdown(self):
+        """Encerra todos os processos (saída da aplicação)"""
+        with self._lock:
+            users = list(self._workers)
+        for user_id in users:
+            self.stop(user_id)
+
+
+rtmp_relay = RtmpRelay()
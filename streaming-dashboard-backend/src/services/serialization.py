@@ -0,0 +1,54 @@
+"""
+Serialização rápida para rotas de listagem: seleção de colunas, JSON e ETag
+"""
+import json
+import hashlib
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, List, Sequence
+
+from flask import Response, request
+
+try:
+    import orjson
+except ImportError:  # orjson é opcional; sem ele usa o módulo json
+    orjson = None
+
+from src.models.user import db
+
+
+def _default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Objeto do tipo {type(value).__name__} não serializável")
+
+
+def dumps(payload: Any) -> bytes:
+    """Codifica em JSON tratando datetime nativamente (ISO 8601, como os to_dict)"""
+    if orjson is not None:
+        return orjson.dumps(payload, default=_default)
+    return json.dumps(payload, default=_default, separators=(",", ":")).encode()
+
+
+def select_columns(model, fields: Sequence[str]):
+    """Consulta apenas as colunas pedidas, sem hidratar objetos do ORM.
+
+    Retorna a query e o mapa nome -> coluna usado por ``rows_to_dicts``.
+    """
+    columns = {name: getattr(model, name) for name in fields}
+    return db.session.query(*columns.values()), columns
+
+
+def rows_to_dicts(rows: Iterable[Any], fields: Sequence[str], columns: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Converte as tuplas retornadas por ``select_columns`` em dicionários"""
+    positions = list(columns)
+    indexes = [positions.index(name) for name in fields]
+    return [{name: row[i] for name, i in zip(fields, indexes)} for row in rows]
+
+
+def json_response(payload: Any, status: int = 200, etag: bool = True, headers: Dict[str, str] = None) -> Response:
+    """Resposta JSON com ETag; devolve 304 quando o cliente já tem a mesma versão"""
+    response = Response(dumps(payload), status=status, mimetype="application/json", headers=headers)
+    if etag and status == 200:
+        response.set_etag(hashlib.sha1(response.get_data()).hexdigest())
+        response.make_conditional(request)
+    return response
@@ -0,0 +1,192 @@
+"""
+Acumuladores em memória para as métricas das sessões de transmissão (pico de
+espectadores e total de mensagens), gravados em lote com UPDATE atômico
+"""
+import os
+import time
+import atexit
+import logging
+import threading
+from typing import Iterable, Optional, Tuple
+
+from sqlalchemy import bindparam, case, func
+
+logger = logging.getLogger(__name__)
+
+
+class SessionMetrics:
+    """Mantém, por sessão ativa, o maior número de espectadores e as mensagens ainda não gravadas.
+
+    Cada amostra custa O(1) (consulta em dicionário e um max/soma). A cada
+    ``flush_interval`` segundos os valores pendentes são gravados em uma única
+    transação com ``max_viewers = MAX(max_viewers, :pico)`` e
+    ``total_messages = total_messages + :delta``, sem ler a linha antes. Como o
+    banco guarda os acumulados e só recebe deltas, reinícios do processo perdem no
+    máximo o último intervalo e nunca sobrescrevem valores gravados por outro worker.
+    """
+
+    def __init__(self, flush_interval: Optional[float] = None, refresh_interval: Optional[float] = None):
+        self.flush_interval = flush_interval or float(os.environ.get('SESSION_METRICS_FLUSH_INTERVAL', 10))
+        self.refresh_interval = refresh_interval or float(os.environ.get('SESSION_METRICS_REFRESH_INTERVAL', 60))
+
+        self.app = None
+        # sessão -> (usuário, plataforma) e (usuário, plataforma) -> sessão ativa
+        self._sessions = {}
+        self._active = {}
+        # sessão -> [pico de espectadores, mensagens desde o último flush]
+        self._pending = {}
+        # Sessões encerradas durante a recarga, para ela não as trazer de volta
+        self._ended = set()
+        self._last_refresh = 0.0
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def init_app(self, app):
+        """Associa os acumuladores à aplicação e inicia a thread de gravação"""
+        self.app = app
+        if self._thread and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, name="session-metrics-flush", daemon=True)
+        self._thread.start()
+        atexit.register(self.flush)
+
+    def track(self, session_id: int, user_id, platform_id: int):
+        """Registra uma sessão ativa (criada agora ou recarregada do banco)"""
+        with self._lock:
+            self._sessions[session_id] = (str(user_id), platform_id)
+            self._active[(str(user_id), platform_id)] = session_id
+
+    def owner(self, session_id: int) -> Optional[Tuple[str, int]]:
+        """Dono da sessão ativa; consulta o banco se ela ainda não está em memória
+        (criada por outro worker depois da última recarga)"""
+        owner = self._sessions.get(session_id)
+        if owner is not None or self.app is None:
+            return owner
+
+        from src.models.platform import StreamSession
+        with self.app.app_context():
+            row = StreamSession.query.with_entities(
+                StreamSession.user_id, StreamSession.platform_id
+            ).filter_by(id=session_id, is_active=True).first()
+        if row is None:
+            return None
+
+        with self._lock:
+            owner = self._sessions.setdefault(session_id, (str(row.user_id), row.platform_id))
+            if self._active.get(owner, -1) < session_id:
+                self._active[owner] = session_id
+        return owner
+
+    def observe_viewers(self, user_id, platform_id: int, viewers: int) -> bool:
+        """Amostra de audiência vinda do poller; ignorada se não há sessão ativa"""
+        session_id = self._active.get((str(user_id), platform_id))
+        if session_id is None:
+            return False
+        with self._lock:
+            pending = self._pending.setdefault(session_id, [0, 0])
+            pending[0] = max(pending[0], int(viewers))
+        return True
+
+    def add_messages(self, session_id: int, count: int = 1) -> bool:
+        if session_id not in self._sessions:
+            return False
+        with self._lock:
+            self._pending.setdefault(session_id, [0, 0])[1] += int(count)
+        return True
+
+    def untrack(self, session_id: int):
+        """Grava o pendente da sessão e deixa de acompanhá-la (sessão encerrada)"""
+        self.flush([session_id])
+        with self._lock:
+            owner = self._sessions.pop(session_id, None)
+            if owner and self._active.get(owner) == session_id:
+                del self._active[owner]
+            self._ended.add(session_id)
+
+    def _run(self):
+        while True:
+            try:
+                if time.time() - self._last_refresh >= self.refresh_interval:
+                    self._refresh_active()
+            except Exception as e:
+                logger.error(f"Erro ao carregar sessões de transmissão ativas: {e}")
+
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Erro ao gravar métricas das sessões de transmissão: {e}")
+
+    def _refresh_active(self):
+        """Recarrega as sessões ativas do banco (após reinício ou criadas por outro worker).
+
+        O resultado é mesclado sob o lock: sessões registradas por ``track`` durante
+        a consulta são mantidas e as encerradas por ``untrack`` não voltam.
+        """
+        from src.models.platform import StreamSession
+        with self._lock:
+            known = set(self._sessions)
+            self._ended.clear()
+
+        with self.app.app_context():
+            rows = StreamSession.query.with_entities(
+                StreamSession.id, StreamSession.user_id, StreamSession.platform_id
+            ).filter_by(is_active=True).order_by(StreamSession.id).all()
+
+        with self._lock:
+            # Encerradas por outro worker: conhecidas antes da consulta e ausentes dela
+            for session_id in known - {row.id for row in rows}:
+                owner = self._sessions.pop(session_id, None)
+                if owner and self._active.get(owner) == session_id:
+                    del self._active[owner]
+            for row in rows:
+                if row.id in self._ended:
+                    continue
+                owner = self._sessions.setdefault(row.id, (str(row.user_id), row.platform_id))
+                if self._active.get(owner, -1) < row.id:
+                    self._active[owner] = row.id
+            self._ended.clear()
+        self._last_refresh = time.time()
+
+    def flush(self, session_ids: Optional[Iterable[int]] = None) -> int:
+        """Grava os acumulados pendentes (de todas as sessões ou só das indicadas) em uma transação"""
+        if self.app is None:
+            return 0
+
+        with self._lock:
+            keys = list(self._pending) if session_ids is None else [s for s in session_ids if s in self._pending]
+            pending = {session_id: self._pending.pop(session_id) for session_id in keys}
+
+        if not pending:
+            return 0
+
+        from src.models.platform import StreamSession, db
+        table = StreamSession.__table__
+        max_viewers = func.coalesce(table.c.max_viewers, 0)
+        statement = table.update().where(table.c.id == bindparam('b_id')).values(
+            max_viewers=case((max_viewers < bindparam('b_viewers'), bindparam('b_viewers')), else_=max_viewers),
+            total_messages=func.coalesce(table.c.total_messages, 0) + bindparam('b_messages')
+        )
+        rows = [{'b_id': session_id, 'b_viewers': viewers, 'b_messages': messages}
+                for session_id, (viewers, messages) in pending.items()]
+
+        with self.app.app_context():
+            try:
+                db.session.execute(statement, rows)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                # Devolver ao acumulador, combinando com o que chegou nesse meio tempo
+                with self._lock:
+                    for session_id, (viewers, messages) in pending.items():
+                        current = self._pending.setdefault(session_id, [0, 0])
+                        current[0] = max(current[0], viewers)
+                        current[1] += messages
+                raise
+
+        return len(rows)
+
+
+session_metrics = SessionMetrics()
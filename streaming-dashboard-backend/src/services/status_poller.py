@@ -0,0 +1,349 @@
+"""
+Coleta periódica em segundo plano do status das plataformas
+"""
+import os
+import time
+import logging
+import functools
+import threading
+from typing import Any, Dict, Optional
+
+from src.services.fanout import FanOutExecutor
+from src.services.event_bus import EventBus, event_bus
+from src.services.rate_limiter import RateLimitExceeded
+from src.services.viewer_history import SeriesHistory, viewer_history
+from src.services.session_metrics import SessionMetrics, session_metrics
+
+logger = logging.getLogger(__name__)
+
+TWITCH_BATCH_TASK = "twitch-batch"
+
+
+class SnapshotStore:
+    """Último status conhecido de cada plataforma, indexado por usuário e plataforma"""
+
+    def __init__(self):
+        self._snapshots = {}
+        self._lock = threading.Lock()
+
+    def set(self, user_id, platform_id: int, snapshot: Dict[str, Any], source: str = "route"):
+        """Grava o snapshot; ``source`` indica quem consultou a plataforma ("poller" ou "route")"""
+        snapshot = dict(snapshot, updated_at=time.time(), source=source)
+        with self._lock:
+            self._snapshots.setdefault(str(user_id), {})[platform_id] = snapshot
+
+    def get(self, user_id, platform_id: int, max_age: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Retorna o snapshot de uma plataforma, ou None se ausente ou mais antigo que max_age"""
+        with self._lock:
+            snapshot = self._snapshots.get(str(user_id), {}).get(platform_id)
+        if snapshot is None:
+            return None
+        if max_age is not None and time.time() - snapshot["updated_at"] > max_age:
+            return None
+        return snapshot
+
+    def get_user(self, user_id) -> Dict[int, Dict[str, Any]]:
+        """Retorna todos os snapshots de um usuário"""
+        with self._lock:
+            return dict(self._snapshots.get(str(user_id), {}))
+
+    def discard(self, user_id, platform_id: Optional[int] = None):
+        with self._lock:
+            if platform_id is None:
+                self._snapshots.pop(str(user_id), None)
+            else:
+                self._snapshots.get(str(user_id), {}).pop(platform_id, None)
+
+    def retain(self, keys):
+        """Descarta snapshots de plataformas que não estão mais ativas"""
+        keys = {(str(user_id), platform_id) for user_id, platform_id in keys}
+        with self._lock:
+            for user_key, platforms in list(self._snapshots.items()):
+                for platform_id in list(platforms):
+                    if (user_key, platform_id) not in keys:
+                        del platforms[platform_id]
+                if not platforms:
+                    del self._snapshots[user_key]
+
+
+class StatusPoller:
+    """Agendador que consulta get_stream_status de cada plataforma ativa em segundo plano.
+
+    O intervalo é adaptativo: plataformas ao vivo são consultadas a cada
+    ``live_interval`` segundos; plataformas offline começam em
+    ``offline_interval`` e dobram o intervalo a cada consulta até ``max_interval``.
+    Os resultados vão para o SnapshotStore, lido pelas rotas GET, e a audiência
+    de cada consulta bem-sucedida alimenta o histórico de espectadores e o pico
+    da sessão de transmissão ativa.
+
+    Cada processo (worker do gunicorn) executa seu próprio poller.
+    """
+
+    def __init__(self, store: SnapshotStore,
+                 events: Optional[EventBus] = None,
+                 history: Optional[SeriesHistory] = None,
+                 metrics: Optional[SessionMetrics] = None,
+                 live_interval: Optional[float] = None,
+                 offline_interval: Optional[float] = None,
+                 max_interval: Optional[float] = None,
+                 refresh_interval: Optional[float] = None,
+                 route_max_age: Optional[float] = None,
+                 tick: float = 1.0):
+        self.store = store
+        self.events = events or event_bus
+        self.history = history or viewer_history
+        self.metrics = metrics or session_metrics
+        self.live_interval = live_interval or float(os.environ.get('STATUS_POLL_LIVE_INTERVAL', 10))
+        self.offline_interval = offline_interval or float(os.environ.get('STATUS_POLL_OFFLINE_INTERVAL', 30))
+        self.max_interval = max_interval or float(os.environ.get('STATUS_POLL_MAX_INTERVAL', 300))
+        self.refresh_interval = refresh_interval or float(os.environ.get('STATUS_POLL_REFRESH_INTERVAL', 15))
+        self.route_max_age = route_max_age or float(os.environ.get('STATUS_SNAPSHOT_ROUTE_TTL', 15))
+        self.tick = tick
+
+        self.app = None
+        self.manager_pool = None
+        self._executor = FanOutExecutor()
+        self._targets = {}
+        self._schedule = {}
+        self._last_refresh = 0.0
+        self._last_poll = 0.0
+        self._thread = None
+        self._stop = threading.Event()
+
+    @property
+    def max_age(self) -> float:
+        """Idade máxima de um snapshot do poller para ainda ser servido pelas rotas"""
+        return self.max_interval * 2
+
+    @property
+    def is_running(self) -> bool:
+        """Thread ativa e com uma rodada concluída recentemente"""
+        return bool(self._thread and self._thread.is_alive()
+                    and time.time() - self._last_poll <= self.refresh_interval * 2)
+
+    def snapshot(self, user_id, platform_id: int) -> Optional[Dict[str, Any]]:
+        """Snapshot que as rotas podem servir no lugar de consultar a plataforma.
+
+        Snapshots do poller valem por ``max_age`` enquanto ele está rodando, pois ele
+        os mantém atualizados no ritmo de cada plataforma. Os gravados pelas
+        próprias rotas (ou pelo poller parado ou falhando) valem só ``route_max_age``.
+        """
+        snapshot = self.store.get(user_id, platform_id)
+        if snapshot is None:
+            return None
+        max_age = self.max_age if snapshot.get("source") == "poller" and self.is_running else self.route_max_age
+        if time.time() - snapshot["updated_at"] > max_age:
+            return None
+        return snapshot
+
+    def init_app(self, app, manager_pool):
+        """Associa o poller à aplicação e inicia a thread, se habilitado"""
+        self.app = app
+        self.manager_pool = manager_pool
+
+        if os.environ.get('STATUS_POLLER_ENABLED', 'true').lower() in ('1', 'true', 'yes'):
+            self.start()
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="status-poller", daemon=True)
+        self._thread.start()
+        logger.info("Poller de status das plataformas iniciado")
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.poll_due()
+            except Exception as e:
+                logger.error(f"Erro no poller de status: {e}")
+            self._stop.wait(self.tick)
+
+    def _refresh_targets(self):
+        """Recarrega do banco a lista de plataformas ativas e suas credenciais"""
+        from src.models.platform import Platform
+
+        with self.app.app_context():
+            platforms = Platform.query.filter_by(is_active=True).all()
+
+            targets = {}
+            for platform in platforms:
+                try:
+                    credentials = platform.get_credentials()
+                except Exception as e:
+                    logger.error(f"Erro ao descriptografar credenciais de {platform.platform_name}: {e}")
+                    continue
+
+                targets[(str(platform.user_id), platform.id)] = {
+                    "user_id": platform.user_id,
+                    "platform_id": platform.id,
+                    "name": platform.platform_name,
+                    "display_name": platform.display_name,
+                    "credentials": credentials
+                }
+
+        self._targets = targets
+        self._schedule = {key: self._schedule.get(key, 0.0) for key in targets}
+        self.store.retain(targets)
+        self._last_refresh = time.time()
+
+    def poll_due(self):
+        """Consulta, em paralelo, todas as plataformas cujo próximo horário já chegou"""
+        now = time.time()
+        if now - self._last_refresh >= self.refresh_interval:
+            self._refresh_targets()
+
+        due = [key for key, next_at in self._schedule.items() if next_at <= now]
+        self._last_poll = now
+        if not due:
+            return
+
+        # Canais Twitch de todos os usuários são consultados juntos, em lotes
+        twitch_due = [key for key in due if self._targets[key]["name"].lower() == "twitch"]
+        tasks = {key: functools.partial(self._poll_target, self._targets[key]) for key in due if key not in twitch_due}
+        if twitch_due:
+            tasks[TWITCH_BATCH_TASK] = functools.partial(self._poll_twitch_batch, twitch_due)
+
+        results = self._executor.run(tasks)
+
+        batch = results.pop(TWITCH_BATCH_TASK, None)
+        if batch is not None:
+            for key in twitch_due:
+                if batch["ok"]:
+                    results[key] = {"ok": True, "result": batch["result"][key], "error": None}
+                else:
+                    results[key] = batch
+
+        for key, outcome in results.items():
+            target = self._targets[key]
+            if outcome["ok"]:
+                snapshot = outcome["result"]
+            else:
+                snapshot = {
+                    "is_authenticated": False,
+                    "status": {"is_live": False, "viewer_count": 0},
+                    "error": outcome["error"]
+                }
+
+            snapshot.update(platform_id=target["platform_id"], name=target["name"],
+                            display_name=target["display_name"])
+            previous = self.store.get(target["user_id"], target["platform_id"])
+            interval = self._next_interval(previous, snapshot)
+            self.store.set(target["user_id"], target["platform_id"], snapshot, source="poller")
+            self._schedule[key] = time.time() + interval
+            self._publish_delta(target, previous, snapshot)
+            if outcome["ok"]:
+                self._record_history(target, previous, snapshot)
+
+    def _record_history(self, target: Dict[str, Any], previous: Optional[Dict[str, Any]], snapshot: Dict[str, Any]):
+        """Registra a audiência enquanto ao vivo, e um zero ao sair do ar"""
+        status = snapshot["status"]
+        if status.get("stale"):
+            return
+        was_live = bool(previous and previous["status"].get("is_live"))
+        if status.get("is_live") or was_live:
+            self.history.record(target["user_id"], target["name"].lower(), status.get("viewer_count", 0))
+        if status.get("is_live"):
+            self.metrics.observe_viewers(target["user_id"], target["platform_id"], status.get("viewer_count", 0))
+
+    def _publish_delta(self, target: Dict[str, Any], previous: Optional[Dict[str, Any]], snapshot: Dict[str, Any]):
+        """Envia ao canal de push apenas mudanças de status ou de audiência"""
+        status = snapshot["status"]
+        if previous:
+            old_status = previous["status"]
+            if (old_status.get("is_live") == status.get("is_live")
+                    and old_status.get("viewer_count") == status.get("viewer_count")
+                    and previous.get("is_authenticated") == snapshot.get("is_authenticated")):
+                return
+
+        self.events.publish(target["user_id"], "platform_status", f"platform:{target['platform_id']}", {
+            "platform_id": target["platform_id"],
+            "name": target["name"],
+            "is_authenticated": snapshot.get("is_authenticated", False),
+            "is_live": status.get("is_live", False),
+            "viewer_count": status.get("viewer_count", 0),
+            "went_live": bool(status.get("is_live") and not (previous and previous["status"].get("is_live"))),
+            "went_offline": bool(previous and previous["status"].get("is_live") and not status.get("is_live"))
+        })
+
+    def _poll_target(self, target: Dict[str, Any]) -> Dict[str, Any]:
+        manager = self.manager_pool.get(target["user_id"])
+        if not manager.authenticate_platform(target["name"], target["credentials"], target["user_id"]):
+            return {
+                "is_authenticated": False,
+                "status": {"is_live": False, "viewer_count": 0},
+                "error": "Falha na autenticação"
+            }
+
+        platform_service = manager.get_platform(target["name"])
+        if not platform_service:
+            return {
+                "is_authenticated": False,
+                "status": {"is_live": False, "viewer_count": 0},
+                "error": "Serviço não disponível"
+            }
+
+        return {"is_authenticated": True, "status": platform_service.get_stream_status()}
+
+    def _poll_twitch_batch(self, keys) -> Dict[Any, Dict[str, Any]]:
+        """Autentica cada canal Twitch (via cache) e consulta todos em lotes na Helix"""
+        results = {}
+        broadcaster_ids = {}
+        lead_manager = None
+
+        for key in keys:
+            target = self._targets[key]
+            manager = self.manager_pool.get(target["user_id"])
+            if not manager.authenticate_platform(target["name"], target["credentials"], target["user_id"]):
+                results[key] = {
+                    "is_authenticated": False,
+                    "status": {"is_live": False, "viewer_count": 0},
+                    "error": "Falha na autenticação"
+                }
+                continue
+
+            broadcaster_ids[key] = manager.get_platform("twitch").broadcaster_id
+            lead_manager = lead_manager or manager
+
+        if not broadcaster_ids:
+            return results
+
+        try:
+            statuses = lead_manager.get_twitch_status_batch(list(set(broadcaster_ids.values())))
+        except RateLimitExceeded as e:
+            logger.warning(f"{e}; usando último status conhecido")
+            statuses = {}
+            for key, broadcaster_id in broadcaster_ids.items():
+                previous = self.store.get(self._targets[key]["user_id"], self._targets[key]["platform_id"])
+                last_status = previous["status"] if previous else {"is_live": False, "viewer_count": 0}
+                statuses[broadcaster_id] = dict(last_status, stale=True)
+
+        for key, broadcaster_id in broadcaster_ids.items():
+            results[key] = {
+                "is_authenticated": True,
+                "status": statuses.get(broadcaster_id, {"is_live": False, "viewer_count": 0})
+            }
+
+        return results
+
+    def _next_interval(self, previous: Optional[Dict[str, Any]], snapshot: Dict[str, Any]) -> float:
+        if snapshot["status"].get("is_live"):
+            interval = self.live_interval
+        elif previous and not previous["status"].get("is_live"):
+            # Backoff exponencial enquanto a plataforma continua offline
+            interval = min(previous.get("poll_interval", self.offline_interval) * 2, self.max_interval)
+        else:
+            interval = self.offline_interval
+
+        snapshot["poll_interval"] = interval
+        return interval
+
+
+snapshot_store = SnapshotStore()
+status_poller = StatusPoller(snapshot_store)
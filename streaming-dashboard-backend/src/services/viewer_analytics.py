@@ -0,0 +1,224 @@
+"""
+Análises vetorizadas (NumPy) sobre o histórico de audiência: totais, picos,
+médias móveis, retenção e participação por plataforma
+
+Benchmark com transmissões de vários dias amostradas a cada segundo:
+
+    python -m src.services.viewer_analytics [dias] [plataformas]
+"""
+import sys
+import time
+import math
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.services.viewer_history import SeriesHistory, Tier, TieredSeries
+
+
+def tier_arrays(tier: Tier, since: float, until: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Timestamps, médias e picos de um nível em [since, until], sem laço em Python.
+
+    Os buffers circulares são lidos com np.frombuffer (sem cópia); o buffer
+    rotacionado tem no máximo dois trechos ordenados, localizados com searchsorted.
+    Só o intervalo pedido é copiado.
+    """
+    timestamps = np.frombuffer(tier.timestamps, dtype=np.float64)
+    values = np.frombuffer(tier.values, dtype=np.float64)
+    peaks = np.frombuffer(tier.peaks, dtype=np.float64)
+
+    start = (tier.head - tier.count) % tier.capacity if tier.count else 0
+    if start + tier.count <= tier.capacity:
+        segments = [(start, start + tier.count)]
+    else:
+        segments = [(start, tier.capacity), (0, tier.head)]
+
+    parts = ([], [], [])
+    for begin, end in segments:
+        segment = timestamps[begin:end]
+        low = begin + int(np.searchsorted(segment, since, side='left'))
+        high = begin + int(np.searchsorted(segment, until, side='right'))
+        for part, source in zip(parts, (timestamps, values, peaks)):
+            part.append(source[low:high])
+
+    # Bucket ainda aberto (parcial), para o gráfico chegar até o momento atual
+    if tier._samples and since <= tier._bucket <= until:
+        parts[0].append(np.array([tier._bucket]))
+        parts[1].append(np.array([tier._sum / tier._samples]))
+        parts[2].append(np.array([tier._peak]))
+
+    return tuple(np.concatenate(part) if part else np.empty(0) for part in parts)
+
+
+def load_matrix(history: SeriesHistory, user_id, since: float, until: float, max_points: int,
+                resolution: Optional[int] = None, keys: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+    """Alinha as séries do usuário em matrizes (séries x buckets) na mesma resolução.
+
+    Buckets sem amostra ficam como NaN. O intervalo é limitado aos pontos retidos
+    no nível escolhido e a grade a ``max_points`` buckets (os mais recentes),
+    mesmo com ``resolution`` explícita.
+    """
+    selected = {key: series for key, series in history.user_series(user_id).items()
+                if keys is None or key in keys}
+    if not selected:
+        return _empty_matrix(resolution or history.tiers[0][0])
+
+    chosen = history.select_resolution(selected, since, until, max_points, resolution)
+
+    bounds = []
+    for series in selected.values():
+        with series.lock:
+            tier = series.select_tier(since, until, max_points, chosen)
+            if tier.oldest() is not None:
+                bounds.append((tier.oldest(), tier._bucket))
+    if bounds:
+        since = max(since, min(oldest for oldest, _ in bounds))
+        until = min(until, max(newest for _, newest in bounds))
+    if not bounds or since > until:
+        return _empty_matrix(chosen)
+
+    grid_start = math.floor(since / chosen) * chosen
+    size = int((until - grid_start) // chosen) + 1
+    if size > max_points:
+        grid_start += (size - max_points) * chosen
+        size = max_points
+        since = max(since, grid_start)
+
+    names = sorted(selected)
+    values = np.full((len(names), size), np.nan)
+    peaks = np.full((len(names), size), np.nan)
+    for row, key in enumerate(names):
+        series: TieredSeries = selected[key]
+        with series.lock:
+            timestamps, series_values, series_peaks = tier_arrays(
+                series.select_tier(since, until, max_points, chosen), since, until)
+        columns = ((timestamps - grid_start) // chosen).astype(np.intp)
+        values[row, columns] = series_values
+        peaks[row, columns] = series_peaks
+
+    # Descartar buckets em que nenhuma série tem dado
+    present = ~np.isnan(values).all(axis=0)
+    return {
+        'resolution': chosen,
+        'keys': names,
+        'timestamps': (grid_start + np.arange(size) * chosen)[present],
+        'values': values[:, present],
+        'peaks': peaks[:, present]
+    }
+
+
+def _empty_matrix(resolution: int) -> Dict[str, Any]:
+    empty = np.empty((0, 0))
+    return {'resolution': resolution, 'keys': [], 'timestamps': np.empty(0), 'values': empty, 'peaks': empty}
+
+
+def moving_average(values: np.ndarray, window: int) -> np.ndarray:
+    """Média móvel por soma acumulada; os primeiros pontos usam a janela disponível"""
+    if values.size == 0:
+        return values
+    window = max(1, window)
+    cumulative = np.concatenate(([0.0], np.cumsum(values)))
+    index = np.arange(values.size)
+    low = np.maximum(0, index - window + 1)
+    return (cumulative[index + 1] - cumulative[low]) / (index + 1 - low)
+
+
+def _round(values: np.ndarray, digits: int = 2) -> List[Optional[float]]:
+    rounded = np.round(values, digits)
+    return [None if math.isnan(v) else v for v in rounded.tolist()]
+
+
+def total_series(series: Dict[str, Dict[str, List[float]]]) -> Dict[str, List[float]]:
+    """Soma por bucket das séries devolvidas por SeriesHistory.query"""
+    if not series:
+        return {'timestamps': [], 'values': []}
+    timestamps = np.concatenate([np.asarray(data['timestamps'], dtype=np.float64) for data in series.values()])
+    values = np.concatenate([np.asarray(data['values'], dtype=np.float64) for data in series.values()])
+    buckets, inverse = np.unique(timestamps, return_inverse=True)
+    return {'timestamps': buckets.tolist(), 'values': np.bincount(inverse, weights=values).tolist()}
+
+
+def summarize(matrix: Dict[str, Any], smooth: float = 60) -> Dict[str, Any]:
+    """Séries pré-calculadas para os gráficos do painel.
+
+    ``total``: soma entre plataformas; ``moving_average``: média do total em uma
+    janela de ``smooth`` segundos; ``retention``: total sobre o maior total até o
+    momento; ``share``: fração do total em cada plataforma por bucket.
+    """
+    keys = matrix['keys']
+    resolution = matrix['resolution']
+    values = matrix['values']
+    timestamps = matrix['timestamps']
+
+    if not keys or timestamps.size == 0:
+        return {'resolution': resolution, 'timestamps': [], 'total': [], 'moving_average': [],
+                'retention': [], 'share': {}, 'platforms': {}, 'peak': None}
+
+    filled = np.nan_to_num(values)
+    total = filled.sum(axis=0)
+    running_peak = np.maximum.accumulate(total)
+    retention = np.divide(total, running_peak, out=np.zeros_like(total), where=running_peak > 0)
+    share = np.divide(filled, total, out=np.zeros_like(filled), where=total > 0)
+
+    # Espectador-segundos (tempo assistido) por plataforma
+    watch_time = filled.sum(axis=1) * resolution
+    overall_share = watch_time / watch_time.sum() if watch_time.sum() > 0 else np.zeros_like(watch_time)
+
+    peaks = matrix['peaks']
+    has_data = ~np.isnan(peaks).all(axis=1)
+    peak_index = np.where(has_data, np.argmax(np.where(np.isnan(peaks), -np.inf, peaks), axis=1), 0)
+    platform_peaks = peaks[np.arange(len(keys)), peak_index]
+    averages = np.divide(np.nansum(values, axis=1), (~np.isnan(values)).sum(axis=1),
+                         out=np.zeros(len(keys)), where=(~np.isnan(values)).any(axis=1))
+
+    total_peak_index = int(np.argmax(total))
+    platforms = {
+        key: {
+            'peak': float(platform_peaks[row]) if has_data[row] else None,
+            'peak_at': float(timestamps[peak_index[row]]) if has_data[row] else None,
+            'average': round(float(averages[row]), 2),
+            'viewer_seconds': round(float(watch_time[row]), 2),
+            'share': round(float(overall_share[row]), 4)
+        }
+        for row, key in enumerate(keys)
+    }
+
+    return {
+        'resolution': resolution,
+        'timestamps': timestamps.tolist(),
+        'total': _round(total),
+        'moving_average': _round(moving_average(total, int(round(smooth / resolution)))),
+        'retention': _round(retention, 4),
+        'share': {key: _round(share[row], 4) for row, key in enumerate(keys)},
+        'platforms': platforms,
+        'peak': {'value': float(total[total_peak_index]), 'at': float(timestamps[total_peak_index])}
+    }
+
+
+def _benchmark(days: float = 3, platforms: int = 5, max_points: int = 2000):
+    """Preenche o histórico com ``days`` dias a 1 amostra/s por plataforma e mede as consultas"""
+    seconds = int(days * 86400)
+    tiers = [(1, 3600), (10, 8640), (60, int(days * 1440) + 1), (600, int(days * 144) + 1)]
+    history = SeriesHistory(tiers=tiers, max_series=platforms)
+    start = 1_700_000_000.0
+    names = [f'platform{i}' for i in range(platforms)]
+
+    began = time.perf_counter()
+    rng = np.random.default_rng(0)
+    for name in names:
+        samples = rng.integers(0, 5000, seconds).tolist()
+        for offset, viewers in enumerate(samples):
+            history.record(1, name, viewers, start + offset)
+    print(f"Ingestão: {platforms * seconds} amostras em {time.perf_counter() - began:.1f}s")
+
+    end = start + seconds - 1
+    for window in (600, 3600, 86400, seconds):
+        began = time.perf_counter()
+        summary = summarize(load_matrix(history, 1, end - window, end, max_points))
+        elapsed = time.perf_counter() - began
+        print(f"Janela {window:>7}s: resolução {summary['resolution']:>3}s, "
+              f"{len(summary['timestamps']):>5} pontos, {elapsed * 1000:7.2f} ms")
+
+
+if __name__ == '__main__':
+    _benchmark(float(sys.argv[1]) if len(sys.argv) > 1 else 3, int(sys.argv[2]) if len(sys.argv) > 2 else 5)
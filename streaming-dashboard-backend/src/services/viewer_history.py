@@ -0,0 +1,246 @@
+"""
+Histórico de audiência (e de latência) em buffers circulares com níveis de resolução
+"""
+import os
+import time
+import math
+import logging
+import threading
+from array import array
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# (resolução em segundos, número de pontos): 1 h a 1 s, 24 h a 10 s, 7 dias a 1 min, 30 dias a 10 min
+DEFAULT_TIERS = "1:3600,10:8640,60:10080,600:4320"
+DEFAULT_MAX_POINTS = 500
+
+
+def parse_tiers(spec: str) -> List[Tuple[int, int]]:
+    tiers = []
+    for item in spec.split(','):
+        resolution, capacity = item.split(':')
+        tiers.append((int(resolution), int(capacity)))
+    return sorted(tiers)
+
+
+class Tier:
+    """Um nível de resolução: buckets alinhados de ``resolution`` segundos em um buffer circular.
+
+    Cada bucket guarda a média e o pico das amostras recebidas nele. O bucket
+    corrente fica aberto até chegar uma amostra de um bucket posterior.
+    """
+
+    def __init__(self, resolution: int, capacity: int):
+        self.resolution = resolution
+        self.capacity = capacity
+        self.timestamps = array('d', bytes(8 * capacity))
+        self.values = array('d', bytes(8 * capacity))
+        self.peaks = array('d', bytes(8 * capacity))
+        self.count = 0
+        self.head = 0
+
+        self._bucket = None
+        self._sum = 0.0
+        self._samples = 0
+        self._peak = -math.inf
+
+    def add(self, timestamp: float, value: float):
+        bucket = timestamp - timestamp % self.resolution
+        if self._bucket is None or bucket > self._bucket:
+            self._close_bucket()
+            self._bucket = bucket
+        elif bucket < self._bucket:
+            return  # amostra atrasada de um bucket já fechado
+
+        self._sum += value
+        self._samples += 1
+        self._peak = max(self._peak, value)
+
+    def _close_bucket(self):
+        if not self._samples:
+            return
+        self.timestamps[self.head] = self._bucket
+        self.values[self.head] = self._sum / self._samples
+        self.peaks[self.head] = self._peak
+        self.head = (self.head + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+        self._sum, self._samples, self._peak = 0.0, 0, -math.inf
+
+    def _physical(self, logical: int) -> int:
+        return (self.head - self.count + logical) % self.capacity
+
+    def oldest(self) -> Optional[float]:
+        if self.count:
+            return self.timestamps[self._physical(0)]
+        return self._bucket
+
+    def covers(self, since: float) -> bool:
+        """Se o nível ainda guarda pontos desde ``since`` (ou nunca descartou nenhum)"""
+        oldest = self.oldest()
+        return self.count < self.capacity or (oldest is not None and oldest <= since)
+
+    def range(self, since: float, until: float) -> Tuple[List[float], List[float], List[float]]:
+        """Pontos com timestamp em [since, until]: busca binária no buffer e cópia só do intervalo"""
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self.timestamps[self._physical(middle)] < since:
+                low = middle + 1
+            else:
+                high = middle
+
+        timestamps, values, peaks = [], [], []
+        for logical in range(low, self.count):
+            i = self._physical(logical)
+            if self.timestamps[i] > until:
+                break
+            timestamps.append(self.timestamps[i])
+            values.append(self.values[i])
+            peaks.append(self.peaks[i])
+
+        # Bucket ainda aberto (parcial), para o gráfico chegar até o momento atual
+        if self._samples and since <= self._bucket <= until:
+            timestamps.append(self._bucket)
+            values.append(self._sum / self._samples)
+            peaks.append(self._peak)
+
+        return timestamps, values, peaks
+
+
+class TieredSeries:
+    """Série de uma métrica com todos os níveis alimentados a cada amostra"""
+
+    def __init__(self, tiers: Sequence[Tuple[int, int]]):
+        self.tiers = [Tier(resolution, capacity) for resolution, capacity in tiers]
+        self.last_value = None
+        self.last_timestamp = None
+        self.lock = threading.Lock()
+
+    def add(self, timestamp: float, value: float):
+        with self.lock:
+            for tier in self.tiers:
+                tier.add(timestamp, value)
+            self.last_value = value
+            self.last_timestamp = timestamp
+
+    def select_tier(self, since: float, until: float, max_points: int, resolution: Optional[int] = None) -> Tier:
+        """Nível mais fino que cobre o intervalo sem exceder ``max_points`` pontos"""
+        if resolution is not None:
+            for tier in self.tiers:
+                if tier.resolution >= resolution:
+                    return tier
+            return self.tiers[-1]
+
+        for tier in self.tiers:
+            if tier.covers(since) and (until - since) / tier.resolution <= max_points:
+                return tier
+        return self.tiers[-1]
+
+
+class SeriesHistory:
+    """Séries por usuário e chave (nome da plataforma, convidado...) compartilhadas pelo processo"""
+
+    def __init__(self, tiers: Optional[Sequence[Tuple[int, int]]] = None, max_series: Optional[int] = None,
+                 env_prefix: str = 'VIEWER_HISTORY'):
+        self.tiers = list(tiers or parse_tiers(os.environ.get(f'{env_prefix}_TIERS', DEFAULT_TIERS)))
+        self.max_series = max_series or int(os.environ.get(f'{env_prefix}_MAX_SERIES', 5000))
+        self._series = {}
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def record(self, user_id, key: str, value: float, timestamp: Optional[float] = None) -> bool:
+        """Adiciona uma amostra; retorna False se o limite de séries impediu a criação"""
+        user_key = str(user_id)
+        series = self._series.get(user_key, {}).get(key)
+        if series is None:
+            with self._lock:
+                user_series = self._series.setdefault(user_key, {})
+                series = user_series.get(key)
+                if series is None:
+                    if self._count >= self.max_series:
+                        logger.warning(f"Limite de séries de histórico atingido; ignorando {user_key}/{key}")
+                        return False
+                    series = user_series[key] = TieredSeries(self.tiers)
+                    self._count += 1
+
+        series.add(timestamp or time.time(), float(value))
+        return True
+
+    def user_series(self, user_id) -> Dict[str, TieredSeries]:
+        """Cópia do mapa chave -> série de um usuário"""
+        with self._lock:
+            return dict(self._series.get(str(user_id), {}))
+
+    def keys(self, user_id) -> List[str]:
+        return sorted(self.user_series(user_id))
+
+    def latest(self, user_id) -> Dict[str, Dict[str, Any]]:
+        """Último valor recebido de cada série do usuário"""
+        return {key: {'value': series.last_value, 'ts': series.last_timestamp}
+                for key, series in self.user_series(user_id).items()}
+
+    def query(self, user_id, since: float, until: Optional[float] = None, max_points: int = DEFAULT_MAX_POINTS,
+              resolution: Optional[int] = None, keys: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+        """Consulta o intervalo em todas as séries do usuário, na mesma resolução para todas.
+
+        O custo é proporcional aos pontos devolvidos, não à duração da transmissão.
+        """
+        until = until or time.time()
+        selected = {key: series for key, series in self.user_series(user_id).items()
+                    if keys is None or key in keys}
+
+        if not selected:
+            return {'resolution': resolution or self.tiers[0][0], 'since': since, 'until': until, 'series': {}}
+
+        chosen = self.select_resolution(selected, since, until, max_points, resolution)
+
+        result = {}
+        for key, series in selected.items():
+            with series.lock:
+                tier = series.select_tier(since, until, max_points, chosen)
+                timestamps, values, peaks = tier.range(since, until)
+            result[key] = {'timestamps': timestamps, 'values': values, 'peaks': peaks}
+
+        return {'resolution': chosen, 'since': since, 'until': until, 'series': result}
+
+    @staticmethod
+    def select_resolution(selected: Dict[str, TieredSeries], since: float, until: float, max_points: int,
+                          resolution: Optional[int] = None) -> int:
+        """Resolução comum: a mais grossa escolhida entre as séries, para alinhar os buckets"""
+        return max(series.select_tier(since, until, max_points, resolution).resolution
+                   for series in selected.values())
+
+    def discard(self, user_id, key: Optional[str] = None):
+        user_key = str(user_id)
+        with self._lock:
+            user_series = self._series.get(user_key, {})
+            removed = list(user_series) if key is None else [k for k in (key,) if k in user_series]
+            for k in removed:
+                del user_series[k]
+            self._count -= len(removed)
+            if not user_series:
+                self._series.pop(user_key, None)
+
+
+def parse_range_args(args) -> Tuple[float, float, int, Optional[int]]:
+    """Lê ``since``/``until`` (epoch) ou ``window`` (segundos, padrão 1 h), ``max_points`` e ``resolution``"""
+    until = float(args.get('until') or time.time())
+    since = float(args.get('since') or until - float(args.get('window', 3600)))
+    max_points = max(1, min(int(args.get('max_points', DEFAULT_MAX_POINTS)), 10000))
+    resolution = float(args['resolution']) if args.get('resolution') else None
+    # nan/inf passariam pelas comparações abaixo e chegariam à montagem da grade
+    if not all(math.isfinite(value) for value in (since, until, resolution or 1)):
+        raise ValueError("since, until e resolution devem ser finitos")
+    if resolution is not None:
+        if resolution < 1:
+            raise ValueError("resolution deve ser de pelo menos 1 segundo")
+        resolution = int(resolution)
+    if since > until:
+        raise ValueError("since deve ser anterior a until")
+    return since, until, max_points, resolution
+
+
+# Espectadores por plataforma (alimentado pelo status_poller) e latência por convidado
+viewer_history = SeriesHistory()
+latency_history = SeriesHistory(env_prefix='LATENCY_HISTORY')
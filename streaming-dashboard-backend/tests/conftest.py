@@ -0,0 +1,68 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Background threads are driven explicitly by the tests
+os.environ.setdefault('STATUS_POLLER_ENABLED', 'false')
+
+from flask import Flask
+from flask_jwt_extended import JWTManager, create_access_token
+
+from src.models.user import db, User
+from src.models.platform import Platform, StreamSession
+from src.models.guest import Guest, GuestSession
+from src.routes.platform import platform_bp
+from src.routes.guest import guest_bp
+from src.routes.streaming import streaming_bp
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = Flask(__name__)
+    app.config.update(
+        TESTING=True,
+        SQLALCHEMY_DATABASE_URI=f"sqlite:///{tmp_path / 'test.db'}",
+        JWT_SECRET_KEY='test-secret-key-with-enough-length-for-hs256'
+    )
+    db.init_app(app)
+    JWTManager(app)
+    app.register_blueprint(platform_bp, url_prefix='/api/platforms')
+    app.register_blueprint(guest_bp, url_prefix='/api/guest')
+    app.register_blueprint(streaming_bp, url_prefix='/api/streaming')
+
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def user(app):
+    user = User(username='host', email='host@example.com')
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def auth_headers(user):
+    return {'Authorization': f'Bearer {create_access_token(identity=str(user.id))}'}
+
+
+@pytest.fixture
+def query_plan(app):
+    """Details of SQLite's EXPLAIN QUERY PLAN for an ORM query"""
+    def plan(query):
+        sql = str(query.statement.compile(db.engine, compile_kwargs={'literal_binds': True}))
+        rows = db.session.execute(db.text(f'EXPLAIN QUERY PLAN {sql}')).all()
+        return ' | '.join(row[-1] for row in rows)
+    return plan
@@ -0,0 +1,68 @@
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from src.services.fanout import FanOutExecutor
+from src.services.http_transport import HttpTransport, request_deadline
+
+
+@pytest.fixture
+def unavailable_server():
+    hits = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            hits.append(time.time())
+            self.send_response(503)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f'http://127.0.0.1:{server.server_port}/', hits
+    server.shutdown()
+
+
+def test_queued_tasks_get_their_own_deadline():
+    executor = FanOutExecutor(max_workers=1, timeout=0.5)
+    tasks = {key: (lambda: time.sleep(0.3) or 'ok') for key in ('twitch', 'youtube')}
+
+    results = executor.run(tasks)
+
+    assert all(result['ok'] for result in results.values())
+    executor.shutdown()
+
+
+def test_slow_task_times_out_without_blocking_the_others():
+    executor = FanOutExecutor(max_workers=2, timeout=0.2)
+    started = time.time()
+
+    results = executor.run({'slow': lambda: time.sleep(1), 'fast': lambda: 'ok'})
+
+    assert results['slow']['timed_out']
+    assert results['fast'] == {'ok': True, 'result': 'ok', 'error': None}
+    assert time.time() - started < 0.6
+    executor.shutdown()
+
+
+def test_transport_retries_stop_at_the_deadline(unavailable_server):
+    url, hits = unavailable_server
+    transport = HttpTransport(max_retries=3, backoff_factor=0.5)
+
+    started = time.time()
+    with request_deadline(time.time() + 0.3):
+        # Out of time for another attempt: the last 503 is returned
+        assert transport.get(url).status_code == 503
+        with pytest.raises(requests.exceptions.Timeout):
+            time.sleep(0.3)
+            transport.get(url)
+
+    # Without the deadline, 3 retries with 0.5s backoff take about 3s
+    assert time.time() - started < 1
+    assert len(hits) < 4
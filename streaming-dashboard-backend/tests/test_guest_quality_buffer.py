@@ -0,0 +1,76 @@
+import time
+
+import pytest
+
+from src.models.user import db
+from src.models.guest import Guest
+from src.services.guest_quality_buffer import GuestQualityBuffer, guest_quality_buffer
+
+
+def add_guest(user, name='guest'):
+    guest = Guest(user_id=user.id, guest_name=name)
+    db.session.add(guest)
+    db.session.commit()
+    return guest
+
+
+def make_buffer(app, **kwargs):
+    buffer = GuestQualityBuffer(**kwargs)
+    buffer.app = app
+    return buffer
+
+
+def test_flush_skips_deleted_guests_without_requeueing(app, user):
+    kept, deleted = add_guest(user, 'kept'), add_guest(user, 'deleted')
+    buffer = make_buffer(app)
+    buffer.record(kept.id, {'latency_ms': 40, 'connection_quality': 'good'})
+    buffer.record(deleted.id, {'latency_ms': 90})
+    deleted_id = deleted.id
+    db.session.delete(deleted)
+    db.session.commit()
+
+    assert buffer.flush() == 2
+    assert buffer.flush() == 0
+
+    db.session.expire_all()
+    kept = db.session.get(Guest, kept.id)
+    assert (kept.latency_ms, kept.connection_quality) == (40, 'good')
+    assert db.session.get(Guest, deleted_id) is None
+
+
+def test_revoked_token_expires_from_cache(app, user):
+    guest = add_guest(user)
+    buffer = make_buffer(app, token_ttl=0.05)
+    assert buffer.resolve(guest.guest_token)['guest_id'] == guest.id
+
+    # Deactivated by another worker: this process' cache is not cleared
+    guest.is_active = False
+    db.session.commit()
+    assert buffer.resolve(guest.guest_token) is not None
+
+    time.sleep(0.06)
+    assert buffer.resolve(guest.guest_token) is None
+
+
+@pytest.mark.parametrize('body', [
+    {'latency_ms': 'abc'}, {'latency_ms': -5}, {'latency_ms': True}, {'latency_ms': float('nan')},
+    {'connection_quality': 'excellent'}, {'connection_quality': 3}, ['latency_ms', 40],
+])
+def test_invalid_quality_samples_are_rejected_before_buffering(client, user, body):
+    guest = add_guest(user)
+
+    response = client.post(f'/api/guest/guest-access/{guest.guest_token}/update-quality', json=body)
+
+    assert response.status_code == 400
+    assert guest_quality_buffer.get(guest.id) is None
+
+
+def test_valid_quality_sample_is_coerced_and_buffered(client, user):
+    guest = add_guest(user)
+
+    response = client.post(f'/api/guest/guest-access/{guest.guest_token}/update-quality',
+                           json={'latency_ms': 41.6, 'connection_quality': 'good', 'extra': 'ignored'})
+
+    assert response.status_code == 200
+    assert guest_quality_buffer.get(guest.id) == {'latency_ms': 42, 'connection_quality': 'good'}
+    guest_quality_buffer.forget_guest(guest.id)
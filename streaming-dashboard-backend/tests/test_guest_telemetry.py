@@ -0,0 +1,92 @@
+import time
+
+import pytest
+
+from src.models.user import db
+from src.models.guest import Guest, GuestSession
+from src.services.guest_telemetry import decode_rollups, guest_telemetry
+
+
+@pytest.fixture(autouse=True)
+def telemetry_store(monkeypatch):
+    monkeypatch.setattr(guest_telemetry, '_sessions', {})
+    return guest_telemetry
+
+
+@pytest.fixture
+def guest(user):
+    guest = Guest(user_id=user.id, guest_name='guest')
+    db.session.add(guest)
+    db.session.commit()
+    return guest
+
+
+def open_session(guest):
+    session = GuestSession(guest_id=guest.id, user_id=guest.user_id, session_id='webrtc')
+    db.session.add(session)
+    db.session.commit()
+    return session
+
+
+def post_samples(client, guest, session, samples):
+    return client.post(f'/api/guest/guest-sessions/{session.id}/telemetry',
+                       json={'guest_token': guest.guest_token, 'samples': samples})
+
+
+def test_idle_sessions_are_evicted_when_capacity_is_reached(client, guest, telemetry_store, monkeypatch):
+    monkeypatch.setattr(telemetry_store, 'max_sessions', 1)
+    abandoned, active = open_session(guest), open_session(guest)
+    assert post_samples(client, guest, abandoned, [{'rtt_ms': 20}]).status_code == 200
+
+    # Still active: no room for a second session
+    assert post_samples(client, guest, active, [{'rtt_ms': 30}]).status_code == 503
+
+    telemetry_store.get(abandoned.id).last_seen -= telemetry_store.idle_ttl + 1
+    response = post_samples(client, guest, active, [{'rtt_ms': 30}])
+
+    assert response.status_code == 200
+    assert telemetry_store.get(abandoned.id) is None
+    db.session.expire_all()
+    assert db.session.get(GuestSession, abandoned.id).telemetry_rollups
+
+
+def test_malformed_samples_are_skipped(client, guest):
+    session = open_session(guest)
+    malformed = ['not-a-sample', {'rtt_ms': 'fast'}, {'rtt_ms': 10, 'ts': 'now'},
+                 {'rtt_ms': float('nan')}, {'jitter_ms': True}]
+
+    response = post_samples(client, guest, session, malformed)
+    assert response.status_code == 400
+
+    response = post_samples(client, guest, session, malformed + [{'rtt_ms': 25, 'jitter_ms': 'x'}])
+    assert response.status_code == 200
+    assert response.get_json() == {'accepted': 1}
+    assert guest_telemetry.get(session.id).summary()['metrics']['jitter_ms']['avg'] is None
+
+
+def test_values_beyond_float32_do_not_break_the_session(client, guest, auth_headers):
+    session = open_session(guest)
+
+    assert post_samples(client, guest, session, [{'bitrate_kbps': 1e39}]).status_code == 400
+    response = post_samples(client, guest, session, [{'rtt_ms': 20, 'bitrate_kbps': -1e39}])
+    assert response.get_json() == {'accepted': 1}
+    assert post_samples(client, guest, session, [{'rtt_ms': 30, 'ts': time.time() + 120}]).status_code == 200
+
+    response = client.get(f'/api/guest/guest-sessions/{session.id}/telemetry', headers=auth_headers)
+    assert response.status_code == 200
+    assert response.get_json()['metrics']['bitrate_kbps']['avg'] is None
+
+    response = client.post(f'/api/guest/guest-sessions/{session.id}/end', json={})
+    assert response.status_code == 200
+
+
+def test_samples_from_closed_minutes_are_ignored(client, guest, telemetry_store):
+    session = open_session(guest)
+    post_samples(client, guest, session, [{'rtt_ms': 10, 'ts': 60}, {'rtt_ms': 20, 'ts': 130}])
+
+    response = post_samples(client, guest, session, [{'rtt_ms': 99, 'ts': 65}, {'rtt_ms': 30, 'ts': 170}])
+
+    assert response.get_json() == {'accepted': 1}
+    rollups = decode_rollups(telemetry_store.get(session.id).rollup_bytes())
+    assert [rollup['ts'] for rollup in rollups] == [60, 120]
+    assert rollups[1]['rtt_ms'] == {'avg': 25.0, 'min': 20.0, 'max': 30.0}
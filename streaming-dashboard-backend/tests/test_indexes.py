@@ -0,0 +1,95 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import insert
+
+from src.models.user import db, User
+from src.models.platform import Platform, StreamSession
+from src.models.guest import Guest, GuestSession
+from src.services.serialization import select_columns
+
+USERS = 500
+PLATFORMS = ('twitch', 'youtube', 'facebook', 'instagram', 'tiktok')
+SESSIONS_PER_USER = 40
+GUESTS_PER_USER = 2
+SESSIONS_PER_GUEST = 20
+
+
+@pytest.fixture
+def seeded(app):
+    """Production-sized tables, with ANALYZE statistics, so the planner picks indexes on merit"""
+    start = datetime(2025, 1, 1)
+    db.session.execute(insert(User), [
+        {'id': u, 'username': f'user{u}', 'email': f'user{u}@example.com'} for u in range(1, USERS + 1)
+    ])
+    db.session.execute(insert(Platform), [
+        {'user_id': u, 'platform_name': name, 'is_active': i % 2 == 0}
+        for u in range(1, USERS + 1) for i, name in enumerate(PLATFORMS)
+    ])
+    db.session.execute(insert(StreamSession), [
+        {'user_id': u, 'platform_id': (u - 1) * len(PLATFORMS) + 1 + s % len(PLATFORMS),
+         'started_at': start + timedelta(hours=s)}
+        for u in range(1, USERS + 1) for s in range(SESSIONS_PER_USER)
+    ])
+    db.session.execute(insert(Guest), [
+        {'id': (u - 1) * GUESTS_PER_USER + g + 1, 'user_id': u, 'guest_token': f'token-{u}-{g}',
+         'guest_name': f'guest {g}'}
+        for u in range(1, USERS + 1) for g in range(GUESTS_PER_USER)
+    ])
+    db.session.execute(insert(GuestSession), [
+        {'guest_id': guest_id, 'user_id': (guest_id - 1) // GUESTS_PER_USER + 1, 'session_id': f'webrtc-{s}',
+         'connected_at': start + timedelta(minutes=s)}
+        for guest_id in range(1, USERS * GUESTS_PER_USER + 1) for s in range(SESSIONS_PER_GUEST)
+    ])
+    db.session.commit()
+    db.session.execute(db.text('ANALYZE'))
+    assert StreamSession.query.count() == USERS * SESSIONS_PER_USER
+    return USERS // 2
+
+
+def test_active_platforms_lookup_uses_user_active_index(query_plan, seeded):
+    plan = query_plan(Platform.query.filter_by(user_id=seeded, is_active=True))
+
+    assert 'USING INDEX ix_platform_user_active (user_id=? AND is_active=?)' in plan
+
+
+def test_platform_by_name_lookup_uses_user_name_index(query_plan, seeded):
+    plan = query_plan(Platform.query.filter_by(user_id=seeded, platform_name='twitch'))
+
+    assert 'USING INDEX ix_platform_user_name (user_id=? AND platform_name=?)' in plan
+
+
+def test_stream_session_listing_uses_user_started_index_without_sorting(query_plan, seeded):
+    query, _ = select_columns(StreamSession, ['id', 'started_at', 'platform_id'])
+    query = query.filter(StreamSession.user_id == seeded).order_by(
+        StreamSession.started_at.desc(), StreamSession.id.desc()
+    ).limit(51)
+    plan = query_plan(query)
+
+    assert 'USING INDEX ix_stream_session_user_started (user_id=?)' in plan
+    assert 'TEMP B-TREE' not in plan
+
+
+def test_guest_session_listing_uses_user_connected_index_without_sorting(query_plan, seeded):
+    query, _ = select_columns(GuestSession, GuestSession.serialized_fields)
+    query = query.filter(GuestSession.user_id == seeded).order_by(
+        GuestSession.connected_at.desc(), GuestSession.id.desc()
+    ).limit(51)
+    plan = query_plan(query)
+
+    assert 'USING INDEX ix_guest_session_user_connected (user_id=?)' in plan
+    assert 'TEMP B-TREE' not in plan
+
+
+def test_sessions_of_a_guest_use_guest_connected_index_without_sorting(query_plan, seeded):
+    query = GuestSession.query.filter_by(guest_id=seeded).order_by(GuestSession.connected_at.desc())
+    plan = query_plan(query)
+
+    assert 'USING INDEX ix_guest_session_guest_connected (guest_id=?)' in plan
+    assert 'TEMP B-TREE' not in plan
+
+
+def test_guest_token_lookup_uses_unique_index(query_plan, seeded):
+    plan = query_plan(Guest.query.filter_by(guest_token='token-1-0', is_active=True))
+
+    assert 'USING INDEX sqlite_autoindex_guest_1 (guest_token=?)' in plan
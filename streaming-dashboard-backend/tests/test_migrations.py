@@ -0,0 +1,52 @@
+import sqlite3
+
+from flask import Flask
+
+from src.models.user import db
+from src.models.guest import GuestSession
+from src.models.platform import Platform
+from src.routes.guest import guest_bp
+
+# guest_session and platform as created before the user_id, telemetry_rollups and account_id columns
+OLD_SCHEMA = '''
+CREATE TABLE user (id INTEGER NOT NULL PRIMARY KEY, username VARCHAR(80) NOT NULL UNIQUE,
+                   email VARCHAR(120) NOT NULL UNIQUE);
+CREATE TABLE platform (id INTEGER NOT NULL PRIMARY KEY, user_id INTEGER NOT NULL,
+                       platform_name VARCHAR(50) NOT NULL, platform_username VARCHAR(100),
+                       access_token TEXT, refresh_token TEXT, stream_key TEXT, ingest_url VARCHAR(255),
+                       is_active BOOLEAN, created_at DATETIME, updated_at DATETIME);
+CREATE TABLE guest (id INTEGER NOT NULL PRIMARY KEY, user_id INTEGER NOT NULL,
+                    guest_token VARCHAR(255) NOT NULL UNIQUE, guest_name VARCHAR(100) NOT NULL,
+                    guest_email VARCHAR(120), is_active BOOLEAN, is_connected BOOLEAN,
+                    connection_quality VARCHAR(20), latency_ms INTEGER, created_at DATETIME,
+                    last_connected_at DATETIME, video_enabled BOOLEAN, audio_enabled BOOLEAN,
+                    video_quality VARCHAR(20), audio_quality VARCHAR(20));
+CREATE TABLE guest_session (id INTEGER NOT NULL PRIMARY KEY, guest_id INTEGER NOT NULL,
+                            session_id VARCHAR(255) NOT NULL, connected_at DATETIME,
+                            disconnected_at DATETIME, avg_latency_ms INTEGER, min_latency_ms INTEGER,
+                            max_latency_ms INTEGER, packets_lost INTEGER, packets_sent INTEGER,
+                            bytes_sent BIGINT, bytes_received BIGINT);
+INSERT INTO user VALUES (7, 'host', 'host@example.com');
+INSERT INTO platform (id, user_id, platform_name) VALUES (1, 7, 'facebook');
+INSERT INTO guest (id, user_id, guest_token, guest_name) VALUES (3, 7, 'token', 'guest');
+INSERT INTO guest_session (id, guest_id, session_id) VALUES (1, 3, 'webrtc'), (2, 99, 'deleted-guest');
+'''
+
+
+def test_registering_the_blueprints_upgrades_an_existing_database(tmp_path):
+    path = tmp_path / 'old.db'
+    connection = sqlite3.connect(path)
+    connection.executescript(OLD_SCHEMA)
+    connection.close()
+
+    app = Flask(__name__)
+    app.config.update(TESTING=True, SQLALCHEMY_DATABASE_URI=f'sqlite:///{path}')
+    db.init_app(app)
+    app.register_blueprint(guest_bp, url_prefix='/api/guest')
+
+    with app.app_context():
+        sessions = {session.id: session for session in GuestSession.query.all()}
+        assert sessions[1].user_id == 7
+        assert sessions[2].user_id is None
+        assert db.session.get(Platform, 1).account_id is None
+        db.session.remove()
@@ -0,0 +1,86 @@
+import time
+
+from src.services.event_bus import EventBus
+from src.services.multicast import MulticastOrchestrator
+
+
+class FakeService:
+    def __init__(self, active=True):
+        self.live_at = None
+        self.active = active
+        self.prepared = 0
+        self.stopped = 0
+
+    def prepare_stream(self, title, description, prepared):
+        self.prepared += 1
+        prepared.update(rtmp_url='rtmp://ingest/live', stream_key='key')
+        return True
+
+    def ingest_active(self, prepared):
+        return self.active
+
+    def go_live(self, prepared):
+        self.live_at = time.time()
+        return True
+
+    def stop_stream(self, prepared):
+        self.stopped += 1
+        return True
+
+
+def make_destinations(services, authenticate=lambda: True):
+    return [{'key': key, 'name': f'platform-{key}', 'service': service, 'authenticate': authenticate}
+            for key, service in services.items()]
+
+
+def test_go_live_does_not_wait_for_the_shared_pool():
+    # Shared pool smaller than the number of destinations meeting at the barrier
+    orchestrator = MulticastOrchestrator(events=EventBus(), max_workers=1, go_live_deadline=2)
+    services = {key: FakeService() for key in range(3)}
+    destinations = make_destinations(services)
+
+    started = time.time()
+    results = orchestrator.start('user', destinations, 'Show')
+
+    assert all(result['success'] and result['phase'] == 'go_live' for result in results.values())
+    assert time.time() - started < 1
+
+
+def test_go_live_waits_for_the_ingest_and_keeps_the_preparation():
+    orchestrator = MulticastOrchestrator(events=EventBus(), go_live_deadline=0.5, backoff=0.05)
+    services = {'twitch': FakeService(), 'youtube': FakeService(active=False)}
+    destinations = make_destinations(services)
+
+    results = orchestrator.start('user', destinations, 'Show')
+
+    assert results['twitch']['success'] and services['twitch'].live_at is not None
+    assert not results['youtube']['success'] and results['youtube']['phase'] == 'go_live'
+    assert services['youtube'].live_at is None
+    assert orchestrator.get_streams('user')['youtube']['state'] == 'prepared'
+
+    services['youtube'].active = True
+    results = orchestrator.start('user', destinations, 'Show')
+
+    assert results['youtube']['success'] and services['youtube'].live_at is not None
+    assert services['youtube'].prepared == 1
+
+
+def test_refused_authentication_is_reported_as_such():
+    orchestrator = MulticastOrchestrator(events=EventBus(), retries=0)
+    destinations = make_destinations({'twitch': FakeService()}, authenticate=lambda: False)
+
+    prepare = orchestrator.start('user', destinations, 'Show')
+    stop = orchestrator.stop('user', destinations)
+
+    assert prepare['twitch']['message'] == 'Erro: Falha na autenticação'
+    assert stop['twitch']['message'] == 'Erro: Falha na autenticação'
+
+
+def test_stopping_destinations_that_never_started_leaves_no_state():
+    orchestrator = MulticastOrchestrator(events=EventBus())
+    services = {key: FakeService() for key in range(2)}
+
+    results = orchestrator.stop('user', make_destinations(services))
+
+    assert all(result['success'] for result in results.values())
+    assert orchestrator.get_streams('user') == {}
@@ -0,0 +1,73 @@
+from datetime import datetime
+
+from src.models.user import db, User
+from src.models.guest import Guest, GuestSession
+
+
+def add_guest(user):
+    guest = Guest(user_id=user.id, guest_name='guest')
+    db.session.add(guest)
+    db.session.commit()
+    return guest
+
+
+def test_guest_sessions_walk_every_page_once(client, auth_headers, user):
+    guest = add_guest(user)
+    # Database-side CURRENT_TIMESTAMP ("...HH:MM:SS") mixed with Python datetimes ("...HH:MM:SS.ffffff")
+    sessions = [GuestSession(guest_id=guest.id, user_id=user.id, session_id=f'db-{i}') for i in range(5)]
+    sessions += [GuestSession(guest_id=guest.id, user_id=user.id, session_id=f'py-{i}',
+                              connected_at=datetime(2025, 1, 1, 10, 0, i % 2)) for i in range(4)]
+    db.session.add_all(sessions)
+    db.session.commit()
+
+    seen, pages, cursor = [], 0, None
+    while True:
+        response = client.get('/api/guest/guest-sessions', headers=auth_headers,
+                              query_string={'limit': 2, **({'cursor': cursor} if cursor else {})})
+        assert response.status_code == 200
+        seen += [session['id'] for session in response.get_json()]
+        pages += 1
+        cursor = response.headers.get('X-Next-Cursor')
+        if not cursor:
+            break
+        assert pages < 10, 'cursor did not advance'
+
+    assert pages == 5
+    assert len(seen) == len(set(seen))
+    assert sorted(seen) == sorted(session.id for session in sessions)
+
+
+def test_guest_sessions_only_list_the_hosts_sessions(client, auth_headers, user):
+    other = User(username='other', email='other@example.com')
+    db.session.add(other)
+    db.session.commit()
+    own, foreign = add_guest(user), add_guest(other)
+    for guest in (own, foreign):
+        client.post('/api/guest/guest-sessions', json={'guest_token': guest.guest_token, 'session_id': 'webrtc'})
+
+    response = client.get('/api/guest/guest-sessions', headers=auth_headers)
+
+    assert [session['guest_id'] for session in response.get_json()] == [own.id]
+
+
+
+def test_sessions_of_deleted_guests_leave_the_listing(client, auth_headers, user):
+    guest = add_guest(user)
+    client.post('/api/guest/guest-sessions', json={'guest_token': guest.guest_token, 'session_id': 'webrtc'})
+
+    assert client.delete(f'/api/guest/guests/{guest.id}', headers=auth_headers).status_code == 204
+
+    assert client.get('/api/guest/guest-sessions', headers=auth_headers).get_json() == []
+
+
+def test_cursor_headers_are_exposed_to_cross_origin_frontends(client, auth_headers, user):
+    guest = add_guest(user)
+    for i in range(3):
+        db.session.add(GuestSession(guest_id=guest.id, user_id=user.id, session_id=f'webrtc-{i}'))
+    db.session.commit()
+
+    response = client.get('/api/guest/guest-sessions', headers=auth_headers, query_string={'limit': 2})
+
+    assert response.headers['X-Next-Cursor']
+    exposed = {name.strip() for name in response.headers['Access-Control-Expose-Headers'].split(',')}
+    assert {'X-Next-Cursor', 'Link'} <= exposed
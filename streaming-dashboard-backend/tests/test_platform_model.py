@@ -0,0 +1,63 @@
+import pytest
+
+from src.models.user import db
+from src.models.platform import Platform
+from src.services.platform_integrations import PlatformManager
+from src.services.rate_limiter import RateLimitGovernor
+
+
+def test_get_credentials_merges_app_ids_and_secrets(app, user, monkeypatch):
+    monkeypatch.setenv('TWITCH_CLIENT_ID', 'client-123')
+    platform = Platform(user_id=user.id, platform_name='twitch')
+    platform.set_access_token('token-abc')
+    db.session.add(platform)
+    db.session.commit()
+    db.session.expire_all()
+
+    loaded = db.session.get(Platform, platform.id)
+    assert loaded.get_credentials() == {'client_id': 'client-123', 'access_token': 'token-abc'}
+    assert loaded.display_name == 'Twitch'
+
+
+def test_display_name_falls_back_to_platform_name(app, user):
+    assert Platform(user_id=user.id, platform_name='youtube').display_name == 'YouTube'
+    assert Platform(user_id=user.id, platform_name='kick').display_name == 'kick'
+
+
+class FakeResponse:
+    status_code = 200
+    headers = {}
+
+    def json(self):
+        return {'data': [{'id': 'broadcaster'}], 'items': [{'id': 'channel'}], 'id': 'account'}
+
+
+class FakeTransport:
+    def request(self, method, url, **kwargs):
+        return FakeResponse()
+
+
+@pytest.mark.parametrize('platform_name, account_field', [
+    ('twitch', None), ('youtube', None), ('facebook', 'page_id'), ('instagram', 'user_id'), ('tiktok', 'user_id'),
+])
+def test_every_platform_authenticates_from_a_stored_row(app, user, monkeypatch, platform_name, account_field):
+    for var in ('TWITCH_CLIENT_ID', 'YOUTUBE_API_KEY', 'FACEBOOK_APP_ID', 'INSTAGRAM_CLIENT_ID'):
+        monkeypatch.setenv(var, 'app-id')
+    platform = Platform(user_id=user.id, platform_name=platform_name, account_id='1234')
+    platform.set_access_token('token')
+    db.session.add(platform)
+    db.session.commit()
+    db.session.expire_all()
+
+    credentials = db.session.get(Platform, platform.id).get_credentials()
+    integration = PlatformManager(transport=FakeTransport(), governor=RateLimitGovernor()).platforms[platform_name]
+
+    if account_field:
+        assert credentials[account_field] == '1234'
+    assert integration.authenticate(credentials)
+
+
+def test_account_id_falls_back_to_platform_username(app, user):
+    platform = Platform(user_id=user.id, platform_name='facebook', platform_username='5678')
+
+    assert platform.get_credentials()['page_id'] == '5678'
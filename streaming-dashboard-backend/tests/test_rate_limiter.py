@@ -0,0 +1,95 @@
+import json
+
+from src.services.http_transport import RETRY_STATUS_CODES, HttpTransport
+from src.services.platform_integrations import FacebookIntegration, YouTubeIntegration
+from src.services.rate_limiter import RateLimitExceeded, RateLimitGovernor
+
+
+class FakeResponse:
+    def __init__(self, status_code=200, headers=None, body=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self._body = body or {}
+
+    def json(self):
+        return self._body
+
+
+class FakeTransport:
+    def __init__(self, response=None):
+        self.response = response or FakeResponse(body={"items": [{"id": "channel"}]})
+        self.calls = 0
+
+    def request(self, method, url, **kwargs):
+        self.calls += 1
+        return self.response
+
+
+def youtube(governor, access_token):
+    integration = YouTubeIntegration(transport=FakeTransport(), governor=governor)
+    integration.authenticate({"api_key": "key", "client_id": "project-client",
+                              "access_token": access_token})
+    return integration
+
+
+def test_youtube_quota_is_shared_by_every_token_of_the_project():
+    governor = RateLimitGovernor(max_wait=0)
+    first = youtube(governor, "token-a")
+    second = youtube(governor, "token-b")
+
+    assert first._credential_key() == second._credential_key()
+    first._request("GET", "https://www.googleapis.com/youtube/v3/search", cost=100)
+    assert second.get_rate_limit_status()["remaining"] < 10000 - 100
+
+
+def test_graph_app_usage_pauses_every_token_of_the_app():
+    governor = RateLimitGovernor(max_wait=0)
+    usage = FakeResponse(headers={"X-App-Usage": json.dumps({"call_count": 99})})
+    first = FacebookIntegration(transport=FakeTransport(usage), governor=governor)
+    first.authenticate({"app_id": "app", "access_token": "token-a", "page_id": "1"})
+
+    second = FacebookIntegration(transport=FakeTransport(), governor=governor)
+    second.app_id, second.access_token = "app", "token-b"
+    try:
+        second._request("GET", "https://graph.facebook.com/v18.0/me")
+    except RateLimitExceeded:
+        pass
+    else:
+        raise AssertionError("app acima do limite de uso deveria ser pausado")
+    assert second.http.calls == 0
+
+    other_app = FacebookIntegration(transport=FakeTransport(), governor=governor)
+    other_app.app_id, other_app.access_token = "other", "token-c"
+    other_app._request("GET", "https://graph.facebook.com/v18.0/me")
+
+
+def test_transport_does_not_retry_rate_limited_responses():
+    transport = HttpTransport(max_retries=3)
+    retry = transport.session.get_adapter("https://api.twitch.tv").max_retries
+
+    assert 429 not in RETRY_STATUS_CODES
+    assert not retry.is_retry("GET", 429, has_retry_after=True)
+    assert retry.is_retry("GET", 503)
+
+
+def test_malformed_bodies_and_usage_headers_are_ignored():
+    governor = RateLimitGovernor(max_wait=0)
+    for response in (FakeResponse(403, body=['not', 'a', 'dict']),
+                     FakeResponse(403, body={'error': 'quota'}),
+                     FakeResponse(403, body={'error': {'errors': ['quotaExceeded']}}),
+                     FakeResponse(200, headers={'X-App-Usage': '[99]'})):
+        governor.update_from_response('facebook', 'token', response, app_key='app')
+
+    governor.acquire('facebook', 'token', app_key='app')
+
+
+def test_idle_full_buckets_are_evicted():
+    governor = RateLimitGovernor(max_wait=0, max_buckets=3)
+    # YouTube refills slowly: a spent unit stays missing for the whole test
+    governor.acquire('youtube', 'busy')
+    for key in ('idle-a', 'idle-b'):
+        governor.status('youtube', key)
+
+    governor.status('youtube', 'new')
+
+    assert set(key for _, key in governor._buckets) == {'busy', 'new'}
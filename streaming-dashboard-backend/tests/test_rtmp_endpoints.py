@@ -0,0 +1,42 @@
+from src.models.user import db
+from src.models.platform import Platform
+from src.routes.streaming import _build_rtmp_endpoints
+from src.services.platform_integrations import PlatformManager
+from src.services.rate_limiter import RateLimitGovernor
+
+
+class FakeManager:
+    """Authenticates everything and serves the real integrations (which never touch the network here)"""
+
+    def __init__(self):
+        self.platforms = PlatformManager(transport=None, governor=RateLimitGovernor()).platforms
+
+    def authenticate_platform(self, platform_name, credentials, user_id):
+        return True
+
+    def get_platform(self, platform_name):
+        return self.platforms.get(platform_name)
+
+
+def add_platform(user, platform_name, stream_key=None, ingest_url=None):
+    platform = Platform(user_id=user.id, platform_name=platform_name, ingest_url=ingest_url)
+    if stream_key:
+        platform.set_stream_key(stream_key)
+    db.session.add(platform)
+    db.session.commit()
+    return platform
+
+
+def test_platforms_without_key_discovery_use_the_stored_endpoint(app, user):
+    add_platform(user, 'youtube', stream_key='yt-key')
+    add_platform(user, 'instagram', stream_key='ig-key', ingest_url='rtmps://custom/rtmp/')
+    add_platform(user, 'facebook')
+
+    endpoints, complete = _build_rtmp_endpoints(FakeManager(), user.id)
+
+    assert endpoints['youtube']['full_url'] == 'rtmp://a.rtmp.youtube.com/live2/yt-key'
+    assert endpoints['instagram']['stream_key'] == 'ig-key'
+    assert endpoints['youtube']['is_ready'] and endpoints['instagram']['is_ready']
+    # Missing key the API cannot provide: rebuilding would not help
+    assert not endpoints['facebook']['is_ready'] and 'error' not in endpoints['facebook']
+    assert complete
@@ -0,0 +1,126 @@
+import time
+
+import pytest
+
+from src.services.rtmp_relay import RelayUnavailable, RtmpRelay
+
+
+def test_relay_refuses_to_start_without_a_secret(monkeypatch):
+    monkeypatch.delenv('RTMP_RELAY_SECRET', raising=False)
+    monkeypatch.delenv('SECRET_KEY', raising=False)
+    relay = RtmpRelay(enabled=True)
+
+    assert not relay.enabled
+    with pytest.raises(RelayUnavailable, match='RTMP_RELAY_SECRET'):
+        relay.start(1, {'twitch': {'url': 'rtmp://live.twitch.tv/app/key'}})
+    with pytest.raises(RelayUnavailable):
+        relay.ingest_for(1)
+
+
+def test_ingest_keys_depend_on_the_secret(monkeypatch):
+    monkeypatch.delenv('SECRET_KEY', raising=False)
+    monkeypatch.setenv('RTMP_RELAY_SECRET', 'first')
+    first = RtmpRelay(enabled=True)
+    monkeypatch.setenv('RTMP_RELAY_SECRET', 'second')
+    second = RtmpRelay(enabled=True)
+
+    assert first.enabled
+    assert first.ingest_for(1)['key'] != second.ingest_for(1)['key']
+    assert first.ingest_for(1)['key'] != first.ingest_for(2)['key']
+
+
+EXITING = 'echo "Connection refused"\nexit 1\n'
+STALLED = 'exec sleep 30\n'
+HEALTHY = ('size=0\nwhile true; do\n  size=$((size + 1000))\n'
+           '  echo "total_size=$size"\n  echo "progress=continue"\n  sleep 0.05\ndone\n')
+
+
+@pytest.fixture
+def make_relay(tmp_path, monkeypatch):
+    """Relay whose "ffmpeg" is a shell script, with timings scaled down for the tests"""
+    monkeypatch.setenv('RTMP_RELAY_SECRET', 'secret')
+    relays = []
+
+    def make(script, **kwargs):
+        ffmpeg = tmp_path / 'ffmpeg'
+        ffmpeg.write_text('#!/bin/sh\n' + script)
+        ffmpeg.chmod(0o755)
+        options = dict(stall_timeout=0.3, restart_backoff=0.1, max_backoff=0.4, stable_after=30,
+                       check_interval=0.02)
+        options.update(kwargs)
+        relay = RtmpRelay(enabled=True, ffmpeg_path=str(ffmpeg), **options)
+        relays.append(relay)
+        return relay
+
+    yield make
+    for relay in relays:
+        relay.shutdown()
+
+
+def start_worker(relay):
+    relay.start(1, {'twitch': {'url': 'rtmp://live.twitch.tv/app/key', 'platform_id': 7}})
+    return relay._workers['1']['twitch']
+
+
+def wait_for(predicate, timeout=5):
+    deadline = time.time() + timeout
+    while not predicate():
+        assert time.time() < deadline, 'condition not reached in time'
+        time.sleep(0.01)
+
+
+def test_exiting_process_is_restarted_with_doubling_backoff(make_relay):
+    relay = make_relay(EXITING)
+    worker = start_worker(relay)
+    backoffs = []
+
+    def record_backoff():
+        if worker.backoff and (not backoffs or backoffs[-1] != (worker.restarts, worker.backoff)):
+            backoffs.append((worker.restarts, worker.backoff))
+        return worker.restarts >= 4
+
+    wait_for(record_backoff)
+
+    assert [backoff for _, backoff in backoffs[:4]] == [0.1, 0.2, 0.4, 0.4]
+    assert 'Processo reiniciado: código de saída 1' in worker.errors
+    assert 'Connection refused' in worker.errors
+
+
+def test_stalled_process_is_killed_and_restarted(make_relay):
+    relay = make_relay(STALLED)
+    worker = start_worker(relay)
+    wait_for(lambda: worker.process is not None)
+    stalled, started = worker.process, worker.started_at
+
+    wait_for(lambda: worker.restarts >= 1)
+
+    assert time.time() - started >= relay.stall_timeout
+    assert stalled.poll() is not None
+    assert 'Processo reiniciado: sem envio de dados' in worker.errors
+    wait_for(lambda: worker.state == 'running' and worker.process is not stalled)
+
+
+def test_healthy_process_keeps_running_and_resets_the_backoff(make_relay):
+    relay = make_relay(HEALTHY, stable_after=0.2)
+    worker = start_worker(relay)
+    wait_for(lambda: worker.process is not None)
+    worker.backoff = 0.4
+
+    wait_for(lambda: worker.backoff == 0.0 and worker.bytes_sent >= 5000)
+
+    assert worker.restarts == 0 and worker.state == 'running'
+    assert time.time() - worker.last_progress < relay.stall_timeout
+
+
+def test_stopped_worker_is_not_restarted(make_relay):
+    relay = make_relay(HEALTHY)
+    worker = start_worker(relay)
+    wait_for(lambda: worker.process is not None)
+    process = worker.process
+
+    assert relay.stop(1) == 1
+    time.sleep(0.2)
+
+    assert process.poll() is not None
+    assert worker.state == 'stopped' and worker.process is None and worker.restarts == 0
+    assert relay.status(1) == []
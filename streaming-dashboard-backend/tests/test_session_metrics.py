@@ -0,0 +1,77 @@
+import pytest
+
+from src.models.user import db
+from src.models.platform import Platform, StreamSession
+from src.services.session_metrics import SessionMetrics, session_metrics
+
+
+@pytest.fixture
+def platform(user):
+    platform = Platform(user_id=user.id, platform_name='twitch')
+    db.session.add(platform)
+    db.session.commit()
+    return platform
+
+
+def add_session(user, platform, is_active=True):
+    session = StreamSession(user_id=user.id, platform_id=platform.id, is_active=is_active)
+    db.session.add(session)
+    db.session.commit()
+    return session
+
+
+class RacingApp:
+    """Runs ``during_query`` while the refresh is reading the active sessions"""
+
+    def __init__(self, app, during_query):
+        self.app = app
+        self.during_query = during_query
+
+    def app_context(self):
+        self.during_query()
+        return self.app.app_context()
+
+
+def test_messages_for_a_session_created_on_another_worker_are_accepted(client, auth_headers, user, platform,
+                                                                        monkeypatch):
+    monkeypatch.setattr(session_metrics, '_sessions', {})
+    monkeypatch.setattr(session_metrics, '_active', {})
+    monkeypatch.setattr(session_metrics, '_pending', {})
+    session = add_session(user, platform)
+    ended = add_session(user, platform, is_active=False)
+
+    response = client.post(f'/api/platforms/stream-sessions/{session.id}/messages', headers=auth_headers,
+                           json={'count': 3})
+
+    assert response.status_code == 202
+    assert session_metrics.owner(session.id) == (str(user.id), platform.id)
+    assert session_metrics._pending[session.id] == [0, 3]
+    response = client.post(f'/api/platforms/stream-sessions/{ended.id}/messages', headers=auth_headers)
+    assert response.status_code == 404
+
+
+def test_refresh_keeps_sessions_tracked_during_the_query(app, user, platform):
+    metrics = SessionMetrics()
+    stale = add_session(user, platform, is_active=False)
+    active = add_session(user, platform)
+    metrics.track(stale.id, user.id, platform.id)
+    metrics.app = RacingApp(app, lambda: metrics.track(999, user.id, 42))
+
+    metrics._refresh_active()
+
+    assert metrics.owner(999) == (str(user.id), 42)
+    assert metrics.owner(active.id) == (str(user.id), platform.id)
+    assert stale.id not in metrics._sessions
+    assert metrics._active == {(str(user.id), platform.id): active.id, (str(user.id), 42): 999}
+
+
+def test_refresh_does_not_revive_sessions_ended_during_the_query(app, user, platform):
+    metrics = SessionMetrics()
+    session = add_session(user, platform)
+    metrics.track(session.id, user.id, platform.id)
+    metrics.app = RacingApp(app, lambda: metrics.untrack(session.id))
+
+    metrics._refresh_active()
+
+    assert session.id not in metrics._sessions
+    assert metrics._active == {}
@@ -0,0 +1,90 @@
+import time
+
+import pytest
+
+from src.models.user import db
+from src.models.platform import Platform
+from src.services.event_bus import EventBus
+from src.services.session_metrics import SessionMetrics
+from src.services.status_poller import SnapshotStore, StatusPoller
+from src.services.viewer_history import SeriesHistory
+
+
+class FakeService:
+    broadcaster_id = 'broadcaster-1'
+
+    def get_stream_status(self):
+        return {'is_live': True, 'viewer_count': 42}
+
+
+class FakeManager:
+    def __init__(self):
+        self.authenticated = []
+
+    def authenticate_platform(self, platform_name, credentials, user_id=None):
+        self.authenticated.append((platform_name, credentials))
+        return True
+
+    def get_platform(self, platform_name):
+        return FakeService()
+
+    def get_twitch_status_batch(self, broadcaster_ids):
+        return {broadcaster_id: {'is_live': True, 'viewer_count': 7} for broadcaster_id in broadcaster_ids}
+
+
+class FakePool:
+    def __init__(self):
+        self.manager = FakeManager()
+
+    def get(self, user_id):
+        return self.manager
+
+
+@pytest.fixture
+def poller(app):
+    poller = StatusPoller(SnapshotStore(), events=EventBus(), history=SeriesHistory(),
+                          metrics=SessionMetrics(), route_max_age=5)
+    poller.app = app
+    poller.manager_pool = FakePool()
+    return poller
+
+
+def test_poll_due_polls_real_platform_rows(app, user, poller):
+    twitch = Platform(user_id=user.id, platform_name='twitch')
+    twitch.set_access_token('twitch-token')
+    youtube = Platform(user_id=user.id, platform_name='youtube')
+    youtube.set_access_token('youtube-token')
+    db.session.add_all([twitch, youtube])
+    db.session.commit()
+
+    poller.poll_due()
+
+    authenticated = dict(poller.manager_pool.manager.authenticated)
+    assert authenticated['twitch']['access_token'] == 'twitch-token'
+    assert authenticated['youtube']['access_token'] == 'youtube-token'
+
+    twitch_snapshot = poller.store.get(user.id, twitch.id)
+    assert twitch_snapshot['name'] == 'twitch'
+    assert twitch_snapshot['display_name'] == 'Twitch'
+    assert twitch_snapshot['source'] == 'poller'
+    assert twitch_snapshot['status']['viewer_count'] == 7
+    assert poller.store.get(user.id, youtube.id)['status']['viewer_count'] == 42
+
+    assert poller.history.latest(user.id)['youtube']['value'] == 42
+
+
+def test_route_snapshots_use_short_ttl(app, user, poller):
+    poller.store.set(user.id, 1, {'status': {'is_live': True, 'viewer_count': 3}})
+    assert poller.snapshot(user.id, 1) is not None
+
+    poller.store._snapshots[str(user.id)][1]['updated_at'] = time.time() - 10
+    assert poller.snapshot(user.id, 1) is None
+
+
+def test_poller_snapshots_expire_quickly_when_poller_is_not_running(app, user, poller):
+    poller.store.set(user.id, 1, {'status': {'is_live': True, 'viewer_count': 3}}, source='poller')
+    poller.store._snapshots[str(user.id)][1]['updated_at'] = time.time() - 60
+
+    # Poller thread not running: only route_max_age applies
+    assert not poller.is_running
+    assert poller.snapshot(user.id, 1) is None
@@ -0,0 +1,21 @@
+from datetime import datetime
+
+from src.models.user import db
+from src.models.platform import Platform, StreamSession
+
+
+def test_stream_sessions_since_with_utc_offset_is_converted_to_utc(client, auth_headers, user):
+    platform = Platform(user_id=user.id, platform_name='twitch')
+    db.session.add(platform)
+    db.session.commit()
+    early = StreamSession(user_id=user.id, platform_id=platform.id, started_at=datetime(2025, 1, 1, 12, 0))
+    late = StreamSession(user_id=user.id, platform_id=platform.id, started_at=datetime(2025, 1, 1, 14, 0))
+    db.session.add_all([early, late])
+    db.session.commit()
+
+    # 10:30 at -03:00 is 13:30 UTC
+    response = client.get('/api/platforms/stream-sessions', headers=auth_headers,
+                          query_string={'since': '2025-01-01T10:30:00-03:00'})
+
+    assert response.status_code == 200
+    assert [session['id'] for session in response.get_json()] == [late.id]
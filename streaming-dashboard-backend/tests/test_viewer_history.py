@@ -0,0 +1,56 @@
+import pytest
+
+from src.services.viewer_analytics import load_matrix
+from src.services.viewer_history import SeriesHistory, parse_range_args
+
+
+@pytest.mark.parametrize('args', [
+    {'since': 'nan'}, {'until': 'inf'}, {'since': '-inf', 'until': '100'}, {'window': 'nan'},
+    {'resolution': 'nan'}, {'resolution': 'inf'}, {'resolution': '0'},
+])
+def test_non_finite_range_args_are_rejected(args):
+    with pytest.raises(ValueError):
+        parse_range_args(args)
+
+
+@pytest.mark.parametrize('route', ['viewers', 'summary', 'latency'])
+@pytest.mark.parametrize('query', ['since=nan', 'until=inf', 'resolution=nan', 'since=0&until=inf'])
+def test_analytics_routes_answer_400_on_non_finite_ranges(client, auth_headers, route, query):
+    response = client.get(f'/api/streaming/analytics/{route}?{query}', headers=auth_headers)
+
+    assert response.status_code == 400
+
+
+def test_summary_rejects_non_finite_smoothing(client, auth_headers):
+    response = client.get('/api/streaming/analytics/summary?smooth=nan', headers=auth_headers)
+
+    assert response.status_code == 400
+
+
+@pytest.fixture
+def history():
+    history = SeriesHistory(tiers=[(1, 600), (60, 100)])
+    for offset in range(300):
+        history.record(1, 'twitch', offset, timestamp=1_700_000_000 + offset)
+    return history
+
+
+def test_load_matrix_clamps_since_to_the_retained_points(history):
+    matrix = load_matrix(history, 1, 0, 1_700_000_299, max_points=500, resolution=1)
+
+    assert matrix['values'].shape == (1, 300)
+    assert matrix['timestamps'][0] == 1_700_000_000
+
+
+def test_load_matrix_caps_the_grid_with_an_explicit_resolution(history):
+    matrix = load_matrix(history, 1, 0, 1e12, max_points=50, resolution=1)
+
+    assert matrix['values'].shape == (1, 50)
+    assert matrix['timestamps'][-1] == 1_700_000_299
+    assert matrix['values'][0, -1] == 299
+
+
+def test_load_matrix_outside_the_retained_range_is_empty(history):
+    matrix = load_matrix(history, 1, 0, 1_000, max_points=50, resolution=1)
+
+    assert matrix['keys'] == [] and matrix['timestamps'].size == 0